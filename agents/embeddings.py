@@ -0,0 +1,52 @@
+# agents/embeddings.py
+
+import hashlib
+import math
+import os
+import re
+
+from chromadb.api.types import EmbeddingFunction
+
+EMBEDDING_MODEL = os.environ.get("FAMILY_TREE_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# "sentence-transformers" (default) or "hash" for an offline, model-free stand-in
+EMBEDDING_BACKEND = os.environ.get("FAMILY_TREE_EMBEDDINGS", "sentence-transformers")
+
+
+class HashEmbeddingFunction(EmbeddingFunction):
+    """Deterministic bag-of-words feature hashing; no model download needed.
+
+    Far weaker than a sentence transformer, but cheap and local, which is
+    what benchmarks and offline runs need.
+    """
+
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            vec = [0.0] * self.dimensions
+            for token in re.findall(r"\w+", text.lower()):
+                h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                vec[h % self.dimensions] += 1.0 if (h >> 63) else -1.0
+            norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+            vectors.append([v / norm for v in vec])
+        return vectors
+
+    @staticmethod
+    def name():
+        return "family_tree_hash"
+
+    def get_config(self):
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config):
+        return HashEmbeddingFunction(config.get("dimensions", 384))
+
+
+def get_embedding_function():
+    if EMBEDDING_BACKEND == "hash":
+        return HashEmbeddingFunction()
+    from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+    return SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL)
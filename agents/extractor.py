@@ -0,0 +1,173 @@
+# agents/extractor.py
+
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agents import llm
+from agents.llm_cache import get_cache
+from utils.storage import relationship_key
+
+CHUNK_CHARS = int(os.environ.get("EXTRACT_CHUNK_CHARS", "3000"))
+CHUNK_OVERLAP = int(os.environ.get("EXTRACT_CHUNK_OVERLAP", "300"))
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", str(llm.OLLAMA_MAX_CONCURRENCY)))
+
+SYSTEM_PROMPT = """
+You are an information extractor that converts family information from natural language into structured JSON data.
+
+Output JSON format:
+{
+  "people": [
+    { "firstname": "Name", "surname": "", "gender": "Male/Female",
+    "birth_year": "", "death_year": "",
+    "marriage_year": "" }
+  ],
+  "relationships": [
+    { "type": "spouse", "person1": "Name1", "person2": "Name2" },
+    { "type": "parent", "parent": "Name1", "child": "Name2" }
+  ]
+}
+Only return valid JSON.
+"""
+
+
+def build_prompt(text):
+    return f"{SYSTEM_PROMPT}\n\nText:\n{text}"
+
+
+# ---------- Chunking ----------
+
+def chunk_text(text, max_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """Split text into sentence-aligned chunks of at most ~max_chars.
+
+    Consecutive chunks share about `overlap` characters of trailing sentences
+    so a relationship stated across a boundary is seen whole by one chunk.
+    """
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+|\n\s*\n", text.strip()) if s and s.strip()]
+    chunks, current, size = [], [], 0
+    for sentence in sentences:
+        if current and size + len(sentence) > max_chars:
+            chunks.append(" ".join(current))
+            carried, carried_size = [], 0
+            for prev in reversed(current):
+                if carried_size >= overlap:
+                    break
+                carried.insert(0, prev)
+                carried_size += len(prev) + 1
+            # Never carry the whole chunk, or the next one could not grow
+            current = carried if len(carried) < len(current) else current[-1:]
+            size = sum(len(s) + 1 for s in current)
+        current.append(sentence)
+        size += len(sentence) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+# ---------- Extraction ----------
+
+def extract_chunk(text):
+    """Extract one chunk; raises ValueError if the model's reply is not JSON."""
+    prompt = build_prompt(text)
+    content = llm.chat(prompt, cache_version="")
+    try:
+        return json.loads(content)
+    except ValueError:
+        # Don't keep serving a reply that could not be parsed
+        get_cache().discard(llm.OLLAMA_MODEL, prompt, "")
+        raise ValueError(content)
+
+
+def extract_document(text, on_progress=None, max_workers=EXTRACT_WORKERS):
+    """Extract people and relationships from text of any length.
+
+    Chunks are sent to the model concurrently by a bounded pool and merged.
+    on_progress(done, total, index, error) runs on the calling thread after
+    each chunk finishes, so it may safely update the UI. If it raises,
+    chunks that have not started are dropped and the exception propagates
+    (this is how a background job is cancelled).
+
+    Returns (merged, errors) where errors maps chunk index to the exception.
+    """
+    chunks = chunk_text(text)
+    results, errors = {}, {}
+    if not chunks:
+        return merge_extractions([]), errors
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        futures = {pool.submit(extract_chunk, chunk): i for i, chunk in enumerate(chunks)}
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                error = None
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    errors[index] = error = e
+                if on_progress:
+                    on_progress(done, len(chunks), index, error)
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return merge_extractions([results[i] for i in sorted(results)]), errors
+
+
+# ---------- Merging ----------
+
+def _norm(value):
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def merge_extractions(extractions):
+    """Merge per-chunk outputs, reconciling the same person across chunks.
+
+    People match on (firstname, surname); a mention without a surname joins
+    the single person with that firstname if there is exactly one. Empty
+    fields are filled from later mentions and relationship names are
+    rewritten to the reconciled firstname before de-duplication.
+    """
+    people = []
+    by_full = {}
+    by_first = {}
+    for extraction in extractions:
+        for person in extraction.get("people", []) or []:
+            if not isinstance(person, dict) or not _norm(person.get("firstname")):
+                continue
+            first, last = _norm(person.get("firstname")), _norm(person.get("surname"))
+            match = by_full.get((first, last))
+            if match is None and (not last or (first, "") in by_full):
+                candidates = by_first.get(first, [])
+                if len(candidates) == 1:
+                    match = candidates[0]
+            if match is None:
+                match = dict(person)
+                people.append(match)
+                by_first.setdefault(first, []).append(match)
+            else:
+                for key, value in person.items():
+                    if value and not match.get(key):
+                        match[key] = value
+            by_full[(first, _norm(match.get("surname")))] = match
+            by_full.setdefault((first, last), match)
+
+    def canonical(name):
+        candidates = by_first.get(_norm(name), [])
+        return candidates[0]["firstname"] if len(candidates) == 1 else name
+
+    relationships = []
+    seen = set()
+    for extraction in extractions:
+        for rel in extraction.get("relationships", []) or []:
+            if not isinstance(rel, dict):
+                continue
+            if rel.get("type") == "spouse" and rel.get("person1") and rel.get("person2"):
+                rel = {**rel, "person1": canonical(rel["person1"]), "person2": canonical(rel["person2"])}
+            elif rel.get("type") == "parent" and rel.get("parent") and rel.get("child"):
+                rel = {**rel, "parent": canonical(rel["parent"]), "child": canonical(rel["child"])}
+            else:
+                continue
+            key = relationship_key(rel)
+            if key not in seen:
+                seen.add(key)
+                relationships.append(rel)
+    return {"people": people, "relationships": relationships}
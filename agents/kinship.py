@@ -0,0 +1,409 @@
+# agents/kinship.py
+
+import re
+import threading
+
+from utils.store import get_store
+
+# ---------- Kinship Vocabulary ----------
+
+MALE_TERMS = {"father", "son", "brother", "husband", "uncle", "nephew", "grandfather", "grandson"}
+FEMALE_TERMS = {"mother", "daughter", "sister", "wife", "aunt", "niece", "grandmother", "granddaughter"}
+
+PLURALS = {
+    "children": "child", "grandchildren": "grandchild", "parents": "parent", "grandparents": "grandparent",
+    "sons": "son", "daughters": "daughter", "brothers": "brother", "sisters": "sister",
+    "siblings": "sibling", "cousins": "cousin", "uncles": "uncle", "aunts": "aunt",
+    "nephews": "nephew", "nieces": "niece", "spouses": "spouse", "wives": "wife", "husbands": "husband",
+    "grandsons": "grandson", "granddaughters": "granddaughter",
+    "grandfathers": "grandfather", "grandmothers": "grandmother", "fathers": "father", "mothers": "mother",
+}
+SINGULAR_TO_PLURAL = {one: many for many, one in PLURALS.items()}
+
+ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6,
+    "1st": 1, "2nd": 2, "3rd": 3, "4th": 4, "5th": 5, "6th": 6,
+}
+REMOVALS = {"once": 1, "twice": 2, "thrice": 3}
+
+BASE_TERMS = (
+    {"parent", "child", "sibling", "spouse", "grandparent", "grandchild", "cousin"}
+    | MALE_TERMS | FEMALE_TERMS
+)
+
+QUESTION_PATTERNS = [
+    # "Who is Radha's father?", "Who are Srihari's grandchildren?"
+    re.compile(r"^(?:who|which people)\s+(?:is|are|were|was)\s+(?P<name>.+?)['’]s?\s+(?P<rel>[\w\s-]+?)\s*\??$", re.I),
+    # "Who is the father of Radha?"
+    re.compile(r"^(?:who|which people)\s+(?:is|are|were|was)\s+(?:the\s+)?(?P<rel>[\w\s-]+?)\s+of\s+(?P<name>.+?)\s*\??$", re.I),
+    # "List Srihari's children", "Name the cousins of Prasanna"
+    re.compile(r"^(?:list|name|show)\s+(?:all\s+)?(?P<name>.+?)['’]s?\s+(?P<rel>[\w\s-]+?)\s*\??$", re.I),
+    re.compile(r"^(?:list|name|show)\s+(?:all\s+)?(?:the\s+)?(?P<rel>[\w\s-]+?)\s+of\s+(?P<name>.+?)\s*\??$", re.I),
+]
+RELATION_PATTERNS = [
+    # "How is Prasanna related to Srihari?"
+    re.compile(r"^how\s+(?:is|are)\s+(?P<b>.+?)\s+related\s+to\s+(?P<a>.+?)\s*\??$", re.I),
+    # "What is the relationship between Prasanna and Srihari?"
+    re.compile(r"^what\s+is\s+the\s+relation(?:ship)?\s+between\s+(?P<b>.+?)\s+and\s+(?P<a>.+?)\s*\??$", re.I),
+]
+
+
+def parse_relation(text):
+    """Turn a kinship term into a spec dict, or None if it is not one.
+
+    "great great grandmother" -> {"kind": "up", "depth": 4, "gender": "female"}
+    "second cousin once removed" -> {"kind": "cousin", "degree": 2, "removed": 1}
+    """
+    words = text.lower().replace("-", " ").split()
+    if not words:
+        return None
+    in_law = words[-2:] == ["in", "law"]
+    if in_law:
+        words = words[:-2]
+    greats = 0
+    while words and words[0] == "great":
+        greats += 1
+        words = words[1:]
+    degree, removed = 1, 0
+    if words and words[0] in ORDINALS:
+        degree = ORDINALS[words[0]]
+        words = words[1:]
+    if len(words) >= 2 and words[-1] == "removed":
+        count = words[-2]
+        if count in REMOVALS:
+            removed = REMOVALS[count]
+            words = words[:-2]
+        elif len(words) >= 3 and words[-2] == "times" and words[-3].isdigit():
+            removed = int(words[-3])
+            words = words[:-3]
+        else:
+            return None
+    if len(words) != 1:
+        return None
+    term = PLURALS.get(words[0], words[0])
+    if term not in BASE_TERMS:
+        return None
+    gender = "male" if term in MALE_TERMS else "female" if term in FEMALE_TERMS else None
+    spec = {"term": text.strip().lower(), "gender": gender}
+
+    if in_law:
+        if greats or term not in {"father", "mother", "parent", "son", "daughter", "child",
+                                  "brother", "sister", "sibling"}:
+            return None
+        kind = {"father": "parent", "mother": "parent", "son": "child",
+                "daughter": "child", "brother": "sibling", "sister": "sibling"}.get(term, term)
+        return {**spec, "kind": f"{kind}_in_law"}
+    if term == "cousin":
+        return {**spec, "kind": "cousin", "degree": degree, "removed": removed}
+    if degree != 1 or removed:
+        return None
+    if term in {"parent", "father", "mother"}:
+        return {**spec, "kind": "up", "depth": 1 + greats} if not greats else None
+    if term in {"grandparent", "grandfather", "grandmother"}:
+        return {**spec, "kind": "up", "depth": 2 + greats}
+    if term in {"child", "son", "daughter"}:
+        return {**spec, "kind": "down", "depth": 1} if not greats else None
+    if term in {"grandchild", "grandson", "granddaughter"}:
+        return {**spec, "kind": "down", "depth": 2 + greats}
+    if term in {"sibling", "brother", "sister"}:
+        return {**spec, "kind": "sibling"} if not greats else None
+    if term in {"spouse", "husband", "wife"}:
+        return {**spec, "kind": "spouse"} if not greats else None
+    if term in {"uncle", "aunt"}:
+        return {**spec, "kind": "uncle", "depth": 1 + greats}
+    if term in {"nephew", "niece"}:
+        return {**spec, "kind": "nephew", "depth": 1 + greats}
+    return None
+
+
+# ---------- Kinship Engine ----------
+
+class KinshipEngine:
+    """Answers structural questions directly from the parent/spouse graph.
+
+    Ancestor closures (ancestor -> generations up) are computed once per
+    person and memoised for the lifetime of the engine, which is rebuilt
+    whenever the store version changes. Every relation, including nth cousins
+    m times removed, is resolved from the lowest common ancestors of the two
+    closures. People are the store's integer graph nodes throughout; only
+    answers are turned back into names.
+    """
+
+    def __init__(self, store):
+        snapshot = store.snapshot()
+        self.store = store
+        self.version = snapshot.version
+        self.graph = snapshot.graph
+        self.parents = self.graph.parents
+        self.children = self.graph.children
+        self.spouses = self.graph.spouses
+        self._ancestors = {}
+        self._names = {}
+        for name, people in snapshot.by_name.items():
+            self._names.setdefault(name.lower(), []).extend(self.graph.node(p["id"]) for p in people)
+        for name, people in snapshot.by_name.items():
+            # Allow "Chaitanya" for "Chaitanya (Chitti)" when unambiguous
+            short = re.sub(r"\s*\(.*?\)", "", name).strip().lower()
+            if short and short != name.lower() and short not in self._names:
+                self._names[short] = [self.graph.node(p["id"]) for p in people]
+
+    # ----- Lookups -----
+
+    def matches(self, text):
+        """Nodes of every person `text` names: a firstname, or an id as "#12"."""
+        text = text.strip().strip("\"'“”")
+        if text.startswith("#") and text[1:] in self.store.by_id:
+            return [self.graph.node(text[1:])]
+        return list(self._names.get(text.lower(), []))
+
+    def resolve(self, text):
+        """The one person `text` names, or None if it names none or several."""
+        found = self.matches(text)
+        return found[0] if len(found) == 1 else None
+
+    def name(self, node):
+        return self.store.display_name(self.graph.ids[node])
+
+    def gender(self, node):
+        person = self.store.by_id.get(self.graph.ids[node]) or {}
+        return str(person.get("gender", "")).lower()
+
+    def ancestors(self, person):
+        """Map of every ancestor node to its distance in generations (parents = 1)."""
+        closure = self._ancestors.get(person)
+        if closure is not None:
+            return closure
+        # Iterative post-order so deep trees do not hit the recursion limit
+        stack = [(person, False)]
+        in_progress = set()
+        while stack:
+            node, expanded = stack.pop()
+            if node in self._ancestors:
+                continue
+            parents = self.parents[node]
+            if not expanded:
+                in_progress.add(node)
+                stack.append((node, True))
+                for p in parents:
+                    if p not in self._ancestors and p not in in_progress:
+                        stack.append((p, False))
+                continue
+            closure = {}
+            for p in parents:
+                closure[p] = 1
+            for p in parents:
+                # A cyclic (invalid) tree leaves in-progress entries missing
+                for anc, dist in self._ancestors.get(p, {}).items():
+                    if dist + 1 < closure.get(anc, float("inf")):
+                        closure[anc] = dist + 1
+            closure.pop(node, None)
+            self._ancestors[node] = closure
+            in_progress.discard(node)
+        return self._ancestors[person]
+
+    def descendants(self, person, depth):
+        """People exactly `depth` generations below `person`."""
+        level = {person}
+        for _ in range(depth):
+            level = {c for n in level for c in self.children[n]}
+        return level
+
+    def siblings(self, person):
+        return {c for p in self.parents[person] for c in self.children[p]} - {person}
+
+    def common_ancestor_distance(self, a, b):
+        """(generations from a, generations from b) to their closest common ancestor."""
+        up_a = {**self.ancestors(a), a: 0}
+        up_b = {**self.ancestors(b), b: 0}
+        best = None
+        for anc, da in up_a.items():
+            db = up_b.get(anc)
+            if db is not None and (best is None or (da + db, da) < (best[0] + best[1], best[0])):
+                best = (da, db)
+        return best
+
+    # ----- Relations -----
+
+    def relatives(self, person, spec):
+        kind = spec["kind"]
+        if kind == "up":
+            found = {a for a, d in self.ancestors(person).items() if d == spec["depth"]}
+        elif kind == "down":
+            found = self.descendants(person, spec["depth"])
+        elif kind == "sibling":
+            found = self.siblings(person)
+        elif kind == "spouse":
+            found = set(self.spouses[person])
+        elif kind == "uncle":
+            found = set()
+            for anc, d in self.ancestors(person).items():
+                if d == spec["depth"]:
+                    for sib in self.siblings(anc):
+                        found.add(sib)
+                        found.update(self.spouses[sib])
+            found -= set(self.ancestors(person))
+        elif kind == "nephew":
+            found = set()
+            for sib in self.siblings(person) | {s for sp in self.spouses[person] for s in self.siblings(sp)}:
+                found |= self.descendants(sib, spec["depth"])
+        elif kind == "cousin":
+            found = self.cousins(person, spec["degree"], spec["removed"])
+        elif kind == "parent_in_law":
+            found = {p for sp in self.spouses[person] for p in self.parents[sp]}
+        elif kind == "child_in_law":
+            found = {sp for c in self.children[person] for sp in self.spouses[c]}
+        elif kind == "sibling_in_law":
+            found = {s for sp in self.spouses[person] for s in self.siblings(sp)}
+            found |= {sp for s in self.siblings(person) for sp in self.spouses[s]}
+        else:
+            found = set()
+        found.discard(person)
+        if spec.get("gender"):
+            found = {p for p in found if self.gender(p) == spec["gender"]}
+        return sorted(found, key=self.name)
+
+    def cousins(self, person, degree, removed):
+        found = set()
+        for anc, up in self.ancestors(person).items():
+            # The common ancestor sits degree+1 generations above the nearer cousin
+            for down in {up + removed, up - removed}:
+                if min(up, down) != degree + 1 or down < 1:
+                    continue
+                for candidate in self.descendants(anc, down):
+                    if candidate != person and self.common_ancestor_distance(person, candidate) == (up, down):
+                        found.add(candidate)
+        return found
+
+    def describe(self, a, b):
+        """Describe b's relation to a, e.g. "grandfather" or "first cousin once removed"."""
+        if a == b:
+            return "self"
+        male, female = self.gender(b) == "male", self.gender(b) == "female"
+
+        def gendered(neutral, m, f):
+            return m if male else f if female else neutral
+
+        if b in self.spouses[a]:
+            return gendered("spouse", "husband", "wife")
+        dist = self.common_ancestor_distance(a, b)
+        if dist is not None:
+            da, db = dist
+            if da == 0:
+                return _greats(db, gendered("child", "son", "daughter"), gendered("grandchild", "grandson", "granddaughter"))
+            if db == 0:
+                return _greats(da, gendered("parent", "father", "mother"), gendered("grandparent", "grandfather", "grandmother"))
+            if da == 1 and db == 1:
+                return gendered("sibling", "brother", "sister")
+            if da == 1:
+                return "great " * (db - 2) + gendered("nephew or niece", "nephew", "niece")
+            if db == 1:
+                return "great " * (da - 2) + gendered("uncle or aunt", "uncle", "aunt")
+            return _cousin(min(da, db) - 1, abs(da - db))
+        if b in {p for sp in self.spouses[a] for p in self.parents[sp]}:
+            return gendered("parent", "father", "mother") + "-in-law"
+        if b in {sp for c in self.children[a] for sp in self.spouses[c]}:
+            return gendered("child", "son", "daughter") + "-in-law"
+        if b in self.relatives(a, {"kind": "sibling_in_law"}):
+            return gendered("sibling", "brother", "sister") + "-in-law"
+        for sp in self.spouses[a]:
+            if self.common_ancestor_distance(sp, b) is not None:
+                return f"spouse's {self.describe(sp, b)}"
+        for sp in self.spouses[b]:
+            if sp != a and self.common_ancestor_distance(a, sp) is not None:
+                return f"{self.describe(a, sp)}'s spouse"
+        return None
+
+
+def _greats(depth, one, two):
+    if depth == 1:
+        return one
+    return "great " * (depth - 2) + two
+
+
+def _cousin(degree, removed):
+    ordinal = {1: "first", 2: "second", 3: "third", 4: "fourth", 5: "fifth"}.get(degree, f"{degree}th")
+    if not removed:
+        return f"{ordinal} cousin"
+    times = {1: "once", 2: "twice", 3: "thrice"}.get(removed, f"{removed} times")
+    return f"{ordinal} cousin {times} removed"
+
+
+def _number(term, count):
+    """`term` ("first cousins", "brother-in-law") made singular or plural to suit `count`."""
+    words = re.split(r"([\s-]+)", term)
+    for i, word in enumerate(words):
+        one = PLURALS.get(word, word)
+        if one in BASE_TERMS:
+            words[i] = one if count == 1 else SINGULAR_TO_PLURAL[one]
+            break
+    return "".join(words)
+
+
+def _join(names):
+    if len(names) <= 1:
+        return "".join(names)
+    return ", ".join(names[:-1]) + " and " + names[-1]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Kinship engine for the current store version (rebuilt only on change)."""
+    global _engine
+    store = get_store()
+    if _engine is None or _engine.version != store.version:
+        with _engine_lock:
+            if _engine is None or _engine.version != store.version:
+                _engine = KinshipEngine(store)
+    return _engine
+
+
+# ---------- Question Routing ----------
+
+def answer_kinship_question(question):
+    """Answer a recognised kinship question, or return None to fall back to the LLM."""
+    text = question.strip()
+    engine = get_engine()
+
+    for pattern in RELATION_PATTERNS:
+        m = pattern.match(text)
+        if m:
+            a_nodes, b_nodes = engine.matches(m.group("a")), engine.matches(m.group("b"))
+            if not a_nodes or not b_nodes:
+                return None
+            # A shared first name gets one answer per person it could mean
+            answers = []
+            for a in a_nodes:
+                for b in b_nodes:
+                    if a == b:
+                        continue
+                    relation = engine.describe(a, b)
+                    if relation is None:
+                        answers.append(f"I couldn't find a family connection between {engine.name(b)} and {engine.name(a)}.")
+                    else:
+                        answers.append(f"{engine.name(b)} is {engine.name(a)}'s {relation}.")
+            return " ".join(answers) or None
+
+    for pattern in QUESTION_PATTERNS:
+        m = pattern.match(text)
+        if not m:
+            continue
+        spec = parse_relation(m.group("rel"))
+        nodes = engine.matches(m.group("name"))
+        if spec is None or not nodes:
+            continue
+        term = spec["term"]
+        answers = []
+        for node in nodes:
+            name = engine.name(node)
+            found = [engine.name(n) for n in engine.relatives(node, spec)]
+            if not found:
+                answers.append(f"I couldn't find {name}'s {term} in the family tree.")
+            else:
+                # The noun and the verb follow the number of people found, not the question
+                verb = "is" if len(found) == 1 else "are"
+                answers.append(f"{name}'s {_number(term, len(found))} {verb} {_join(found)}.")
+        return " ".join(answers)
+    return None
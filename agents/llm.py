@@ -0,0 +1,96 @@
+# agents/llm.py
+
+import os
+import threading
+
+import ollama
+
+from agents.llm_cache import get_cache
+from utils.timing import span
+
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama2")
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "120"))  # seconds, per HTTP read
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "2"))
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")  # keep the model loaded between questions
+
+_client = None
+_client_lock = threading.Lock()
+# Bounds how many generations the app runs against the local server at once
+_slots = threading.BoundedSemaphore(OLLAMA_MAX_CONCURRENCY)
+
+
+class LLMBusyError(RuntimeError):
+    pass
+
+
+def get_client():
+    """Shared Ollama client; its HTTP connection pool is reused by every call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ollama.Client(host=os.environ.get("OLLAMA_HOST"), timeout=OLLAMA_TIMEOUT)
+    return _client
+
+
+def _acquire():
+    if not _slots.acquire(timeout=OLLAMA_TIMEOUT):
+        raise LLMBusyError("Too many questions are being answered right now, please try again.")
+
+
+def chat(prompt, model=OLLAMA_MODEL, cache_version=None, cache_embedding=None, **kwargs):
+    """Run one prompt and return the full reply text.
+
+    With cache_version set (the family-data version, or "" for prompts that do
+    not depend on the tree) replies are served from and stored in the cache.
+    """
+    if cache_version is not None:
+        with span("llm_cache.get"):
+            cached = get_cache().get(model, prompt, cache_version, cache_embedding)
+        if cached is not None:
+            return cached
+    _acquire()
+    try:
+        with span("ollama.chat"):
+            response = get_client().chat(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                keep_alive=OLLAMA_KEEP_ALIVE,
+                **kwargs
+            )
+        content = response["message"]["content"]
+    finally:
+        _slots.release()
+    if cache_version is not None:
+        get_cache().put(model, prompt, cache_version, content, cache_embedding)
+    return content
+
+
+def stream_chat(prompt, model=OLLAMA_MODEL, cache_version=None, cache_embedding=None, **kwargs):
+    """Yield reply text chunks as the model produces them (cached like chat)."""
+    if cache_version is not None:
+        with span("llm_cache.get"):
+            cached = get_cache().get(model, prompt, cache_version, cache_embedding)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    _acquire()
+    try:
+        with span("ollama.stream"):
+            for chunk in get_client().chat(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                keep_alive=OLLAMA_KEEP_ALIVE,
+                **kwargs
+            ):
+                text = chunk["message"]["content"]
+                if text:
+                    parts.append(text)
+                    yield text
+    finally:
+        _slots.release()
+    # Only a completed stream is cached; an abandoned one never reaches here
+    if cache_version is not None:
+        get_cache().put(model, prompt, cache_version, "".join(parts), cache_embedding)
@@ -0,0 +1,171 @@
+# agents/llm_cache.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+LLM_CACHE_PATH = "data/llm_cache.db"
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Cosine similarity above which a near-duplicate question reuses an answer; unset disables it
+LLM_CACHE_SEMANTIC_THRESHOLD = os.environ.get("LLM_CACHE_SEMANTIC_THRESHOLD")
+
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+class LLMCache:
+    """On-disk LRU cache of LLM replies keyed on model, prompt and data version.
+
+    Entries older than the current family-data version are purged the first
+    time a new version is seen, so edits to the tree invalidate answers that
+    were built from it. Replies that do not depend on the tree are cached
+    under the empty version and survive edits.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        data_version TEXT NOT NULL,
+        response TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        last_used REAL NOT NULL,
+        embedding BLOB
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+    CREATE INDEX IF NOT EXISTS idx_entries_version ON entries(model, data_version);
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES,
+                 semantic_threshold=LLM_CACHE_SEMANTIC_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.semantic_threshold = float(semantic_threshold) if semantic_threshold else None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._current_version = None
+        self._local = threading.local()
+        self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(model, prompt, data_version):
+        raw = "\0".join([model, normalize_prompt(prompt), data_version or ""])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _check_version(self, data_version):
+        if data_version and data_version != self._current_version:
+            with self.conn:
+                self.conn.execute("DELETE FROM entries WHERE data_version NOT IN ('', ?)", (data_version,))
+            self._current_version = data_version
+
+    def get(self, model, prompt, data_version="", embedding=None):
+        self._check_version(data_version)
+        key = self.key(model, prompt, data_version)
+        row = self.conn.execute("SELECT response FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None and embedding is not None and self.semantic_threshold is not None:
+            key, row = self._nearest(model, data_version, embedding)
+            if row is not None:
+                self.semantic_hits += 1
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.conn:
+            self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def _nearest(self, model, data_version, embedding):
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        best_key, best_row, best_score = None, None, self.semantic_threshold
+        rows = self.conn.execute(
+            "SELECT key, response, embedding FROM entries "
+            "WHERE model = ? AND data_version = ? AND embedding IS NOT NULL",
+            (model, data_version or ""),
+        )
+        for key, response, blob in rows:
+            vec = np.frombuffer(blob, dtype=np.float32)
+            if vec.shape != query.shape:
+                continue
+            score = float(np.dot(query, vec))
+            if score >= best_score:
+                best_key, best_row, best_score = key, (response,), score
+        return best_key, best_row
+
+    def put(self, model, prompt, data_version, response, embedding=None):
+        blob = None
+        if embedding is not None:
+            vec = np.asarray(embedding, dtype=np.float32)
+            blob = (vec / (np.linalg.norm(vec) or 1.0)).tobytes()
+        size = len(response.encode("utf-8")) + (len(blob) if blob else 0)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, model, data_version, response, size, last_used, embedding) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(model, prompt, data_version), model, data_version or "", response, size, time.time(), blob),
+            )
+            self._evict()
+
+    def _evict(self):
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Drop least recently used entries until both limits hold
+        rows = self.conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def discard(self, model, prompt, data_version=""):
+        with self.conn:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (self.key(model, prompt, data_version),))
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "entries": count,
+            "bytes": total,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
@@ -1,36 +1,158 @@
 # agents/reasoning_agent.py
 
+import hashlib
 import os
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+import threading
 
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+from agents import llm
+from agents.embeddings import get_embedding_function
+from agents.kinship import answer_kinship_question
+from retriever.rag import build_context
+from utils.store import get_store
+from utils.timing import span
 
-embedding_function = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+CHROMA_PATH = os.environ.get("FAMILY_TREE_CHROMA_PATH", "data/chroma")
+INGEST_BATCH_SIZE = 256
+VECTOR_K = 10  # vector hits handed to the reranker
 
-client = chromadb.Client()
-collection = client.get_or_create_collection(
-    name="family_memory",
-    embedding_function=embedding_function
-)
+# The embedding model and Chroma client are heavy, so they are created on
+# first use and then shared by every session in the process
+_embedding_function = None
+_collection = None
+_init_lock = threading.Lock()
 
-def ingest_documents(docs):
-    for i, doc in enumerate(docs):
-        collection.add(
-            documents=[doc],
-            ids=[f"doc_{i}"]
-        )
 
-def query_family_question(query_text):
-    results = collection.query(query_texts=[query_text], n_results=3)
-    retrieved_docs = [doc for doc in results["documents"][0]]
+def get_collection():
+    """Shared Chroma collection (and embedding model), loaded on first call."""
+    global _embedding_function, _collection
+    if _collection is None:
+        with _init_lock:
+            if _collection is None:
+                import chromadb
+
+                with span("embedding.load_model"):
+                    embedding_function = get_embedding_function()
+                with span("chroma.open"):
+                    # Persisted on disk so a restart does not re-embed the whole tree
+                    client = chromadb.PersistentClient(path=CHROMA_PATH)
+                    collection = client.get_or_create_collection(
+                        name="family_memory",
+                        embedding_function=embedding_function
+                    )
+                _embedding_function = embedding_function
+                _collection = collection
+    return _collection
+
+
+def embed(texts):
+    get_collection()
+    return _embedding_function(texts)
+
+
+def warm_up():
+    """Load the model and collection and run one embedding so weights are resident."""
+    embed(["warm up"])
+
+
+def fact_id(doc):
+    # Content-hash ids: an unchanged fact keeps its id and is never re-embedded
+    return hashlib.sha1(doc.encode("utf-8")).hexdigest()
+
+def ingest_documents(docs, batch_size=INGEST_BATCH_SIZE, on_progress=None):
+    """Sync the collection with `docs` (any iterable of fact strings).
+
+    Only facts not already stored are embedded, in batches of `batch_size`;
+    stored facts that are no longer produced are deleted. on_progress(seen)
+    is called after each embedded batch with the number of facts read so
+    far; if it raises, the sync stops there and stale facts are kept.
+    """
+    with span("chroma.list_ids"):
+        collection = get_collection()
+        existing = set(collection.get(include=[])["ids"])
+    seen = set()
+    batch_ids, batch_docs = [], []
+    added = 0
+    for doc in docs:
+        doc_id = fact_id(doc)
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        if doc_id in existing:
+            continue
+        batch_ids.append(doc_id)
+        batch_docs.append(doc)
+        if len(batch_ids) >= batch_size:
+            with span("chroma.embed_upsert"):
+                collection.upsert(ids=batch_ids, documents=batch_docs)
+            added += len(batch_ids)
+            batch_ids, batch_docs = [], []
+            if on_progress:
+                on_progress(len(seen))
+    if batch_ids:
+        with span("chroma.embed_upsert"):
+            collection.upsert(ids=batch_ids, documents=batch_docs)
+        added += len(batch_ids)
+
+    stale = list(existing - seen)
+    for start in range(0, len(stale), batch_size):
+        collection.delete(ids=stale[start:start + batch_size])
+    return {"added": added, "removed": len(stale), "unchanged": len(seen) - added}
+
+
+_ingest_lock = threading.Lock()
+
+
+def ingest_family_facts(on_progress=None):
+    """Sync the collection with every fact of the current tree.
+
+    One sync runs at a time; one that waited finds most facts already
+    embedded. on_progress(done, total) is called as in ingest_documents.
+    """
+    from retriever.facts import get_fact_tables, iter_facts
+
+    with _ingest_lock:
+        tables = get_fact_tables()
+        total = len(tables)
+        if on_progress:
+            on_progress(0, total)
+        return ingest_documents(iter_facts(tables), on_progress=on_progress and (lambda done: on_progress(done, total)))
+
+def query_family_question(query_text, stream=False):
+    """Answer a question; with stream=True, return an iterator of text chunks."""
+    # Structural questions ("Who is Radha's father?") are answered from the graph
+    with span("kinship.answer"):
+        answer = answer_kinship_question(query_text)
+    if answer:
+        return iter([answer]) if stream else answer
+
+    if os.environ.get("FAMILY_TREE_MEMORY"):
+        # A long-running memory service holds the model and indexes; fetch the context from it
+        from mcp.memory import get_memory
+        with span("memory.search"):
+            facts = get_memory().call("search", question=query_text)["facts"]
+        context = "\n".join(f["fact"] for f in facts)
+        query_embedding = None
+    else:
+        # Embed once: the same vector drives retrieval and the semantic answer cache
+        with span("embedding.query"):
+            query_embedding = embed([query_text])[0]
+        with span("chroma.query"):
+            results = get_collection().query(
+                query_embeddings=[query_embedding], n_results=VECTOR_K, include=["documents", "distances"]
+            )
+        vector_hits = list(zip(results["documents"][0], results["distances"][0]))
+
+        # Graph neighbourhood of the people named + lexical + vector hits, under a token budget
+        with span("rag.retrieve"):
+            context = build_context(query_text, vector_hits)
 
     prompt = (
         "Based on the following information, answer the question:\n\n"
-        + "\n".join(retrieved_docs)
+        + context
         + f"\n\nQuestion: {query_text}\nAnswer:"
     )
 
-    response = os.popen(f'ollama run llama2 "{prompt}"').read()
-    return response
+    version = get_store().version
+    if stream:
+        return llm.stream_chat(prompt, cache_version=version, cache_embedding=query_embedding)
+    return llm.chat(prompt, cache_version=version, cache_embedding=query_embedding)
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_tree, write_tree
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+# ---------- Timing ----------
+
+def measure(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "runs": times}, result
+
+
+# ---------- Benchmarks (run inside one child process per tree size) ----------
+
+def run_benchmarks(repeat, max_render_nodes, max_ingest):
+    """Time every hot path against the tree in ./data. Returns result rows."""
+    import pandas as pd
+    from utils.storage import JsonStorage
+    from utils.store import FamilyStore, get_store
+    from utils.helpers import load_people, save_people, build_graph, focus_subgraph, _build_graph
+    from utils.name_index import NameIndex
+    from ui.tree_tab import _render_tree_html
+    from retriever.facts import FactTables
+    from agents.reasoning_agent import ingest_documents
+
+    rows = []
+
+    def record(op, fn, runs=repeat, **extra):
+        timing, result = measure(fn, runs)
+        rows.append({"op": op, **timing, **extra})
+        return result
+
+    def cold_load():
+        store = FamilyStore(JsonStorage())
+        store.refresh()
+        return store.dataframe()
+
+    record("load_people_cold", cold_load)
+    load_people()
+    record("load_people_warm", load_people)
+
+    added = iter(range(10 ** 9, 10 ** 10))
+
+    def save_one_edit():
+        df, relationships = load_people()
+        new_id = str(next(added))
+        df = pd.concat([df, pd.DataFrame([{"id": new_id, "firstname": f"Bench{new_id}", "gender": "Male"}])], ignore_index=True)
+        save_people(df, relationships)
+
+    record("save_people_one_edit", save_one_edit)
+
+    store = get_store()
+    record("build_graph_cold", lambda: _build_graph(store))
+    G = record("build_graph_warm", build_graph)
+
+    node_of = G.graph["node_of"]
+    focus = node_of[store.people[len(store.people) // 2]["id"]]
+    visible, collapsed = focus_subgraph(G, focus, 2)
+    sub = G.subgraph(visible)
+    record("tree_html_focus", lambda: _render_tree_html(sub, collapsed), nodes=sub.number_of_nodes())
+    if G.number_of_nodes() <= max_render_nodes:
+        record("tree_html_full", lambda: _render_tree_html(G, set()), nodes=G.number_of_nodes())
+
+    # Free-text dedup: near-miss spellings of existing people plus new names
+    queries = []
+    for i, person in enumerate(store.people[::max(1, len(store.people) // 100)][:100]):
+        name = person["firstname"]
+        variant = name[:len(name) // 2] + " " + name[len(name) // 2:] if i % 2 else name + "a"
+        queries.append({"firstname": variant, "gender": person.get("gender", "")})
+    index = NameIndex()
+    record("dedup_index_build", lambda: NameIndex().sync(store), runs=1)
+    index.sync(store)
+    record("dedup_match_100", lambda: [index.match(q) for q in queries])
+
+    from retriever.rag import HybridRetriever, get_retriever
+    names = [p["firstname"] for p in store.people[::max(1, len(store.people) // 20)][:20]]
+    questions = [f"What do we know about {a} and {b}?" for a, b in zip(names, names[1:] + names[:1])]
+    record("rag_index_build", lambda: HybridRetriever(store)._bm25_index(), runs=1)
+    retriever = get_retriever()
+    retriever._bm25_index()
+    record("rag_retrieve_20", lambda: [retriever.retrieve(q) for q in questions])
+
+    tables = record("fact_tables_build", lambda: FactTables(store), runs=1)
+    facts = record("generate_facts", lambda: [f for batch in tables.batches() for f in batch], facts=len(tables))
+    facts = facts[:max_ingest]
+    record("ingest_documents_cold", lambda: ingest_documents(facts), runs=1, facts=len(facts))
+    record("ingest_documents_unchanged", lambda: ingest_documents(facts), facts=len(facts))
+    return rows
+
+
+def run_size(size, args):
+    """Generate a tree of `size` people and benchmark it in a fresh process."""
+    with tempfile.TemporaryDirectory(prefix="family_bench_") as tmp:
+        people, relationships = generate_tree(
+            generations=args.generations, branching=args.branching, marriage_rate=args.marriage_rate,
+            collision_rate=args.collision_rate, founders=max(1, size // 2000), max_people=size, seed=args.seed,
+        )
+        write_tree(tmp, people, relationships)
+        env = dict(os.environ)
+        env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+        env["FAMILY_TREE_STORAGE"] = "json"
+        env["FAMILY_TREE_EMBEDDINGS"] = "hash"
+        env["FAMILY_TREE_CHROMA_PATH"] = os.path.join(tmp, "chroma")
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--child",
+             "--repeat", str(args.repeat), "--max-render-nodes", str(args.max_render_nodes),
+             "--max-ingest", str(args.max_ingest)],
+            cwd=tmp, env=env, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            raise RuntimeError(f"benchmark for {size} people failed:\n{out.stderr}")
+        rows = json.loads(out.stdout.strip().splitlines()[-1])
+    for row in rows:
+        row.update(size=size, people=len(people), relationships=len(relationships))
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["size"], r["op"]): r for r in json.load(f)["results"]}
+    print(f"\n{'size':>8}  {'op':<28} {'before':>10} {'after':>10} {'ratio':>7}")
+    for row in results:
+        old = baseline.get((row["size"], row["op"]))
+        if old:
+            ratio = row["min"] / old["min"] if old["min"] else float("inf")
+            print(f"{row['size']:>8}  {row['op']:<28} {old['min']:>10.4f} {row['min']:>10.4f} {ratio:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Family Tree AI hot paths on synthetic trees.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="tree sizes in people")
+    parser.add_argument("--generations", type=int, default=50, help="maximum generations")
+    parser.add_argument("--branching", type=int, default=3, help="average children per couple")
+    parser.add_argument("--marriage-rate", type=float, default=0.7)
+    parser.add_argument("--collision-rate", type=float, default=0.05, help="chance a new person reuses a first name")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-render-nodes", type=int, default=5000, help="skip full-tree HTML above this")
+    parser.add_argument("--max-ingest", type=int, default=20000, help="facts to embed per size")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", help="earlier output file to compare against")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_benchmarks(args.repeat, args.max_render_nodes, args.max_ingest)))
+        return
+
+    results = []
+    for size in args.sizes:
+        print(f"Benchmarking {size} people...", flush=True)
+        for row in run_size(size, args):
+            results.append(row)
+            print(f"  {row['op']:<28} min {row['min']:.4f}s  median {row['median']:.4f}s")
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("child", "compare")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
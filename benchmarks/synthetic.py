@@ -0,0 +1,110 @@
+import json
+import os
+import random
+import sys
+
+SYLLABLES = [
+    "sri", "ha", "ri", "ma", "la", "xmi", "vi", "ja", "ya", "pra", "sa", "nna", "ra", "dha",
+    "na", "vya", "sha", "kar", "ti", "ke", "ya", "pa", "dma", "va", "su", "ni", "ta", "chai",
+    "tan", "ram", "de", "vi", "go", "pal", "kri", "shna", "ani", "ka", "lo", "ve", "nu", "ru",
+]
+SURNAMES = ["Rao", "Reddy", "Sharma", "Chary", "Varma", "Naidu", "Iyer", "Gupta", "Das", "Kumar"]
+
+
+# ---------- Synthetic Family Generator ----------
+
+def _name(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def generate_tree(generations=5, branching=3, marriage_rate=0.7, collision_rate=0.0,
+                  founders=1, max_people=None, seed=0):
+    """Build a synthetic family in the app's JSON format.
+
+    Starts from `founders` married couples. In each generation every person
+    marries an outsider with probability `marriage_rate`, and a couple has on
+    average `branching` children (at least one). `collision_rate` is the chance that a new
+    person reuses an existing first name, as happens in real families.
+    Returns (people, relationships).
+    """
+    rng = random.Random(seed)
+    people, relationships = [], []
+    used = set()
+    names = []
+
+    def new_person(surname, gender=None):
+        if names and rng.random() < collision_rate:
+            firstname = rng.choice(names)
+        else:
+            firstname = _name(rng)
+            while firstname in used:
+                firstname = _name(rng) + _name(rng).lower()
+            used.add(firstname)
+            names.append(firstname)
+        person = {
+            "id": str(len(people) + 1),
+            "firstname": firstname,
+            "surname": surname,
+            "gender": gender or rng.choice(["Male", "Female"]),
+            "birth_year": "",
+            "death_year": "",
+            "marriage_year": "",
+        }
+        people.append(person)
+        return person
+
+    def full():
+        return max_people is not None and len(people) >= max_people
+
+    generation = []
+    for _ in range(founders):
+        surname = rng.choice(SURNAMES)
+        husband, wife = new_person(surname, "Male"), new_person(surname, "Female")
+        relationships.append({"type": "spouse", "person1_id": husband["id"], "person2_id": wife["id"]})
+        generation.append((husband, wife))
+
+    year = 1850
+    for _ in range(generations - 1):
+        year += 25
+        next_generation = []
+        for couple in generation:
+            if full():
+                break
+            # Every couple has at least one child so small trees don't die out
+            for _ in range(rng.randint(1, max(1, 2 * branching - 1))):
+                if full():
+                    break
+                child = new_person(couple[0]["surname"])
+                child["birth_year"] = str(year + rng.randint(-5, 5))
+                for parent in couple:
+                    relationships.append({"type": "parent", "parent_id": parent["id"], "child_id": child["id"]})
+                if rng.random() < marriage_rate and not full():
+                    spouse = new_person(rng.choice(SURNAMES), "Female" if child["gender"] == "Male" else "Male")
+                    spouse["birth_year"] = str(year + rng.randint(-5, 5))
+                    married = str(year + 25 + rng.randint(-3, 3))
+                    child["marriage_year"] = spouse["marriage_year"] = married
+                    relationships.append({"type": "spouse", "person1_id": child["id"], "person2_id": spouse["id"]})
+                    next_generation.append((child, spouse))
+        generation = next_generation
+        if not generation or full():
+            break
+    return people, relationships
+
+
+def write_tree(directory, people, relationships):
+    """Write people/relationships as data/*.json under `directory`."""
+    data_dir = os.path.join(directory, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, "people_only.json"), "w", encoding="utf-8") as f:
+        json.dump(people, f, indent=4)
+    with open(os.path.join(data_dir, "relationships_only.json"), "w", encoding="utf-8") as f:
+        json.dump(relationships, f, indent=4)
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.synthetic OUT_DIR [max_people]
+    out = sys.argv[1] if len(sys.argv) > 1 else "synthetic"
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    people, relationships = generate_tree(generations=50, founders=max(1, size // 2000), max_people=size)
+    write_tree(out, people, relationships)
+    print(f"Wrote {len(people)} people and {len(relationships)} relationships to {out}/data")
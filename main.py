@@ -1,17 +1,56 @@
+import os
+import threading
 import streamlit as st
-from ui.tree_tab import show_tree_tab
-from ui.grid_tab import show_grid_tab
-from ui.ask_ai_tab import show_ask_ai_tab
-from ui.free_text_tab import extract_data_from_text
+from ui.perf_panel import perf_panel
+from utils.store import StoreLoadError, get_store
+from utils.timing import span
 
 st.set_page_config(page_title="Family Tree AI", layout="wide")
 
-tab1, tab2, tab3, tab4 = st.tabs(["🌳 Family Tree", "🧾 Person List", "🤖 Ask AI","📝 Add Person (Free Text)"])
-with tab1:
-    show_tree_tab()
-with tab2:
-    show_grid_tab()
-with tab3:
-    show_ask_ai_tab()
-with tab4:
-    extract_data_from_text()
+TABS = ["🌳 Family Tree", "🧾 Person List", "🤖 Ask AI", "📝 Add Person (Free Text)"]
+
+
+def _warm_up_ai():
+    # Imported here, so not even the agent modules load on the first rerun's thread
+    from agents.reasoning_agent import warm_up
+    warm_up()
+
+
+@st.cache_resource
+def prewarm_ai():
+    # Once per process: load the embedding model and Chroma off the request path
+    # (not needed when a memory service holds them instead)
+    if os.environ.get("FAMILY_TREE_PREWARM", "1") == "0" or os.environ.get("FAMILY_TREE_MEMORY"):
+        return None
+    thread = threading.Thread(target=_warm_up_ai, name="ai-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+prewarm_ai()
+
+try:
+    get_store()
+except StoreLoadError as e:
+    st.error(f"⚠️ {e}. Nothing can be shown or saved until the data files are fixed.")
+    st.stop()
+
+with perf_panel():
+    # Only the selected tab runs (and is imported) on each rerun
+    active = st.radio("Section", TABS, horizontal=True, key="active_tab", label_visibility="collapsed")
+    if active == TABS[0]:
+        from ui.tree_tab import show_tree_tab
+        with span("tab.tree"):
+            show_tree_tab()
+    elif active == TABS[1]:
+        from ui.grid_tab import show_grid_tab
+        with span("tab.grid"):
+            show_grid_tab()
+    elif active == TABS[2]:
+        from ui.ask_ai_tab import show_ask_ai_tab
+        with span("tab.ask_ai"):
+            show_ask_ai_tab()
+    else:
+        from ui.free_text_tab import extract_data_from_text
+        with span("tab.free_text"):
+            extract_data_from_text()
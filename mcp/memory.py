@@ -0,0 +1,377 @@
+# mcp/memory.py
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+from agents.kinship import get_engine
+from utils.integrity import get_checker
+from utils.store import get_store
+
+# "host:port" of a running memory service; unset means use it in-process
+MEMORY_ADDRESS = os.environ.get("FAMILY_TREE_MEMORY", "")
+DEFAULT_PORT = 8765
+MAX_GENERATIONS = 10
+PROTOCOL_VERSION = "2024-11-05"
+
+
+class MemoryToolError(RuntimeError):
+    pass
+
+
+# ---------- Tools ----------
+
+def _resolve(name):
+    """Graph node for a firstname or "#id"; shared names must be narrowed to an id."""
+    engine = get_engine()
+    found = engine.matches(str(name))
+    if not found:
+        raise MemoryToolError(f"No person named {name!r} in the family tree.")
+    if len(found) > 1:
+        options = ", ".join(f"#{engine.graph.ids[n]}" for n in found)
+        raise MemoryToolError(f"{len(found)} people are called {name!r}; use one of {options}.")
+    return found[0]
+
+
+def _people(nodes):
+    engine = get_engine()
+    return [{"id": engine.graph.ids[n], "name": engine.name(n)} for n in nodes]
+
+
+def lookup_person(name):
+    node = _resolve(name)
+    engine = get_engine()
+    return {
+        "id": engine.graph.ids[node],
+        "name": engine.name(node),
+        "record": get_store().by_id.get(engine.graph.ids[node]),
+        "parents": _people(engine.parents[node]),
+        "children": _people(engine.children[node]),
+        "spouses": _people(engine.spouses[node]),
+    }
+
+
+def ancestors(name, generations=MAX_GENERATIONS):
+    node = _resolve(name)
+    engine = get_engine()
+    limit = min(int(generations), MAX_GENERATIONS)
+    closure = sorted(engine.ancestors(node).items(), key=lambda x: (x[1], engine.name(x[0])))
+    return {"name": engine.name(node), "ancestors": {engine.name(a): d for a, d in closure if d <= limit}}
+
+
+def descendants(name, generations=3):
+    node = _resolve(name)
+    engine = get_engine()
+    found = {}
+    levels = engine.graph.levels([node], engine.children, min(int(generations), MAX_GENERATIONS))
+    for depth, level in enumerate(levels, 1):
+        for child in sorted(level.tolist(), key=engine.name):
+            found.setdefault(engine.name(child), depth)
+    return {"name": engine.name(node), "descendants": found}
+
+
+def kinship(a, b):
+    """How `b` is related to `a`."""
+    a, b = _resolve(a), _resolve(b)
+    engine = get_engine()
+    return {"a": engine.name(a), "b": engine.name(b), "relation": engine.describe(a, b)}
+
+
+def semantic_search(query, k=5):
+    from agents.reasoning_agent import embed, get_collection
+    results = get_collection().query(
+        query_embeddings=embed([str(query)]), n_results=int(k), include=["documents", "distances"]
+    )
+    return {"hits": [{"fact": d, "distance": dist} for d, dist in zip(results["documents"][0], results["distances"][0])]}
+
+
+def search(question, token_budget=None):
+    """Hybrid (graph + BM25 + vector) context facts for a question."""
+    from agents.reasoning_agent import VECTOR_K
+    from retriever.rag import CONTEXT_TOKENS, get_retriever
+    hits = semantic_search(question, VECTOR_K)["hits"]
+    facts = get_retriever().retrieve(
+        str(question), [(h["fact"], h["distance"]) for h in hits], int(token_budget or CONTEXT_TOKENS)
+    )
+    return {"facts": [{"fact": f, "score": s} for f, s in facts]}
+
+
+def add_relationship(relationship):
+    """Validate and commit one link; errors reject it."""
+    rel = dict(relationship)
+    ends = {"parent": ("parent_id", "child_id"), "spouse": ("person1_id", "person2_id")}.get(rel.get("type"))
+    if ends is None or any(not rel.get(key) for key in ends):
+        raise MemoryToolError("relationship must be {type: parent, parent_id, child_id} or {type: spouse, person1_id, person2_id}")
+    issues = get_checker().check_link(rel)
+    added = not any(i["severity"] == "error" for i in issues)
+    if added:
+        get_store().commit([{"op": "add_relationship", "relationship": rel}])
+    return {"added": added, "issues": issues}
+
+
+def ingest():
+    """Embed the tree's new facts and drop stale ones from the service's collection."""
+    from agents.reasoning_agent import ingest_family_facts
+    return ingest_family_facts()
+
+
+def _schema(**properties):
+    required = [k for k, v in properties.items() if not v.pop("optional", False)]
+    return {"type": "object", "properties": properties, "required": required}
+
+
+TOOLS = {
+    "lookup_person": (lookup_person, "A person's record and immediate family (name or \"#id\").",
+                      _schema(name={"type": "string"})),
+    "ancestors": (ancestors, "Ancestors of a person with their generation distance.",
+                  _schema(name={"type": "string"}, generations={"type": "integer", "optional": True})),
+    "descendants": (descendants, "Descendants of a person with their generation distance.",
+                    _schema(name={"type": "string"}, generations={"type": "integer", "optional": True})),
+    "kinship": (kinship, "How person b is related to person a (e.g. 'first cousin once removed').",
+                _schema(a={"type": "string"}, b={"type": "string"})),
+    "semantic_search": (semantic_search, "Nearest family facts by embedding similarity.",
+                        _schema(query={"type": "string"}, k={"type": "integer", "optional": True})),
+    "search": (search, "Ranked context facts for a question (graph, lexical and vector).",
+               _schema(question={"type": "string"}, token_budget={"type": "integer", "optional": True})),
+    "add_relationship": (add_relationship, "Add a parent or spouse link between person ids after integrity checks.",
+                         _schema(relationship={"type": "object"})),
+    "ingest": (ingest, "Sync the vector store with the current tree: embed new facts, drop stale ones.", _schema()),
+}
+
+
+# ---------- Service ----------
+
+class MemoryService:
+    """JSON-RPC 2.0 handler exposing the tools in the MCP tools/list and
+    tools/call shape.
+
+    A JSON array of requests is a batch and gets an array of responses, so
+    a client can make many lookups in one round trip. All state lives in the
+    process-wide store, kinship engine, checker and vector collection, so a
+    long-running service keeps them warm for every client.
+    """
+
+    def warm_up(self, embeddings=True):
+        get_store()
+        get_engine()
+        get_checker()
+        from retriever.rag import get_retriever
+        get_retriever()._bm25_index()
+        if embeddings:
+            from agents.reasoning_agent import warm_up
+            warm_up()
+
+    def handle(self, message):
+        """Response for one request or a list of responses for a batch (None for notifications)."""
+        if isinstance(message, list):
+            responses = [r for r in (self._handle_one(m) for m in message) if r is not None]
+            return responses or None
+        return self._handle_one(message)
+
+    def _handle_one(self, request):
+        if not isinstance(request, dict) or "method" not in request:
+            return _error(None, -32600, "Invalid request")
+        rid = request.get("id")
+        method, params = request["method"], request.get("params") or {}
+        try:
+            if method == "initialize":
+                result = {
+                    "protocolVersion": PROTOCOL_VERSION,
+                    "capabilities": {"tools": {}},
+                    "serverInfo": {"name": "family-tree-memory", "version": "1.0"},
+                }
+            elif method == "tools/list":
+                result = {"tools": [
+                    {"name": name, "description": desc, "inputSchema": schema}
+                    for name, (_, desc, schema) in TOOLS.items()
+                ]}
+            elif method == "tools/call":
+                result = self.call_tool(params.get("name"), params.get("arguments") or {})
+            elif method == "ping":
+                result = {}
+            elif rid is None:
+                return None  # notifications such as notifications/initialized
+            else:
+                return _error(rid, -32601, f"Unknown method {method!r}")
+        except Exception as e:
+            return _error(rid, -32603, str(e))
+        return None if rid is None else {"jsonrpc": "2.0", "id": rid, "result": result}
+
+    def call_tool(self, name, arguments):
+        if name not in TOOLS:
+            raise MemoryToolError(f"Unknown tool {name!r}")
+        fn = TOOLS[name][0]
+        try:
+            data = fn(**arguments)
+        except (MemoryToolError, TypeError, ValueError) as e:
+            # Tool failures are results, not protocol errors, as in MCP
+            return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+        return {
+            "content": [{"type": "text", "text": json.dumps(data, default=str)}],
+            "structuredContent": data,
+            "isError": False,
+        }
+
+
+def _error(rid, code, message):
+    return {"jsonrpc": "2.0", "id": rid, "error": {"code": code, "message": message}}
+
+
+def _respond(service, line):
+    try:
+        message = json.loads(line)
+    except json.JSONDecodeError:
+        return _error(None, -32700, "Parse error")
+    return service.handle(message)
+
+
+# ---------- Transports ----------
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # Newline-delimited JSON-RPC, one connection per client
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = _respond(self.server.service, line)
+            if response is not None:
+                self.wfile.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, embeddings=True):
+    """Serve on a local TCP port until interrupted."""
+    service = MemoryService()
+    service.warm_up(embeddings)
+    with _Server((host, port), _Handler) as server:
+        server.service = service
+        print(f"Family memory service listening on {host}:{server.server_address[1]}", file=sys.stderr, flush=True)
+        server.serve_forever()
+
+
+def serve_stdio(embeddings=True):
+    """Serve over stdin/stdout, for MCP clients that spawn the process."""
+    service = MemoryService()
+    service.warm_up(embeddings)
+    for line in sys.stdin:
+        if line.strip():
+            response = _respond(service, line)
+            if response is not None:
+                sys.stdout.write(json.dumps(response, default=str) + "\n")
+                sys.stdout.flush()
+
+
+# ---------- Clients ----------
+
+class _Client:
+    def call(self, tool, **arguments):
+        return self.batch([(tool, arguments)])[0]
+
+    def batch(self, calls):
+        """Run [(tool, arguments), ...] in one round trip; results in order."""
+        requests = [
+            {"jsonrpc": "2.0", "id": i, "method": "tools/call", "params": {"name": tool, "arguments": args}}
+            for i, (tool, args) in enumerate(calls)
+        ]
+        responses = {r.get("id"): r for r in self._send(requests) or []}
+        results = []
+        for i in range(len(requests)):
+            response = responses.get(i, {})
+            if "error" in response or "result" not in response:
+                raise MemoryToolError(response.get("error", {}).get("message", "no response"))
+            result = response["result"]
+            if result.get("isError"):
+                raise MemoryToolError(result["content"][0]["text"])
+            results.append(result["structuredContent"])
+        return results
+
+
+class LocalMemory(_Client):
+    """In-process stand-in with the client API; messages still round-trip
+    through JSON so behaviour matches the socket service.
+    """
+
+    def __init__(self):
+        self.service = MemoryService()
+
+    def _send(self, payload):
+        return json.loads(json.dumps(self.service.handle(json.loads(json.dumps(payload))), default=str))
+
+
+class MemoryClient(_Client):
+    """Client for a memory service on a local TCP port; one persistent connection."""
+
+    def __init__(self, address=MEMORY_ADDRESS, timeout=30):
+        host, _, port = address.rpartition(":")
+        self.address = (host or "127.0.0.1", int(port or DEFAULT_PORT))
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._file = self._sock.makefile("rwb")
+
+    def _send(self, payload):
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._file.write(data)
+                    self._file.flush()
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("memory service closed the connection")
+                    return json.loads(line)
+                except OSError:
+                    self.close()
+                    if attempt:
+                        raise
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            finally:
+                self._sock = self._file = None
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_memory():
+    """The configured memory: a client for FAMILY_TREE_MEMORY, else in-process."""
+    global _memory
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                _memory = MemoryClient(MEMORY_ADDRESS) if MEMORY_ADDRESS else LocalMemory()
+    return _memory
+
+
+if __name__ == "__main__":
+    # python -m mcp.memory [--port 8765 | --stdio] [--no-embeddings]
+    parser = argparse.ArgumentParser(description="Long-running family-graph memory service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--stdio", action="store_true", help="serve MCP-style JSON-RPC over stdin/stdout")
+    parser.add_argument("--no-embeddings", action="store_true", help="do not pre-load the embedding model")
+    args = parser.parse_args()
+    if args.stdio:
+        serve_stdio(not args.no_embeddings)
+    else:
+        serve(args.host, args.port, not args.no_embeddings)
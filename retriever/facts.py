@@ -0,0 +1,180 @@
+# retriever/facts.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.store import get_store, people_frame
+from utils.timing import span
+
+FACT_BATCH_SIZE = 1024
+
+# Gendered wording of derived relations, by the gender of the first person
+DERIVED_TERMS = {
+    "grandparent": ("grandfather", "grandmother", "grandparent"),
+    "parent_in_law": ("father-in-law", "mother-in-law", "parent-in-law"),
+}
+
+
+# ---------- Column-wise Text ----------
+
+def _column(df, name):
+    if name not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[name].fillna("").astype(str).str.strip()
+
+
+def person_facts(df):
+    """retriever.rag.person_fact for every row of a people frame, built column-wise."""
+    name = (_column(df, "firstname") + " " + _column(df, "surname")).str.strip()
+    gender = _column(df, "gender").str.lower()
+    born, died = _column(df, "birth_year"), _column(df, "death_year")
+    fact = name + np.where(gender != "", " is a " + gender, " is a family member")
+    fact = fact + np.where(born != "", " born in " + born, "")
+    fact = fact + np.where(died != "", " who died in " + died, "")
+    return (fact + ".").tolist()
+
+
+def _join(a, b):
+    """Pairs (x, z) for every x -> y in `a` and y -> z in `b`, by sort and search.
+
+    `a` and `b` are (sources, targets) arrays; the result has one row per path.
+    """
+    order = np.argsort(b[0], kind="stable")
+    b_src, b_tgt = b[0][order], b[1][order]
+    lo = np.searchsorted(b_src, a[1], "left")
+    counts = np.searchsorted(b_src, a[1], "right") - lo
+    total = int(counts.sum())
+    ranks = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(a[0], counts), b_tgt[np.repeat(lo, counts) + ranks]
+
+
+def _pairs(sources, targets, size, symmetric=False):
+    """Distinct (source, target) pairs without self-links; one per unordered pair if symmetric."""
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+    if symmetric:
+        sources, targets = np.minimum(sources, targets), np.maximum(sources, targets)
+    # One int64 key per pair sorts far faster than unique rows of a 2-D array
+    keys = np.unique(sources * size + targets)
+    return keys // size, keys % size
+
+
+def _without(pairs, others, size):
+    """`pairs` minus any pair also in `others` (e.g. a sibling who is also a sibling-in-law)."""
+    keys = pairs[0] * size + pairs[1]
+    drop = np.concatenate([o[0] * size + o[1] for o in others])
+    keep = ~np.isin(keys, drop)
+    return pairs[0][keep], pairs[1][keep]
+
+
+# ---------- Fact Tables ----------
+
+class FactTables:
+    """Every fact about one store version, as integer node pairs.
+
+    Direct links come straight from the graph's arrays. Derived relations
+    (grandparents, siblings, parents- and siblings-in-law) are joined once
+    here, without a Python loop per person, and kept as node pairs rather
+    than text, so a large tree costs a few integer arrays. Sentences are
+    only built batch by batch in `batches`.
+    """
+
+    def __init__(self, store):
+        snapshot = store.snapshot()
+        self.version = snapshot.version
+        # From the snapshot too: the live store may already be a version ahead
+        self.people = people_frame(list(snapshot.by_id.values()))
+        graph = snapshot.graph
+        with span("facts.tables"):
+            self.names, self.genders = self._node_columns(graph.ids, self.people)
+            parents = graph.children.edges()
+            spouses = graph.spouses.edges()
+            couples = tuple(side[spouses[0] < spouses[1]] for side in spouses)
+            size = len(graph)
+            siblings = _pairs(*_join((parents[1], parents[0]), parents), size, symmetric=True)
+            both_ways = (np.concatenate(siblings), np.concatenate(siblings[::-1]))
+            # A spouse's siblings and a sibling's spouses
+            in_laws = [_join(spouses, both_ways), _join(both_ways, spouses)]
+            self.tables = [
+                ("parent", parents),
+                ("spouse", couples),
+                ("grandparent", _pairs(*_join(parents, parents), size)),
+                ("sibling", siblings),
+                ("parent_in_law", _without(_pairs(*_join(parents, spouses), size), [parents], size)),
+                ("sibling_in_law", _without(_pairs(
+                    np.concatenate([pair[0] for pair in in_laws]),
+                    np.concatenate([pair[1] for pair in in_laws]),
+                    size, symmetric=True,
+                ), [siblings, couples], size)),
+            ]
+
+    @staticmethod
+    def _node_columns(ids, df):
+        """Display name and gender of every graph node, matching store.display_name."""
+        ids = np.array(ids, dtype=object)
+        if not len(df):
+            return "#" + ids, np.full(len(ids), "", dtype=object)
+        by_id = df.assign(id=df["id"].astype(str)).drop_duplicates("id", keep="last").set_index("id")
+        by_id = by_id.reindex(ids)
+        first = by_id["firstname"].fillna("").astype(str).to_numpy(dtype=object)
+        shared = by_id["firstname"].map(by_id["firstname"].value_counts()).fillna(0).to_numpy() > 1
+        names = np.where(shared, first + " (#" + ids + ")", first)
+        # Nodes of deleted people keep their number until the next rebuild
+        names = np.where(by_id["firstname"].isna().to_numpy(), "#" + ids, names)
+        genders = by_id["gender"].fillna("").astype(str).str.strip().str.lower().to_numpy(dtype=object)
+        return names, genders
+
+    def __len__(self):
+        return len(self.people) + sum(len(pairs[0]) for _, pairs in self.tables)
+
+    def _sentences(self, kind, sources, targets):
+        a, b = self.names[sources], self.names[targets]
+        if kind == "parent":
+            return a + " is a parent of " + b + "."
+        if kind == "spouse":
+            return a + " is married to " + b + "."
+        if kind == "sibling":
+            return a + " and " + b + " are siblings."
+        if kind == "sibling_in_law":
+            return a + " and " + b + " are siblings-in-law."
+        male, female, neutral = DERIVED_TERMS[kind]
+        gender = self.genders[sources]
+        term = np.where(gender == "male", male, np.where(gender == "female", female, neutral)).astype(object)
+        return a + " is " + b + "'s " + term + "."
+
+    def batches(self, batch_size=FACT_BATCH_SIZE):
+        """Lists of at most `batch_size` fact sentences, built lazily."""
+        for start in range(0, len(self.people), batch_size):
+            yield person_facts(self.people.iloc[start:start + batch_size])
+        for kind, (sources, targets) in self.tables:
+            for start in range(0, len(sources), batch_size):
+                end = start + batch_size
+                yield self._sentences(kind, sources[start:end], targets[start:end]).tolist()
+
+
+_tables = None
+_tables_lock = threading.Lock()
+
+
+def get_fact_tables():
+    """Fact tables for the current store version (rebuilt only on change)."""
+    global _tables
+    store = get_store()
+    if _tables is None or _tables.version != store.version:
+        with _tables_lock:
+            if _tables is None or _tables.version != store.version:
+                _tables = FactTables(store)
+    return _tables
+
+
+def iter_facts(tables=None, batch_size=FACT_BATCH_SIZE):
+    """Every fact of `tables` (default: the current tree's), one sentence at a
+    time, for streaming ingestion. Sentences are built batch by batch as the
+    consumer reads them.
+    """
+    if tables is None:
+        tables = get_fact_tables()
+    for batch in tables.batches(batch_size):
+        yield from batch
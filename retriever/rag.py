@@ -0,0 +1,236 @@
+# retriever/rag.py
+
+import math
+import re
+import threading
+from collections import Counter
+
+from utils.name_index import compact
+from utils.store import get_store
+from utils.timing import span
+
+HOPS = 2  # relationship-graph radius around each mentioned person
+CONTEXT_TOKENS = 400  # budget for retrieved facts in the prompt
+BM25_K = 20  # lexical hits considered for reranking
+BM25_K1, BM25_B = 1.2, 0.75
+COMMON_TERM_SHARE = 0.1  # terms in more than this share of facts carry no signal
+MAX_NAME_WORDS = 3  # longest name, in words, looked for in a question
+
+# Reranking weights for the three signals (each normalised to 0..1)
+GRAPH_WEIGHT, BM25_WEIGHT, VECTOR_WEIGHT = 0.5, 0.3, 0.2
+CONNECTING_BONUS = 0.3  # fact lies between two people named in the question
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "of", "to", "in", "and", "or", "who", "whom", "what",
+    "which", "how", "does", "do", "did", "s", "about", "tell", "me", "with", "for", "by", "on", "at",
+    "related", "relationship", "born",
+}
+TOKEN_RE = re.compile(r"\w+")
+
+
+# ---------- Facts ----------
+
+def person_fact(p):
+    """Sentence for a person; empty fields are left out (retriever/facts.py builds the same text column-wise)."""
+    name = f"{p.get('firstname', '') or ''} {p.get('surname', '') or ''}".strip()
+    gender = str(p.get("gender", "") or "").strip().lower()
+    born, died = str(p.get("birth_year", "") or "").strip(), str(p.get("death_year", "") or "").strip()
+    fact = f"{name} is a {gender}" if gender else f"{name} is a family member"
+    if born:
+        fact += f" born in {born}"
+    if died:
+        fact += f" who died in {died}"
+    return fact + "."
+
+
+def relationship_fact(rel, name):
+    """Sentence for a relationship; `name` turns a person id into a display name."""
+    if rel.get("type") == "parent":
+        return f"{name(rel['parent_id'])} is a parent of {name(rel['child_id'])}."
+    if rel.get("type") == "spouse":
+        return f"{name(rel['person1_id'])} is married to {name(rel['person2_id'])}."
+    return None
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text and names
+    return max(1, len(text) // 4)
+
+
+# ---------- Retriever ----------
+
+class HybridRetriever:
+    """Builds a compact prompt context from graph, lexical and vector signals.
+
+    People named in the question are found by matching word windows against
+    the store's names; their HOPS-neighbourhood in the relationship graph
+    supplies the facts that connect them. A BM25 index over every fact
+    (built once per store version) adds lexical matches, and the caller's
+    vector hits add semantic ones. Facts are reranked on a weighted mix and
+    packed greedily under a token budget.
+    """
+
+    def __init__(self, store):
+        # Facts, names and the graph all come from this one version
+        snapshot = self.snapshot = store.snapshot()
+        self.graph = snapshot.graph
+        self.version = snapshot.version
+        self._names = {}
+        for name, people in snapshot.by_name.items():
+            nodes = [self.graph.node(p["id"]) for p in people]
+            self._names.setdefault(compact(name), nodes)
+            short = compact(re.sub(r"\s*\(.*?\)", "", name))
+            if short:
+                self._names.setdefault(short, nodes)
+        self._bm25 = None
+        self._lock = threading.Lock()
+
+    # ----- Mentions -----
+
+    def mentions(self, question):
+        """Nodes of the people named in `question` (every person sharing a name)."""
+        words = re.findall(r"[\w()]+", re.sub(r"['’]s\b", "", question))
+        found = []
+        i = 0
+        while i < len(words):
+            for size in range(min(MAX_NAME_WORDS, len(words) - i), 0, -1):
+                key = compact("".join(words[i:i + size]))
+                nodes = self._names.get(key)
+                # Lower-case words only count when long enough not to be ordinary words
+                if nodes and (words[i][:1].isupper() or (len(key) >= 4 and key not in STOPWORDS)):
+                    found += [node for node in nodes if node not in found]
+                    i += size
+                    break
+            else:
+                i += 1
+        return found
+
+    # ----- Graph neighbourhood -----
+
+    def _distances(self, start):
+        graph = self.graph
+        return graph.walk(start, (graph.parents, graph.children, graph.spouses), HOPS)
+
+    def graph_facts(self, nodes):
+        """{fact: graph score} for the neighbourhoods of `nodes`."""
+        distances = [self._distances(node) for node in nodes]
+        reached = {}
+        for i, dist in enumerate(distances):
+            for node, hop in dist.items():
+                best, sources = reached.get(node, (hop, set()))
+                reached[node] = (min(best, hop), sources | {i})
+
+        scores = {}
+
+        def add(fact, nodes):
+            hop = max(reached[n][0] for n in nodes)
+            score = 1.0 / (1 + hop)
+            # Facts touching people reached from two different mentions connect them
+            if len(set().union(*(reached[n][1] for n in nodes))) > 1:
+                score += CONNECTING_BONUS
+            if score > scores.get(fact, 0):
+                scores[fact] = score
+
+        ids, name = self.graph.ids, self.snapshot.display_name
+        for node in reached:
+            person = self.snapshot.by_id.get(ids[node])
+            if person:
+                add(person_fact(person), [node])
+            for child in self.graph.children[node]:
+                if child in reached:
+                    add(relationship_fact({"type": "parent", "parent_id": ids[node], "child_id": ids[child]}, name), [node, child])
+            for spouse in self.graph.spouses[node]:
+                if spouse in reached and node < spouse:
+                    add(relationship_fact({"type": "spouse", "person1_id": ids[node], "person2_id": ids[spouse]}, name), [node, spouse])
+        return scores
+
+    # ----- BM25 -----
+
+    def _bm25_index(self):
+        if self._bm25 is None:
+            with self._lock:
+                if self._bm25 is None:
+                    with span("rag.bm25_index"):
+                        snapshot = self.snapshot
+                        docs = [person_fact(p) for p in snapshot.by_id.values()]
+                        name = snapshot.display_name
+                        docs += [f for f in (relationship_fact(r, name) for r in snapshot.relationships.values()) if f]
+                        postings, lengths = {}, []
+                        for i, doc in enumerate(docs):
+                            terms = Counter(tokenize(doc))
+                            lengths.append(sum(terms.values()))
+                            for term, tf in terms.items():
+                                postings.setdefault(term, []).append((i, tf))
+                        avg = sum(lengths) / len(lengths) if lengths else 1.0
+                        self._bm25 = (docs, postings, lengths, avg)
+        return self._bm25
+
+    def bm25(self, question, k=BM25_K):
+        """Top-k {fact: score} by BM25 over every fact in the tree."""
+        docs, postings, lengths, avg = self._bm25_index()
+        n = len(docs)
+        scores = {}
+        for term in set(tokenize(question)):
+            posting = postings.get(term)
+            if not posting or len(posting) > max(10, n * COMMON_TERM_SHARE):
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for i, tf in posting:
+                norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[i] / avg))
+                scores[i] = scores.get(i, 0.0) + idf * norm
+        top = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return {docs[i]: score for i, score in top}
+
+    # ----- Fusion -----
+
+    def retrieve(self, question, vector_hits=(), token_budget=CONTEXT_TOKENS):
+        """Ranked facts for `question` that fit in `token_budget`.
+
+        `vector_hits` are (fact, distance) pairs from the embedding store.
+        Returns [(fact, score)], best first.
+        """
+        with span("rag.graph"):
+            graph = self.graph_facts(self.mentions(question))
+        with span("rag.bm25"):
+            lexical = self.bm25(question)
+        vector = {doc: 1.0 / (1.0 + distance) for doc, distance in vector_hits if doc}
+
+        signals = [(graph, GRAPH_WEIGHT), (lexical, BM25_WEIGHT), (vector, VECTOR_WEIGHT)]
+        combined = {}
+        for scores, weight in signals:
+            top = max(scores.values(), default=0) or 1.0
+            for fact, score in scores.items():
+                combined[fact] = combined.get(fact, 0.0) + weight * score / top
+
+        picked, used = [], 0
+        for fact, score in sorted(combined.items(), key=lambda item: -item[1]):
+            cost = estimate_tokens(fact)
+            if used + cost > token_budget:
+                continue
+            picked.append((fact, round(score, 4)))
+            used += cost
+        return picked
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever():
+    """Retriever for the current store version (its indexes are rebuilt only on change)."""
+    global _retriever
+    store = get_store()
+    if _retriever is None or _retriever.version != store.version:
+        with _retriever_lock:
+            if _retriever is None or _retriever.version != store.version:
+                _retriever = HybridRetriever(store)
+    return _retriever
+
+
+def build_context(question, vector_hits=(), token_budget=CONTEXT_TOKENS):
+    """Newline-separated facts for the prompt."""
+    return "\n".join(fact for fact, _ in get_retriever().retrieve(question, vector_hits, token_budget))
@@ -0,0 +1,150 @@
+from utils.delta import SessionDelta
+from utils.storage import JsonStorage
+from utils.store import FamilyStore
+
+
+def make_store(tmp_path, people=(), relationships=()):
+    storage = JsonStorage(str(tmp_path / "people.json"), str(tmp_path / "relationships.json"), str(tmp_path / "journal.jsonl"))
+    store = FamilyStore(storage)
+    store.commit([{"op": "add_person", "person": p} for p in people]
+                 + [{"op": "add_relationship", "relationship": r} for r in relationships])
+    return store
+
+
+def test_identical_new_people_from_two_sessions_are_both_kept(tmp_path):
+    store = make_store(tmp_path, [{"id": "1", "firstname": "Sita", "gender": "Female"}])
+    first, second = SessionDelta(store), SessionDelta(store)
+    for delta in (first, second):
+        delta.add_person({"id": store.next_id(), "firstname": "Ravi", "gender": "Male"})
+
+    assert first.save(store) == (1, [], [])
+    saved, conflicts, notes = second.save(store)
+
+    assert (saved, conflicts) == (1, [])
+    assert notes == ["ID 2 was taken by someone else; Ravi was saved as ID 3."]
+    assert sorted(p["id"] for p in store.by_name["Ravi"]) == ["2", "3"]
+
+
+def test_renumbered_person_keeps_their_links_and_ids_stay_unique(tmp_path):
+    store = make_store(tmp_path, [{"id": "1", "firstname": "Sita"}])
+    delta = SessionDelta(store)
+    delta.add_person({"id": "2", "firstname": "Ravi"})
+    delta.add_person({"id": "3", "firstname": "Anu"})
+    delta.add_relationship({"type": "parent", "parent_id": "1", "child_id": "2"})
+    store.commit([{"op": "add_person", "person": {"id": "2", "firstname": "Mohan"}}])
+
+    delta.save(store)
+
+    assert [p["firstname"] for p in store.people] == ["Sita", "Mohan", "Ravi", "Anu"]
+    assert len({p["id"] for p in store.people}) == 4
+    ravi = store.by_name["Ravi"][0]["id"]
+    assert store.children_of("1") == [ravi]
+
+
+def test_links_are_checked_against_earlier_links_in_the_batch(tmp_path):
+    from utils.integrity import validate_tree
+
+    store = make_store(tmp_path, [{"id": str(i), "firstname": f"P{i}"} for i in range(1, 5)])
+    delta = SessionDelta(store)
+    for parent, child in [("1", "2"), ("2", "1"), ("3", "4"), ("1", "4"), ("2", "4")]:
+        delta.add_relationship({"type": "parent", "parent_id": parent, "child_id": child})
+
+    saved, conflicts, notes = delta.save(store)
+
+    assert saved == 0 and store.relationships == []
+    assert [(c["op"]["relationship"]["parent_id"], c["op"]["relationship"]["child_id"]) for c in conflicts] == [("2", "1"), ("2", "4")]
+    assert all(c["rejected"] for c in conflicts)
+    assert len(delta) == 5
+    # Dropping the rejected links lets the rest through, and the result is a valid tree
+    for conflict in conflicts:
+        delta.discard(conflict["op"])
+    assert delta.save(store)[:2] == (3, [])
+    assert validate_tree(store.people, store.relationships)["errors"] == []
+
+
+def test_a_removed_parent_link_frees_its_slot_in_the_same_batch(tmp_path):
+    store = make_store(
+        tmp_path, [{"id": str(i), "firstname": f"P{i}"} for i in range(1, 5)],
+        [{"type": "parent", "parent_id": "1", "child_id": "3"}, {"type": "parent", "parent_id": "2", "child_id": "3"}],
+    )
+    delta = SessionDelta(store)
+    delta.add_relationship({"type": "parent", "parent_id": "4", "child_id": "3"})
+    assert delta.save(store)[0] == 0
+
+    delta = SessionDelta(store)
+    delta.delete_relationship({"type": "parent", "parent_id": "2", "child_id": "3"})
+    delta.add_relationship({"type": "parent", "parent_id": "4", "child_id": "3"})
+    assert delta.save(store)[:2] == (2, [])
+    assert sorted(store.parents_of("3")) == ["1", "4"]
+
+
+def test_unsaved_links_count_when_checking_a_new_one(tmp_path):
+    from utils.integrity import get_checker
+
+    store = make_store(tmp_path, [{"id": str(i), "firstname": f"P{i}"} for i in range(1, 5)])
+    delta = SessionDelta(store)
+    delta.add_relationship({"type": "parent", "parent_id": "1", "child_id": "2"})
+    delta.add_relationship({"type": "parent", "parent_id": "3", "child_id": "4"})
+    delta.add_relationship({"type": "parent", "parent_id": "1", "child_id": "4"})
+
+    def codes(rel):
+        return [i["code"] for i in get_checker(store).check_link(rel, delta.pending_links(store)) if i["severity"] == "error"]
+
+    assert codes({"type": "parent", "parent_id": "2", "child_id": "1"}) == ["cycle"]
+    assert codes({"type": "parent", "parent_id": "2", "child_id": "4"}) == ["too_many_parents"]
+    assert codes({"type": "parent", "parent_id": "1", "child_id": "2"}) == ["duplicate"]
+    assert codes({"type": "parent", "parent_id": "3", "child_id": "2"}) == []
+
+
+def test_edits_to_different_fields_merge(tmp_path):
+    store = make_store(tmp_path, [{"id": "1", "firstname": "Sita", "gender": ""}])
+    mine, theirs = SessionDelta(store), SessionDelta(store)
+    mine.update_person(store.by_id["1"], {"firstname": "Seetha"})
+    theirs.update_person(store.by_id["1"], {"gender": "Female"})
+
+    assert theirs.save(store) == (1, [], [])
+    assert mine.save(store) == (1, [], [])
+    assert store.by_id["1"] == {"id": "1", "firstname": "Seetha", "gender": "Female"}
+    assert len(mine) == 0
+
+
+def test_edits_to_the_same_field_conflict_until_resolved(tmp_path):
+    store = make_store(tmp_path, [{"id": "1", "firstname": "Sita", "gender": ""}])
+    mine, theirs = SessionDelta(store), SessionDelta(store)
+    mine.update_person(store.by_id["1"], {"firstname": "Seetha", "gender": "Female"})
+    theirs.update_person(store.by_id["1"], {"firstname": "Sitha"})
+    theirs.save(store)
+
+    saved, conflicts, notes = mine.save(store)
+
+    # The untouched field goes through; the clashing one waits for the user
+    assert saved == 1 and store.by_id["1"] == {"id": "1", "firstname": "Sitha", "gender": "Female"}
+    assert conflicts[0]["message"] == "Sitha was edited by someone else: firstname is now 'Sitha' (you set 'Seetha')."
+    assert not conflicts[0].get("rejected")
+    assert mine.ops == [conflicts[0]["op"]] and mine.ops[0]["fields"] == {"firstname": "Seetha"}
+    mine.accept_current(mine.ops[0], store)
+    assert mine.save(store) == (1, [], [])
+    assert store.by_id["1"]["firstname"] == "Seetha"
+
+
+def test_deletes_conflict_with_edits(tmp_path):
+    store = make_store(tmp_path, [{"id": "1", "firstname": "Sita"}, {"id": "2", "firstname": "Ravi"}, {"id": "3", "firstname": "Anu"}])
+    mine = SessionDelta(store)
+    mine.update_person(store.by_id["1"], {"firstname": "Seetha"})
+    mine.delete_person(store.by_id["2"])
+    mine.delete_person(store.by_id["3"])
+    store.commit([
+        {"op": "delete_person", "id": "1"},
+        {"op": "update_person", "id": "2", "fields": {"firstname": "Ravi Kumar"}},
+        {"op": "delete_person", "id": "3"},
+    ])
+
+    saved, conflicts, notes = mine.save(store)
+
+    assert saved == 0
+    assert [c["message"] for c in conflicts] == [
+        "Person 1 was deleted by someone else.",
+        "Ravi Kumar was edited by someone else after you deleted them.",
+    ]
+    assert notes == ["Person 3 had already been deleted."]
+    assert store.by_id["2"]["firstname"] == "Ravi Kumar"
@@ -0,0 +1,70 @@
+from utils.gedcom import export_gedcom, import_gedcom
+from utils.storage import JsonStorage, relationship_ends
+from utils.store import FamilyStore
+
+
+def make_store(path):
+    path.mkdir()
+    return FamilyStore(JsonStorage(str(path / "people.json"), str(path / "relationships.json"), str(path / "journal.jsonl")))
+
+
+def links(store):
+    name = {p["id"]: p["firstname"] for p in store.people}
+    out = []
+    for rel in store.relationships:
+        ends = [name[pid] for pid in relationship_ends(rel)]
+        out.append((rel["type"], *(sorted(ends) if rel["type"] == "spouse" else ends)))
+    return sorted(out)
+
+
+def test_export_then_import_keeps_people_and_links(tmp_path):
+    people = [
+        {"id": "1", "firstname": "Gopal", "surname": "Rao", "gender": "Male", "birth_year": "1901", "death_year": "1970", "marriage_year": "1925"},
+        {"id": "2", "firstname": "Lakshmi", "surname": "Rao", "gender": "Female", "birth_year": "1905", "death_year": "", "marriage_year": "1925"},
+        {"id": "3", "firstname": "Ravi", "surname": "Rao", "gender": "Male", "birth_year": "1930", "death_year": "", "marriage_year": ""},
+        {"id": "4", "firstname": "Anu", "surname": "", "gender": "Female", "birth_year": "", "death_year": "", "marriage_year": ""},
+    ]
+    source = make_store(tmp_path / "source")
+    source.commit([{"op": "add_person", "person": p} for p in people] + [
+        {"op": "add_relationship", "relationship": r} for r in [
+            {"type": "spouse", "person1_id": "1", "person2_id": "2"},
+            {"type": "parent", "parent_id": "1", "child_id": "3"},
+            {"type": "parent", "parent_id": "2", "child_id": "3"},
+            # A parent without a spouse in the tree gets a family of their own
+            {"type": "parent", "parent_id": "3", "child_id": "4"},
+        ]
+    ])
+    path = str(tmp_path / "tree.ged")
+    export_gedcom(path, source)
+
+    target = make_store(tmp_path / "target")
+    stats = import_gedcom(path, target, batch_size=2)
+
+    assert stats == {"records": 8, "people": 4, "relationships": 4}
+    assert sorted(target.people, key=lambda p: p["firstname"]) == sorted(
+        ({**p, "id": target.by_name[p["firstname"]][0]["id"]} for p in people), key=lambda p: p["firstname"])
+    assert links(target) == links(source)
+
+
+def test_families_may_come_before_their_members(tmp_path):
+    path = tmp_path / "tree.ged"
+    path.write_text("\n".join([
+        "0 HEAD",
+        "0 @F1@ FAM", "1 HUSB @I1@", "1 WIFE @I2@", "1 CHIL @I3@", "1 MARR", "2 DATE 12 MAR 1950",
+        "0 @I1@ INDI", "1 NAME Mohan /Das/", "1 SEX M", "1 BIRT", "2 DATE ABT 1920",
+        "0 @I2@ INDI", "1 NAME /Das/", "2 GIVN Uma", "1 SEX F",
+        "0 @I3@ INDI", "1 SEX X",
+        "0 TRLR",
+    ]), encoding="utf-8")
+    store = make_store(tmp_path / "store")
+    store.commit([{"op": "add_person", "person": {"id": "7", "firstname": "Sita"}}])
+
+    assert import_gedcom(str(path), store)["relationships"] == 3
+
+    mohan, uma = store.by_name["Mohan"][0], store.by_name["Uma"][0]
+    assert (mohan["id"], mohan["birth_year"], mohan["marriage_year"]) == ("8", "1920", "1950")
+    assert (uma["surname"], uma["gender"], uma["marriage_year"]) == ("Das", "Female", "1950")
+    # No name falls back to the xref
+    assert store.by_name["I3"][0]["gender"] == "Other"
+    assert sorted(store.parents_of(store.by_name["I3"][0]["id"])) == ["8", "9"]
+    assert store.spouses_of("8") == ["9"]
@@ -0,0 +1,59 @@
+from utils.graph import Adjacency, FamilyGraph
+
+
+def rows(adjacency, size):
+    return [sorted(adjacency[n]) for n in range(size)]
+
+
+def graph():
+    # a and b are spouses with children c and d; c has e
+    return FamilyGraph("abcde", [("a", "c"), ("b", "c"), ("a", "d"), ("b", "d"), ("c", "e")], [("a", "b")])
+
+
+def test_csr_rows():
+    adjacency = Adjacency(4, [2, 0, 2, 0], [3, 1, 0, 2])
+
+    assert list(adjacency.offsets) == [0, 2, 2, 4, 4]
+    assert rows(adjacency, 4) == [[1, 2], [], [0, 3], []]
+    assert adjacency[7] == ()
+    assert list(adjacency.degrees()) == [2, 0, 2, 0]
+
+
+def test_graph_links_by_node():
+    g = graph()
+    a, b, c, d, e = (g.node(pid) for pid in "abcde")
+
+    assert sorted(g.children[a]) == [c, d]
+    assert sorted(g.parents[c]) == [a, b]
+    assert list(g.spouses[a]) == [b] and list(g.spouses[b]) == [a]
+    assert g.node("z", create=False) is None and len(g) == 5
+    assert g.walk(e, [g.parents], 2) == {e: 0, c: 1, a: 2, b: 2}
+    assert [sorted(level.tolist()) for level in g.levels([a], g.children, 3)] == [[c, d], [e]]
+
+
+def test_edits_patch_rows_and_compact_to_the_same_graph():
+    g = graph()
+    g.add_parent("d", "f")
+    g.remove_parent("b", "d")
+    g.add_spouse("c", "g")
+    g.remove_spouse("a", "b")
+    nodes = len(g)
+    patched = [rows(adj, nodes) for adj in (g.children, g.parents, g.spouses)]
+
+    assert g.children.patched and g.node("f") == 5
+    sources, targets = g.children.edges()
+    assert sorted(zip(sources.tolist(), targets.tolist())) == [(0, 2), (0, 3), (1, 2), (2, 4), (3, 5)]
+    g.compact()
+    assert g.children.patched == g.parents.patched == g.spouses.patched == 0
+    assert [rows(adj, nodes) for adj in (g.children, g.parents, g.spouses)] == patched
+
+
+def test_copy_is_independent():
+    g = graph()
+    other = g.copy()
+    other.add_parent("e", "f")
+    g.remove_parent("c", "e")
+
+    assert list(other.parents[other.node("e")]) == [other.node("c")]
+    assert list(other.children[other.node("e")]) == [5]
+    assert list(g.children[g.node("e")]) == [] and g.node("f", create=False) is None
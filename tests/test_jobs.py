@@ -0,0 +1,75 @@
+import threading
+import time
+
+from utils.jobs import ACTIVE, JobQueue
+
+
+def wait(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["state"] not in ACTIVE:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['state']}")
+
+
+def gated_tasks(ran, gate):
+    def echo(payload, job):
+        job.progress(0, 1, "Waiting")
+        gate.wait(5)
+        ran.append(payload["n"])
+        if payload["n"] == "boom":
+            raise ValueError("bad input")
+        return payload["n"]
+    return {"echo": echo}
+
+
+def test_owners_take_turns(tmp_path):
+    ran, gate = [], threading.Event()
+    queue = JobQueue(str(tmp_path / "jobs.db"), workers=1, tasks=gated_tasks(ran, gate))
+    first = queue.submit("echo", {"n": "a0"}, "a")
+    while queue.get(first)["state"] != "running":
+        time.sleep(0.01)
+    jobs = {n: queue.submit("echo", {"n": n}, n[0]) for n in ["a1", "a2", "a3", "b1", "c1"]}
+
+    # One session queuing several jobs does not hold up the others
+    assert [queue.position(jobs[n]) for n in ["a1", "b1", "c1", "a2", "a3"]] == [0, 1, 2, 3, 4]
+    assert queue.submit("echo", {"n": "a2"}, "a") == jobs["a2"]
+    assert queue.cancel(jobs["a3"]) and queue.get(jobs["a3"])["state"] == "cancelled"
+    gate.set()
+    for job_id in jobs.values():
+        wait(queue, job_id)
+
+    assert ran == ["a0", "a1", "b1", "c1", "a2"]
+    assert queue.get(jobs["c1"])["result"] == "c1" and queue.get(jobs["c1"])["message"] == "Done"
+    assert not queue.cancel(jobs["c1"])
+
+
+def test_failures_are_recorded(tmp_path):
+    gate = threading.Event()
+    gate.set()
+    queue = JobQueue(str(tmp_path / "jobs.db"), workers=1, tasks=gated_tasks([], gate))
+
+    job = wait(queue, queue.submit("echo", {"n": "boom"}, "a"))
+
+    assert (job["state"], job["error"], job["result"]) == ("failed", "ValueError: bad input", None)
+
+
+def test_a_restart_runs_unfinished_jobs_again(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    stuck = threading.Event()
+    before = JobQueue(path, workers=1, tasks=gated_tasks([], stuck))
+    running = before.submit("echo", {"n": "x"}, "a")
+    while before.get(running)["state"] != "running":
+        time.sleep(0.01)
+    queued = before.submit("echo", {"n": "y"}, "b")
+
+    # A second queue on the same file stands in for the restarted process
+    ran, gate = [], threading.Event()
+    gate.set()
+    after = JobQueue(path, workers=1, tasks=gated_tasks(ran, gate))
+    assert wait(after, running)["result"] == "x"
+    assert wait(after, queued)["result"] == "y"
+    assert sorted(ran) == ["x", "y"]
+    stuck.set()
@@ -0,0 +1,115 @@
+import pytest
+
+from agents import kinship, reasoning_agent
+from agents.kinship import KinshipEngine, answer_kinship_question, parse_relation
+from utils.storage import JsonStorage
+from utils.store import FamilyStore
+
+PEOPLE = [
+    ("1", "Gopal", "Male"), ("2", "Lakshmi", "Female"), ("3", "Ravi", "Male"), ("4", "Sita", "Female"),
+    ("5", "Meena", "Female"), ("6", "Arun", "Male"), ("7", "Divya", "Female"), ("8", "Kiran", "Male"),
+    ("9", "Nila", "Female"), ("10", "Tara", "Female"), ("11", "Hari", "Male"), ("12", "Vijay", "Male"),
+    ("13", "Kavi", "Male"),
+]
+PARENTS = [
+    ("1", "3"), ("2", "3"), ("1", "4"), ("2", "4"),  # Gopal and Lakshmi: Ravi, Sita
+    ("3", "6"), ("5", "6"), ("3", "7"), ("5", "7"),  # Ravi and Meena: Arun, Divya
+    ("4", "9"), ("8", "9"), ("4", "13"), ("8", "13"),  # Sita and Kiran: Nila, Kavi
+    ("6", "10"),  # Arun: Tara
+    ("11", "5"), ("11", "12"),  # Hari: Meena, Vijay
+]
+SPOUSES = [("1", "2"), ("3", "5"), ("4", "8")]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    storage = JsonStorage(str(tmp_path / "people.json"), str(tmp_path / "relationships.json"), str(tmp_path / "journal.jsonl"))
+    store = FamilyStore(storage)
+    store.commit(
+        [{"op": "add_person", "person": {"id": i, "firstname": name, "gender": gender}} for i, name, gender in PEOPLE]
+        + [{"op": "add_relationship", "relationship": {"type": "parent", "parent_id": p, "child_id": c}} for p, c in PARENTS]
+        + [{"op": "add_relationship", "relationship": {"type": "spouse", "person1_id": a, "person2_id": b}} for a, b in SPOUSES]
+    )
+    monkeypatch.setattr(kinship, "get_store", lambda: store)
+    monkeypatch.setattr(reasoning_agent, "get_store", lambda: store)
+    return store
+
+
+def describe(store, a, b):
+    engine = KinshipEngine(store)
+    return engine.describe(engine.resolve(a), engine.resolve(b))
+
+
+def test_parse_relation():
+    assert parse_relation("great great grandmother") == {"term": "great great grandmother", "gender": "female", "kind": "up", "depth": 4}
+    assert parse_relation("Sons") == {"term": "sons", "gender": "male", "kind": "down", "depth": 1}
+    assert parse_relation("second cousin once removed") == {
+        "term": "second cousin once removed", "gender": None, "kind": "cousin", "degree": 2, "removed": 1}
+    assert parse_relation("third cousins 4 times removed")["removed"] == 4
+    assert parse_relation("brothers-in-law")["kind"] == "sibling_in_law"
+    assert parse_relation("great uncle")["depth"] == 2
+    for text in ("", "great father", "second uncle", "cousin removed", "uncle in law", "neighbour"):
+        assert parse_relation(text) is None
+
+
+def test_cousin_degree_and_removal(store):
+    engine = KinshipEngine(store)
+    arun, tara = engine.resolve("Arun"), engine.resolve("Tara")
+
+    assert sorted(engine.name(n) for n in engine.cousins(arun, 1, 0)) == ["Kavi", "Nila"]
+    assert sorted(engine.name(n) for n in engine.cousins(tara, 1, 1)) == ["Kavi", "Nila"]
+    assert engine.cousins(tara, 1, 0) == set()
+    assert describe(store, "Nila", "Tara") == "first cousin once removed"
+    assert describe(store, "Tara", "Nila") == "first cousin once removed"
+
+
+def test_describe(store):
+    assert describe(store, "Arun", "Gopal") == "grandfather"
+    assert describe(store, "Tara", "Lakshmi") == "great grandmother"
+    assert describe(store, "Gopal", "Tara") == "great granddaughter"
+    assert describe(store, "Arun", "Divya") == "sister"
+    assert describe(store, "Nila", "Ravi") == "uncle"
+    assert describe(store, "Sita", "Arun") == "nephew"
+    assert describe(store, "Arun", "Nila") == "first cousin"
+    assert describe(store, "Ravi", "Meena") == "wife"
+    assert describe(store, "Arun", "Arun") == "self"
+
+
+def test_in_laws(store):
+    assert describe(store, "Meena", "Gopal") == "father-in-law"
+    assert describe(store, "Lakshmi", "Kiran") == "son-in-law"
+    assert describe(store, "Ravi", "Vijay") == "brother-in-law"
+    assert describe(store, "Ravi", "Kiran") == "brother-in-law"
+    assert describe(store, "Vijay", "Arun") == "nephew"
+    assert answer_kinship_question("Who are Ravi's brothers-in-law?") == "Ravi's brothers-in-law are Kiran and Vijay."
+    assert answer_kinship_question("Who is the mother-in-law of Meena?") == "Meena's mother-in-law is Lakshmi."
+
+
+def test_answers_agree_with_the_number_found(store):
+    assert answer_kinship_question("Who is Arun's first cousin?") == "Arun's first cousins are Kavi and Nila."
+    assert answer_kinship_question("Who are Arun's siblings?") == "Arun's sibling is Divya."
+    assert answer_kinship_question("List the grandchildren of Gopal") == "Gopal's grandchildren are Arun, Divya, Kavi and Nila."
+    assert answer_kinship_question("Who are Tara's brothers?") == "I couldn't find Tara's brothers in the family tree."
+    assert answer_kinship_question("How is Tara related to Gopal?") == "Tara is Gopal's great granddaughter."
+
+
+def test_other_questions_fall_back_to_the_llm(store, monkeypatch):
+    prompts = []
+    monkeypatch.setattr(reasoning_agent, "embed", lambda texts: [[0.0]] * len(texts))
+    monkeypatch.setattr(reasoning_agent, "build_context", lambda question, hits: "Ravi is a farmer.")
+
+    class Collection:
+        def query(self, **kwargs):
+            return {"documents": [[]], "distances": [[]]}
+
+    monkeypatch.setattr(reasoning_agent, "get_collection", Collection)
+    monkeypatch.setattr(reasoning_agent.llm, "chat", lambda prompt, **kwargs: prompts.append(prompt) or "A farmer.")
+
+    # Unknown people and questions that are not about kinship are not guessed at
+    assert answer_kinship_question("Who is Zed's father?") is None
+    assert answer_kinship_question("What does Ravi do?") is None
+    assert reasoning_agent.query_family_question("What does Ravi do?") == "A farmer."
+    assert "Ravi is a farmer." in prompts[0]
+    # Kinship questions never reach the model
+    assert reasoning_agent.query_family_question("Who is Arun's father?") == "Arun's father is Ravi."
+    assert len(prompts) == 1
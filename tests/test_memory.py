@@ -0,0 +1,75 @@
+import pytest
+
+from agents import kinship
+from mcp import memory
+from mcp.memory import LocalMemory, MemoryToolError
+from utils import integrity
+from utils.storage import JsonStorage
+from utils.store import FamilyStore
+
+PEOPLE = [("1", "Gopal", "Male"), ("2", "Lakshmi", "Female"), ("3", "Ravi", "Male"), ("4", "Arun", "Male"), ("5", "Ravi", "Male")]
+PARENTS = [("1", "3"), ("2", "3"), ("3", "4")]
+
+
+@pytest.fixture
+def local(tmp_path, monkeypatch):
+    store = FamilyStore(JsonStorage(str(tmp_path / "people.json"), str(tmp_path / "relationships.json"), str(tmp_path / "journal.jsonl")))
+    store.commit(
+        [{"op": "add_person", "person": {"id": i, "firstname": name, "gender": gender}} for i, name, gender in PEOPLE]
+        + [{"op": "add_relationship", "relationship": {"type": "parent", "parent_id": p, "child_id": c}} for p, c in PARENTS]
+        + [{"op": "add_relationship", "relationship": {"type": "spouse", "person1_id": "1", "person2_id": "2"}}]
+    )
+    for module in (memory, kinship, integrity):
+        monkeypatch.setattr(module, "get_store", lambda: store)
+    return LocalMemory()
+
+
+def test_graph_tools(local):
+    person = local.call("lookup_person", name="#3")
+
+    assert person["record"] == {"id": "3", "firstname": "Ravi", "gender": "Male"}
+    assert [p["name"] for p in person["parents"]] == ["Gopal", "Lakshmi"]
+    assert person["children"] == [{"id": "4", "name": "Arun"}]
+    assert local.call("ancestors", name="Arun") == {"name": "Arun", "ancestors": {"Ravi (#3)": 1, "Gopal": 2, "Lakshmi": 2}}
+    assert local.call("descendants", name="Gopal", generations=1) == {"name": "Gopal", "descendants": {"Ravi (#3)": 1}}
+    assert local.call("kinship", a="Arun", b="Lakshmi")["relation"] == "grandmother"
+
+
+def test_a_batch_is_one_round_trip_in_order(local):
+    sent = []
+    send = local._send
+    local._send = lambda payload: sent.append(payload) or send(payload)
+
+    results = local.batch([("kinship", {"a": "Gopal", "b": "Lakshmi"}), ("lookup_person", {"name": "Arun"})])
+
+    assert len(sent) == 1 and len(sent[0]) == 2
+    assert results[0]["relation"] == "wife" and results[1]["id"] == "4"
+
+
+def test_tool_failures_raise(local):
+    with pytest.raises(MemoryToolError, match="2 people are called 'Ravi'; use one of #3, #5."):
+        local.call("lookup_person", name="Ravi")
+    with pytest.raises(MemoryToolError, match="No person named 'Zed'"):
+        local.call("kinship", a="Zed", b="Arun")
+    with pytest.raises(MemoryToolError, match="Unknown tool 'delete_everything'"):
+        local.call("delete_everything")
+    with pytest.raises(MemoryToolError, match="relationship must be"):
+        local.call("add_relationship", relationship={"type": "parent", "parent_id": "1"})
+
+
+def test_add_relationship_is_checked_before_it_is_saved(local):
+    cycle = local.call("add_relationship", relationship={"type": "parent", "parent_id": "4", "child_id": "1"})
+    assert not cycle["added"] and [i["code"] for i in cycle["issues"]] == ["cycle"]
+
+    assert local.call("add_relationship", relationship={"type": "parent", "parent_id": "5", "child_id": "4"})["added"]
+    assert sorted(memory.get_store().parents_of("4")) == ["3", "5"]
+    assert local.call("lookup_person", name="#5")["children"] == [{"id": "4", "name": "Arun"}]
+
+
+def test_protocol_messages(local):
+    service = local.service
+
+    assert [t["name"] for t in service.handle({"jsonrpc": "2.0", "id": 1, "method": "tools/list"})["result"]["tools"]] == list(memory.TOOLS)
+    assert service.handle({"jsonrpc": "2.0", "method": "notifications/initialized"}) is None
+    assert service.handle({"jsonrpc": "2.0", "id": 2, "method": "nope"})["error"]["code"] == -32601
+    assert service.handle(["not a request"]) == [{"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid request"}}]
@@ -0,0 +1,79 @@
+from utils.name_index import NameIndex, compact, phonetic_key, relatives_in
+from utils.storage import JsonStorage
+from utils.store import FamilyStore
+
+PEOPLE = [
+    {"id": "1", "firstname": "Vijaya Laxmi", "surname": "Rao", "gender": "Female", "birth_year": "1950"},
+    {"id": "2", "firstname": "Srinivas", "surname": "Rao", "gender": "Male", "birth_year": "1948"},
+    {"id": "3", "firstname": "Anu", "surname": "Rao", "gender": "Female", "birth_year": "1975"},
+    {"id": "4", "firstname": "Vijay", "surname": "Kumar", "gender": "Male", "birth_year": "1990"},
+]
+
+
+def make_index(tmp_path):
+    store = FamilyStore(JsonStorage(str(tmp_path / "people.json"), str(tmp_path / "relationships.json"), str(tmp_path / "journal.jsonl")))
+    store.commit([{"op": "add_person", "person": p} for p in PEOPLE] + [
+        {"op": "add_relationship", "relationship": {"type": "spouse", "person1_id": "1", "person2_id": "2"}},
+        {"op": "add_relationship", "relationship": {"type": "parent", "parent_id": "1", "child_id": "3"}},
+    ])
+    index = NameIndex()
+    index.sync(store)
+    return store, index
+
+
+def ids(results):
+    return [existing["id"] for _, existing, _ in results]
+
+
+def test_name_keys():
+    assert compact("Vijaya Laxmi") == "vijayalaxmi"
+    assert phonetic_key("Srinivas") == phonetic_key("Sreenivas") == phonetic_key("Shrinivas")
+    assert phonetic_key("Lakshmi") == phonetic_key("Laxmi")
+    assert phonetic_key("Anu") != phonetic_key("Vijay")
+    assert phonetic_key("123") == ""
+
+
+def test_spelling_variants_match(tmp_path):
+    store, index = make_index(tmp_path)
+
+    assert ids(index.match({"firstname": "Sreenivas"})) == ["2"]
+    assert ids(index.match({"firstname": "Vijayalakshmi", "surname": "Rao"}))[0] == "1"
+    assert index.match({"firstname": "Prasanna"}) == []
+
+
+def test_details_and_relatives_rank_candidates(tmp_path):
+    store, index = make_index(tmp_path)
+    person = {"firstname": "Vijaya", "gender": "Female", "birth_year": "1950"}
+
+    plain = dict((existing["id"], score) for score, existing, _ in index.match(person))
+    assert plain["1"] > plain["4"]
+    score, existing, reasons = index.match(person, relatives=["Srinivas", "Anu"])[0]
+    assert existing["id"] == "1" and score > plain["1"]
+    assert reasons[-1] == "2 shared relative(s)"
+    _, _, reasons = index.match({"firstname": "Vijay", "surname": "Rao", "gender": "Female", "birth_year": "1990"})[0]
+    assert reasons[1:] == ["different surname", "different gender", "same birth year"]
+
+
+def test_sync_rekeys_only_changed_people(tmp_path):
+    store, index = make_index(tmp_path)
+    untouched = index._people["3"]
+    store.commit([
+        {"op": "update_person", "id": "2", "fields": {"firstname": "Mohan"}},
+        {"op": "delete_person", "id": "4"},
+    ])
+    index.sync(store)
+
+    assert index._people["3"] is untouched
+    assert ids(index.match({"firstname": "Srinivas"})) == []
+    assert ids(index.match({"firstname": "Mohan"})) == ["2"]
+    assert "4" not in ids(index.match({"firstname": "Vijay"}))
+
+
+def test_relatives_in_extracted_links():
+    relationships = [
+        {"type": "parent", "parent": "Vijaya Laxmi", "child": "Anu"},
+        {"type": "spouse", "person1": "Srinivas", "person2": "vijayalaxmi"},
+        {"type": "parent", "parent": "Anu", "child": ""},
+    ]
+    assert relatives_in("Vijaya laxmi", relationships) == ["Anu", "Srinivas"]
+    assert relatives_in("Anu", relationships) == ["Vijaya Laxmi"]
@@ -0,0 +1,28 @@
+from retriever.facts import FactTables, iter_facts
+from retriever.rag import HybridRetriever
+from utils.storage import JsonStorage
+from utils.store import FamilyStore
+
+
+def test_indexes_describe_the_version_they_were_built_for(tmp_path):
+    store = FamilyStore(JsonStorage(str(tmp_path / "people.json"), str(tmp_path / "relationships.json"), str(tmp_path / "journal.jsonl")))
+    store.commit([
+        {"op": "add_person", "person": {"id": "1", "firstname": "Ravi", "gender": "Male"}},
+        {"op": "add_person", "person": {"id": "2", "firstname": "Sita", "gender": "Female"}},
+        {"op": "add_relationship", "relationship": {"type": "parent", "parent_id": "1", "child_id": "2"}},
+    ])
+    retriever, tables = HybridRetriever(store), FactTables(store)
+    facts = ["Ravi is a male.", "Sita is a female.", "Ravi is a parent of Sita."]
+
+    # Another session saves before either index is read
+    store.commit([
+        {"op": "update_person", "id": "1", "fields": {"firstname": "Mohan"}},
+        {"op": "add_person", "person": {"id": "3", "firstname": "Ravi"}},
+        {"op": "add_relationship", "relationship": {"type": "parent", "parent_id": "3", "child_id": "2"}},
+    ])
+
+    assert retriever.version == tables.version != store.version
+    assert retriever._bm25_index()[0] == facts
+    assert list(iter_facts(tables)) == facts and len(tables) == 3
+    assert retriever.graph_facts(retriever.mentions("Who is Ravi?")) == {fact: 1.0 / (1 + hop) for fact, hop in [
+        ("Ravi is a male.", 0), ("Sita is a female.", 1), ("Ravi is a parent of Sita.", 1)]}
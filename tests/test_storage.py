@@ -0,0 +1,69 @@
+import pytest
+
+from utils.storage import JsonStorage, SqliteStorage
+from utils.store import FamilyStore, StoreLoadError
+
+PEOPLE = [{"id": str(i), "firstname": name} for i, name in enumerate(["Ravi", "Sita", "Anu", "Ravi"], 1)]
+LINKS = [
+    {"type": "parent", "parent_id": "1", "child_id": "3"},
+    {"type": "parent", "parent_id": "2", "child_id": "3"},
+    {"type": "spouse", "person1_id": "1", "person2_id": "2"},
+]
+
+
+def sqlite_store(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "family.db"))
+    storage.bulk_load(PEOPLE, LINKS)
+    store = FamilyStore(storage)
+    store.refresh()
+    return storage, store
+
+
+def test_sqlite_store_answers_lookups_from_the_database(tmp_path):
+    storage, store = sqlite_store(tmp_path)
+    # Rows written behind the store's back are seen: the lookups query SQLite
+    storage.append([{"op": "add_relationship", "relationship": {"type": "parent", "parent_id": "1", "child_id": "4"}}])
+
+    assert sorted(store.children_of("1")) == ["3", "4"]
+    assert sorted(store.parents_of("3")) == ["1", "2"]
+    assert store.spouses_of("2") == ["1"]
+    assert store.has_relationship({"type": "spouse", "person1_id": "2", "person2_id": "1"})
+    assert [p["id"] for p in storage.find_people("Ravi")] == ["1", "4"]
+
+
+def test_sqlite_schema_indexes_lookup_columns(tmp_path):
+    storage, _ = sqlite_store(tmp_path)
+    indexed = {row[0] for row in storage.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    assert {"idx_people_firstname", "idx_rel_parent", "idx_rel_child", "idx_rel_person1", "idx_rel_person2"} <= indexed
+    plan = storage.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT child FROM relationships WHERE type = 'parent' AND parent = ?", ("1",)
+    ).fetchall()
+    assert "idx_rel_parent" in str(plan)
+
+
+def test_json_store_answers_lookups_from_its_graph(tmp_path):
+    storage = JsonStorage(str(tmp_path / "people.json"), str(tmp_path / "relationships.json"), str(tmp_path / "journal.jsonl"))
+    store = FamilyStore(storage)
+    store.commit([{"op": "add_person", "person": p} for p in PEOPLE]
+                 + [{"op": "add_relationship", "relationship": r} for r in LINKS])
+
+    assert sorted(store.children_of("1")) == ["3"]
+    assert store.spouses_of("2") == ["1"]
+    assert not store.has_relationship({"type": "parent", "parent_id": "3", "child_id": "1"})
+
+
+def test_unreadable_files_keep_the_loaded_tree_and_block_saves(tmp_path):
+    storage = JsonStorage(str(tmp_path / "people.json"), str(tmp_path / "relationships.json"), str(tmp_path / "journal.jsonl"))
+    store = FamilyStore(storage)
+    store.commit([{"op": "add_person", "person": {"id": "1", "firstname": "Sita"}}])
+    with open(storage.people_path, "w", encoding="utf-8") as f:
+        f.write('[{"id": "1", "firstn')
+
+    with pytest.raises(StoreLoadError):
+        store.refresh()
+    assert store.by_id["1"]["firstname"] == "Sita"
+    # Nothing is written over files the store could not read
+    with pytest.raises(StoreLoadError):
+        store.commit([{"op": "add_person", "person": {"id": "2", "firstname": "Ravi"}}])
+    assert [op["person"]["id"] for op in storage.journal.replay()] == ["1"]
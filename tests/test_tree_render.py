@@ -0,0 +1,24 @@
+from collections import OrderedDict
+
+from ui import tree_tab
+from utils import helpers
+from utils.storage import JsonStorage
+from utils.store import FamilyStore
+
+
+def test_rendered_html_is_cached_under_the_graph_version(tmp_path, monkeypatch):
+    store = FamilyStore(JsonStorage(str(tmp_path / "people.json"), str(tmp_path / "relationships.json"), str(tmp_path / "journal.jsonl")))
+    store.commit([{"op": "add_person", "person": {"id": "1", "firstname": "Ravi"}}])
+    monkeypatch.setattr(helpers, "get_store", lambda: store)
+    monkeypatch.setattr(helpers, "_graph_cache", {})
+    monkeypatch.setattr(tree_tab, "_render_cache", OrderedDict())
+    old = helpers.build_graph()
+
+    # A save lands between building the graph and rendering it
+    store.commit([{"op": "update_person", "id": "1", "fields": {"firstname": "Mohan"}}])
+    stale = tree_tab.render_tree_html(old, set(), ("Whole tree",))
+    new = helpers.build_graph()
+
+    assert old.graph["version"] != new.graph["version"] == store.version
+    assert "Ravi" in stale
+    assert "Mohan" in tree_tab.render_tree_html(new, set(), ("Whole tree",))
@@ -1,26 +1,40 @@
+import httpx
+import ollama
 import streamlit as st
-from agents.reasoning_agent import ingest_documents, query_family_question
-from utils.helpers import load_people
-
-def generate_facts():
-    df = load_people()
-    facts = []
-    for _, row in df.iterrows():
-        facts.append(f"{row['name']} is a {row['gender']} born on {row['dob']} living in {row['location']}.")
-        facts.append(f"{row['name']} has a relationship as {row['relationship']}.")
-    return facts
+from agents.llm import LLMBusyError
+from agents.reasoning_agent import query_family_question
+from agents.llm_cache import get_cache
+from ui.jobs_panel import show_job, submit_job
 
 def show_ask_ai_tab():
     st.header("🤖 Ask AI about your Family Tree")
 
     if st.button("📥 Ingest Family Facts into Memory"):
-        facts = generate_facts()
-        ingest_documents(facts)
-        st.success("Family facts ingested into vector memory!")
+        # Embedding runs on the shared job workers, not in this script run
+        submit_job("ingest_job", "ingest", {})
+    job = show_job("ingest_job", "Ingestion")
+    if job and job["state"] == "done":
+        stats = job["result"]
+        st.success(
+            f"Family facts ingested into vector memory! "
+            f"({stats['added']} new, {stats['removed']} removed, {stats['unchanged']} unchanged)"
+        )
 
     query = st.text_input("💬 Ask a question (e.g., 'Who is Radha’s father?')")
     if query:
-        with st.spinner("Thinking..."):
-            answer = query_family_question(query)
-            st.success("Answer:")
-            st.write(answer)
\ No newline at end of file
+        st.success("Answer:")
+        try:
+            with st.spinner("Thinking..."):
+                # Tokens are rendered as the model produces them
+                st.write_stream(query_family_question(query, stream=True))
+        except LLMBusyError as e:
+            st.error(f"⚠️ {e}")
+        except (ConnectionError, TimeoutError, httpx.TransportError) as e:
+            st.error(f"⚠️ Could not reach the model, is Ollama running? ({e})")
+        except ollama.ResponseError as e:
+            st.error(f"⚠️ The model returned an error: {e}")
+        stats = get_cache().stats()
+        st.caption(
+            f"LLM cache: {stats['hits']} hits ({stats['semantic_hits']} similar-question), "
+            f"{stats['misses']} misses, {stats['entries']} entries"
+        )
@@ -1,23 +1,35 @@
+import math
 
 import streamlit as st
 import pandas as pd
-from utils.helpers import load_people, save_people, generate_unique_id
+from utils.delta import SessionDelta
+from utils.integrity import get_checker, validate_tree
+from utils.people_index import get_people_index, PAGE_SIZE
+from utils.storage import relationship_ends
+from utils.store import get_store, StaleVersionError
+
+RELATIONSHIP_COLUMNS = ["type", "from", "to", "from_id", "to_id"]
+EDITABLE_FIELDS = ["firstname", "surname", "gender", "birth_year", "death_year", "marriage_year"]
+
 
 def show_grid_tab():
     st.header("🧾 Person & Relationship Manager")
 
-    # Load or initialize session state
-    if 'people_df' not in st.session_state or 'relationships' not in st.session_state:
-        df, relationships = load_people()
-        st.session_state['people_df'] = df
-        st.session_state['relationships'] = relationships
-    else:
-        df = st.session_state['people_df']
-        relationships = st.session_state['relationships']
+    # Every session reads the one shared store; only its unsaved edits are kept here
+    store = get_store()
+    index = get_people_index()
+    if 'grid_delta' not in st.session_state:
+        st.session_state['grid_delta'] = SessionDelta(store)
+    delta = st.session_state['grid_delta']
+    pending_people = delta.added_people()
+    pending_names = {str(p["id"]): p["firstname"] for p in pending_people}
+
+    def name(pid):
+        return pending_names.get(pid) or store.display_name(pid)
 
-    # Show people table
+    # Show people table, one page at a time
     st.subheader("👤 People List")
-    st.dataframe(df)
+    show_people_page(index)
 
     # Add new person
     st.subheader("➕ Add New Person")
@@ -26,55 +38,220 @@ def show_grid_tab():
         gender = st.selectbox("Gender", ["Male", "Female", "Other"])
         submitted = st.form_submit_button("Add Person")
         if submitted:
-            new_id = generate_unique_id(df)
-            new_row = {"id": new_id, "firstname": firstname, "gender": gender}
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            st.session_state['people_df'] = df
+            new_id = str(max([int(store.next_id())] + [int(p["id"]) + 1 for p in pending_people]))
+            delta.add_person({"id": new_id, "firstname": firstname, "gender": gender})
             st.success(f"✅ Added {firstname} (ID: {new_id})")
             st.rerun()
 
+    # Edit or delete an existing person
+    st.subheader("✏️ Edit or Delete a Person")
+    pid = person_picker("Person to edit", "edit_person", index)
+    current = store.by_id.get(pid) if pid else None
+    if current:
+        with st.form("edit_person_form"):
+            cols = st.columns(3)
+            fields = {
+                field: cols[i % 3].text_input(field.replace("_", " ").title(), str(current.get(field, "") or ""))
+                for i, field in enumerate(EDITABLE_FIELDS)
+            }
+            col1, col2 = st.columns(2)
+            if col1.form_submit_button("Update Person"):
+                delta.update_person(current, fields)
+                st.rerun()
+            if col2.form_submit_button("🗑️ Delete Person"):
+                delta.delete_person(current)
+                for rel in _links_of(store, pid):
+                    delta.delete_relationship(rel)
+                for op in [o for o in delta.ops if o["op"] == "add_relationship" and pid in relationship_ends(o["relationship"])]:
+                    delta.discard(op)
+                st.rerun()
+
     # Add spouse relationship
     st.subheader("💍 Add Spouse Relationship")
-    people_options = df["firstname"].tolist()
-    person1 = st.selectbox("Person 1", people_options, key="spouse1")
-    person2 = st.selectbox("Person 2", people_options, key="spouse2")
+    person1 = person_picker("Person 1", "spouse1", index, pending_people)
+    person2 = person_picker("Person 2", "spouse2", index, pending_people)
     if st.button("Link as Spouses"):
-        if person1 != person2 and not any(r for r in relationships if r["type"]=="spouse" and set([r["person1"], r["person2"]])==set([person1, person2])):
-            relationships.append({"type": "spouse", "person1": person1, "person2": person2})
-            st.session_state['relationships'] = relationships
-            st.success(f"Linked {person1} and {person2} as spouses.")
+        rel = {"type": "spouse", "person1_id": person1, "person2_id": person2}
+        if person1 and person2 and _accept_link(rel, delta):
+            delta.add_relationship(rel)
+            st.success(f"Linked {name(person1)} and {name(person2)} as spouses.")
             st.rerun()
 
     # Add parent-child relationship
     st.subheader("👨‍👩‍👧 Add Parent-Child Relationship")
-    parent = st.selectbox("Parent", people_options, key="parent")
-    child = st.selectbox("Child", people_options, key="child")
+    parent = person_picker("Parent", "parent", index, pending_people)
+    child = person_picker("Child", "child", index, pending_people)
     if st.button("Link as Parent-Child"):
-        if parent != child and not any(r for r in relationships if r["type"]=="parent" and r["parent"]==parent and r["child"]==child):
-            relationships.append({"type": "parent", "parent": parent, "child": child})
-            st.session_state['relationships'] = relationships
-            st.success(f"Linked {parent} as parent of {child}.")
+        rel = {"type": "parent", "parent_id": parent, "child_id": child}
+        if parent and child and _accept_link(rel, delta):
+            delta.add_relationship(rel)
+            st.success(f"Linked {name(parent)} as parent of {name(child)}.")
             st.rerun()
 
     # Show relationships table with names instead of IDs
     st.subheader("🔗 Relationships")
-    rel_display = []
-    for r in relationships:
-        if r['type'] == 'spouse':
-            rel_display.append({
-                'type': 'spouse',
-                'person1': r['person1'],
-                'person2': r['person2']
-            })
-        elif r['type'] == 'parent':
-            rel_display.append({
-                'type': 'parent',
-                'parent': r['parent'],
-                'child': r['child']
-            })
-    st.dataframe(pd.DataFrame(rel_display))
+    show_relationships_page(store, index, pending_people, name)
+
+    # Whole-tree validation (O(people + relationships))
+    with st.expander("🩺 Check tree integrity"):
+        if st.button("Run check"):
+            report = validate_tree(store.people, store.relationships)
+            if not report["errors"] and not report["warnings"]:
+                st.success(f"No problems found in {report['people']} people and {report['relationships']} relationships.")
+            for issue in report["errors"]:
+                st.error(issue["message"])
+            for issue in report["warnings"]:
+                st.warning(issue["message"])
 
     # Save all changes
+    show_pending_changes(store, delta, name)
+
+
+def show_pending_changes(store, delta, name):
+    # Filled in after the save button so it shows what is still unsaved
+    summary = st.container()
     if st.button("💾 Save All Changes"):
-        save_people(st.session_state['people_df'], st.session_state['relationships'])
-        st.success("✅ All changes saved.")
+        try:
+            saved, conflicts, notes = delta.save(store)
+        except StaleVersionError as e:
+            st.error(f"⚠️ {e}")
+            return
+        st.session_state['grid_conflicts'] = conflicts
+        for note in notes:
+            st.info(note)
+        if any(c.get("rejected") for c in conflicts):
+            st.error("⚠️ Nothing was saved: some of your new links fail the tree checks. Remove them and save again.")
+        else:
+            st.success(f"✅ Saved {saved} changes.")
+    if len(delta):
+        changed = store.seq != delta.base_seq
+        summary.info(
+            f"Unsaved: {len(delta)} changes"
+            + (" — the tree has been edited by someone else since; your changes will be merged." if changed else "")
+        )
+        summary.dataframe(pd.DataFrame([_describe(op, name) for op in delta.ops]), hide_index=True)
+
+    # Conflicting edits stay unsaved until the user picks a side
+    conflicts = [c for c in st.session_state.get('grid_conflicts', []) if any(c["op"] is op for op in delta.ops)]
+    clashes = [c for c in conflicts if not c.get("rejected")]
+    if clashes:
+        st.warning(f"{len(clashes)} of your changes conflict with edits made by someone else.")
+    for i, conflict in enumerate(conflicts):
+        st.write(f"• {conflict['message']}")
+        col1, col2 = st.columns(2)
+        resolved = False
+        if conflict["op"]["op"] in ("update_person", "delete_person") and col1.button("Keep mine", key=f"conflict_mine_{i}"):
+            delta.accept_current(conflict["op"], store)
+            resolved = True
+        if col2.button("Remove link" if conflict.get("rejected") else "Keep theirs", key=f"conflict_theirs_{i}"):
+            delta.discard(conflict["op"])
+            resolved = True
+        if resolved:
+            st.session_state['grid_conflicts'] = [c for c in conflicts if c is not conflict]
+            st.rerun()
+
+
+# ---------- Paged Tables and Pickers ----------
+
+def _pager(total, key):
+    """Page size and zero-based page number widgets for `total` rows."""
+    col1, col2, col3 = st.columns([1, 1, 2])
+    page_size = col1.selectbox("Rows per page", [25, PAGE_SIZE, 100, 250], index=1, key=f"{key}_size")
+    pages = max(1, math.ceil(total / page_size))
+    page = col2.number_input("Page", 1, pages, 1, key=f"{key}_page") - 1
+    col3.caption(f"{total} rows · page {page + 1} of {pages}")
+    return page, page_size
+
+
+def show_people_page(index):
+    columns = index.columns
+    col1, col2, col3, col4 = st.columns(4)
+    filters = {"firstname": col1.text_input("First name starts with", key="grid_firstname")}
+    if "surname" in columns:
+        filters["surname"] = col2.text_input("Surname starts with", key="grid_surname")
+    gender = col3.selectbox("Gender", ["All"] + index.values("gender"), key="grid_gender")
+    if gender != "All":
+        filters["gender"] = gender
+    sort_by = col4.selectbox("Sort by", columns, index=columns.index("id"), key="grid_sort")
+    descending = col4.checkbox("Descending", key="grid_desc")
+
+    # Count first so the pager can clamp the page, then fetch just that page
+    _, total = index.query(filters, sort_by, descending, 0, 0)
+    page, page_size = _pager(total, "grid_people")
+    rows, _ = index.query(filters, sort_by, descending, page, page_size)
+    st.dataframe(rows, hide_index=True)
+
+
+def person_picker(label, key, index, pending_people=()):
+    """Type-ahead person selector: only matching people are sent to the browser.
+
+    Returns the chosen person's id.
+    """
+    store = get_store()
+    col1, col2 = st.columns([1, 2])
+    text = col1.text_input(f"Search {label.lower()}", key=f"{key}_search")
+    options = index.search(text)
+    prefix = text.strip().lower()
+    pending = {str(p["id"]): p for p in pending_people if p["firstname"].lower().startswith(prefix)}
+    options += [pid for pid in pending if pid not in options]
+    return col2.selectbox(
+        label, options, key=key,
+        format_func=lambda pid: _person_label(store.by_id.get(pid) or pending.get(pid) or {"id": pid}),
+    )
+
+
+def show_relationships_page(store, index, pending_people, name):
+    # Filtering by a person reads the adjacency arrays instead of scanning
+    pid = person_picker("Person", "grid_rel_person", index, pending_people) if st.checkbox(
+        "Only relationships of one person", key="grid_rel_filter") else None
+    if pid:
+        rels = _links_of(store, pid)
+    else:
+        rels = store.relationships
+    page, page_size = _pager(len(rels), "grid_rels")
+    rows = []
+    for rel in rels[page * page_size:(page + 1) * page_size]:
+        a, b = relationship_ends(rel)
+        rows.append({"type": rel["type"], "from": name(a), "to": name(b), "from_id": a, "to_id": b})
+    st.dataframe(pd.DataFrame(rows, columns=RELATIONSHIP_COLUMNS), hide_index=True)
+
+
+def _accept_link(rel, delta):
+    """Check a new link against the tree with this session's unsaved link
+    edits applied (duplicates, cycles and parent counts alike).
+
+    Errors are shown and the link is rejected; warnings are shown but the
+    link is kept.
+    """
+    checker = get_checker()
+    issues = checker.check_link(rel, delta.pending_links(checker.store))
+    for issue in issues:
+        (st.error if issue["severity"] == "error" else st.warning)(issue["message"])
+    return not any(issue["severity"] == "error" for issue in issues)
+
+
+def _links_of(store, pid):
+    return (
+        [{"type": "parent", "parent_id": p, "child_id": pid} for p in store.parents_of(pid)]
+        + [{"type": "parent", "parent_id": pid, "child_id": c} for c in store.children_of(pid)]
+        + [{"type": "spouse", "person1_id": pid, "person2_id": s} for s in store.spouses_of(pid)]
+    )
+
+
+def _person_label(person):
+    full = f"{person.get('firstname', '')} {person.get('surname', '') or ''}".strip()
+    return f"{full} (#{person.get('id')})"
+
+
+def _describe(op, name):
+    kind = op["op"]
+    if kind == "add_person":
+        return {"change": "add person", "details": f"{op['person']['firstname']} (ID {op['person']['id']})"}
+    if kind == "update_person":
+        return {"change": "edit person", "details": f"ID {op['id']}: " + ", ".join(f"{k} = {v}" for k, v in op["fields"].items())}
+    if kind == "delete_person":
+        return {"change": "delete person", "details": f"{op['before'].get('firstname', '')} (ID {op['id']})"}
+    rel = op["relationship"]
+    a, b = relationship_ends(rel)
+    ends = f"{name(a)} → {name(b)}" if rel["type"] == "parent" else f"{name(a)} & {name(b)}"
+    return {"change": kind.replace("_", " "), "details": f"{rel['type']}: {ends}"}
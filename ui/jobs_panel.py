@@ -0,0 +1,53 @@
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.jobs import ACTIVE, get_jobs
+
+POLL_SECONDS = 1.0
+
+
+def session_owner():
+    """Id of this browser session, used to share workers fairly between sessions."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+
+def submit_job(key, kind, payload):
+    """Queue a background job and remember it in this session under `key`."""
+    st.session_state[key] = get_jobs().submit(kind, payload, session_owner())
+
+
+def show_job(key, label):
+    """Show the session's job stored under `key`; returns it once it has finished.
+
+    While the job is queued or running only its progress area polls, not
+    the whole script, and the page reruns once when the job finishes.
+    """
+    job_id = st.session_state.get(key)
+    job = get_jobs().get(job_id) if job_id else None
+    if job is None:
+        return None
+    if job["state"] in ACTIVE:
+        _progress(key, job_id, label)
+        return None
+    if job["state"] == "failed":
+        st.error(f"⚠️ {label} failed: {job['error']}")
+    elif job["state"] == "cancelled":
+        st.info(f"{label} was cancelled.")
+    return job
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def _progress(key, job_id, label):
+    queue = get_jobs()
+    job = queue.get(job_id)
+    if job["state"] not in ACTIVE:
+        st.rerun()
+    if job["state"] == "queued":
+        ahead = queue.position(job_id)
+        st.info(f"⏳ {label} is queued" + (f" behind {ahead} other jobs." if ahead else "."))
+    else:
+        done, total = job["done"], job["total"]
+        st.progress(min(done / total, 1.0) if total else 0.0, text=f"{label}: {job['message']} ({done}/{total})")
+    if st.button("Cancel", key=f"{key}_cancel"):
+        queue.cancel(job_id)
+        st.rerun()
@@ -0,0 +1,51 @@
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+import streamlit as st
+from utils import timing
+
+
+@contextmanager
+def perf_panel():
+    """Wrap one script run; when enabled in the sidebar, show where its time went."""
+    st.sidebar.markdown("### ⏱️ Performance")
+    enabled = st.sidebar.checkbox("Show timings", value=timing.is_enabled(), key="perf_enabled")
+    if not enabled:
+        yield
+        return
+
+    profile = st.sidebar.checkbox("Profile this rerun (cProfile)", key="perf_profile")
+    # Only this session's rerun is timed; other sessions keep the no-op spans
+    timing.enable_here()
+    try:
+        timing.start_rerun()
+        profiler = timing.profile_rerun() if profile else nullcontext()
+        with profiler, timing.span("rerun"):
+            yield
+        _show_rerun(profiler if profile else None)
+    finally:
+        timing.enable_here(False)
+
+
+def _show_rerun(profiler):
+    spans = timing.rerun_spans()
+    if spans:
+        # Spans are recorded as they finish; "rerun" wraps everything and comes last
+        rows = [{"span": "  " * depth + name, "ms": round(seconds * 1000, 1)} for name, seconds, depth in spans]
+        st.sidebar.dataframe(pd.DataFrame(rows), hide_index=True)
+
+    snapshot = timing.snapshot()
+    if snapshot:
+        with st.sidebar.expander("All-time latency"):
+            st.dataframe(pd.DataFrame([
+                {"span": name, "count": h["count"], "mean ms": round(h["sum"] / h["count"] * 1000, 1),
+                 "max ms": round(h["max"] * 1000, 1)}
+                for name, h in sorted(snapshot.items())
+            ]), hide_index=True)
+            col1, col2 = st.columns(2)
+            col1.download_button("JSON", timing.export_json(), "timings.json", "application/json")
+            col2.download_button("Prometheus", timing.export_prometheus(), "timings.prom", "text/plain")
+
+    if profiler is not None:
+        with st.sidebar.expander("cProfile (top 30 by cumulative time)"):
+            st.code(profiler.report(30), language="text")
@@ -1,55 +1,70 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
 import streamlit as st
 from pyvis.network import Network
-import networkx as nx
-from utils.helpers import build_graph
+from ui.grid_tab import person_picker
+from utils.helpers import build_graph, focus_subgraph
+from utils.people_index import get_people_index
+from utils.timing import span
+
+MAX_FULL_TREE_NODES = 500  # above this the tree opens in focus mode
+
 
 def show_tree_tab():
     st.header("🌳 Family Tree Visualizer")
 
-    # Load people and relationships from separate files
-    import json
-
-    with open("data/people_only.json", "r") as f:
-        people_list = json.load(f)
-    with open("data/relationships_only.json", "r") as f:
-        relationships = json.load(f)
-    people = {p["firstname"]: p for p in people_list}
-
-    # Group spouses into a single node
-    spouse_pairs = set()
-    spouse_to_node = {}
-    G = nx.DiGraph()
-    # Find all spouse pairs
-    for rel in relationships:
-        if rel["type"] == "spouse":
-            pair = tuple(sorted([rel["person1"], rel["person2"]]))
-            spouse_pairs.add(pair)
-    # Add spouse nodes with HTML labels for wrapping
-    for pair in spouse_pairs:
-        p1, p2 = people.get(pair[0], {}), people.get(pair[1], {})
-        node_id = f"{pair[0]}_{pair[1]}"
-        label = f"{p1.get('firstname','')} & {p2.get('firstname','')}"
-        G.add_node(node_id, label=label, p1=p1, p2=p2, shape="box")
-        spouse_to_node[pair[0]] = node_id
-        spouse_to_node[pair[1]] = node_id
-    # Add single (non-spouse) people as nodes with HTML labels for wrapping
-    for name, p in people.items():
-        if name not in spouse_to_node:
-            label = f"{p.get('firstname','')}" if p.get('firstname') else name
-            G.add_node(name, label=label, **p, shape="box")
-    # Add parent-child edges: from spouse node (if exists) or person to child/couple
-    for rel in relationships:
-        if rel["type"] == "parent":
-            parent = rel["parent"]
-            child = rel["child"]
-            from_node = spouse_to_node.get(parent, parent)
-            to_node = spouse_to_node.get(child, child)
-            G.add_edge(from_node, to_node, relation="parent")
+    # Couple nodes and parent edges come from the shared, cached graph
+    G = build_graph()
+    node_of = G.graph.get("node_of", {})
 
-    net = Network(height='700px', width='100%', directed=True)
-    # Hierarchical layout, fixed positions, no dragging
-    net.barnes_hut(gravity=-80000, central_gravity=0, spring_length=95, spring_strength=0.01, damping=0.09, overlap=0)
-    net.set_options('''
+    # Focus mode: draw only the neighbourhood of one person and expand on demand
+    mode = st.radio(
+        "View",
+        ["Focus on a person", "Whole tree"],
+        index=0 if G.number_of_nodes() > MAX_FULL_TREE_NODES else 1,
+        horizontal=True,
+    )
+    collapsed = set()
+    view = (mode,)
+    if mode == "Focus on a person" and node_of:
+        # Type-ahead, so only the people matching the search reach the browser
+        focus_id = person_picker("Person", "tree_focus", get_people_index())
+        generations = st.slider("Generations", 1, 6, 2, key="tree_generations")
+        if focus_id not in node_of:
+            st.info("No one matches that search.")
+            return
+        if st.session_state.get("tree_expanded_for") != focus_id:
+            st.session_state["tree_expanded_for"] = focus_id
+            st.session_state["tree_expanded"] = []
+        expanded = [n for n in st.session_state["tree_expanded"] if n in G]
+        visible, collapsed = focus_subgraph(G, node_of[focus_id], generations, expanded)
+        view = (mode, focus_id, generations, tuple(expanded))
+        # Collapsed branches (marked ⊕) can be opened one at a time
+        to_expand = st.selectbox(
+            "Expand a collapsed branch",
+            [""] + sorted(collapsed, key=lambda n: _display_label(n, G.nodes[n])),
+            format_func=lambda n: _display_label(n, G.nodes[n]) if n else "—",
+        )
+        if to_expand and st.button("➕ Expand"):
+            st.session_state["tree_expanded"] = expanded + [to_expand]
+            st.rerun()
+        if expanded and st.button("➖ Collapse all"):
+            st.session_state["tree_expanded"] = []
+            st.rerun()
+        total = G.number_of_nodes()
+        G = G.subgraph(visible)
+        st.caption(f"Showing {G.number_of_nodes()} of {total} family boxes.")
+
+    # Rendered HTML is cached in memory per data version, layout and view
+    html = render_tree_html(G, collapsed, view)
+    st.components.v1.html(html, height=650, scrolling=True)
+
+
+# ---------- Rendering and HTML Cache ----------
+
+TREE_OPTIONS = '''
     {
       "layout": {
         "hierarchical": {
@@ -116,7 +131,41 @@ def show_tree_tab():
         "enabled": false
       }
     }
-    ''')
+'''
+RENDER_CACHE_SIZE = 32
+
+_render_cache = OrderedDict()
+_render_lock = threading.Lock()
+
+
+def render_tree_html(G, collapsed, view):
+    """pyvis HTML for G, served from an in-memory LRU cache.
+
+    The key hashes the data version G was built from, the layout options
+    and the visible view, so unchanged trees are served instantly and no
+    session ever writes a shared file on disk.
+    """
+    raw = repr((G.graph["version"], TREE_OPTIONS, view)).encode("utf-8")
+    key = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    with _render_lock:
+        html = _render_cache.get(key)
+        if html is not None:
+            _render_cache.move_to_end(key)
+            return html
+    with span("tree.pyvis_html"):
+        html = _render_tree_html(G, collapsed)
+    with _render_lock:
+        _render_cache[key] = html
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    return html
+
+
+def _render_tree_html(G, collapsed):
+    net = Network(height='700px', width='100%', directed=True)
+    # Hierarchical layout, fixed positions, no dragging
+    net.barnes_hut(gravity=-80000, central_gravity=0, spring_length=95, spring_strength=0.01, damping=0.09, overlap=0)
+    net.set_options(TREE_OPTIONS)
 
     # Add nodes with labels and all details in the title (for popup)
     for node_id, data in G.nodes(data=True):
@@ -149,7 +198,11 @@ def show_tree_tab():
                 f"{data.get('firstname','')}"
                 f" Gender: {data.get('gender','')}"
             )
-        net.add_node(node_id, label=data.get("label", str(node_id)), shape="box", title=title)
+        label = _display_label(node_id, data)
+        if node_id in collapsed:
+            label += " ⊕"
+            title += " (more relatives hidden)"
+        net.add_node(node_id, label=label, shape="box", title=title)
 
     # Add edges with relationship label
     for source, target, data in G.edges(data=True):
@@ -159,8 +212,10 @@ def show_tree_tab():
         else:
             net.add_edge(source, target, label=relation)
 
+    return net.generate_html()
 
-    net.save_graph("familytree.html")
-    with open("familytree.html", "r", encoding="utf-8") as f:
-        html = f.read()
-    st.components.v1.html(html, height=650, scrolling=True)
+
+def _display_label(node_id, data):
+    if "p1" in data and "p2" in data:
+        return f"{data['p1'].get('firstname', '')} & {data['p2'].get('firstname', '')}"
+    return data.get("firstname") or str(node_id)
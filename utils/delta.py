@@ -0,0 +1,173 @@
+from utils.integrity import PendingLinks, get_checker
+from utils.store import StaleVersionError
+
+SAVE_RETRIES = 5
+
+
+# ---------- Per-Session Edits ----------
+
+class SessionDelta:
+    """One session's unsaved edits, kept as journal ops against the shared store.
+
+    Sessions never copy the tree: they read the shared FamilyStore and hold
+    only these ops. Updates and deletes remember the values they replaced,
+    so a save can tell whether someone else changed the same record since
+    (a three-way merge per field) instead of overwriting it.
+    """
+
+    def __init__(self, store):
+        self.base_seq = store.seq
+        self.ops = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    # ----- Recording edits -----
+
+    def add_person(self, person):
+        self.ops.append({"op": "add_person", "person": person})
+
+    def update_person(self, current, fields):
+        fields = {k: v for k, v in fields.items() if current.get(k) != v}
+        if fields:
+            self.ops.append({
+                "op": "update_person", "id": str(current["id"]), "fields": fields,
+                "before": {k: current.get(k) for k in fields},
+            })
+
+    def delete_person(self, current):
+        self.ops.append({"op": "delete_person", "id": str(current["id"]), "before": dict(current)})
+
+    def add_relationship(self, rel):
+        self.ops.append({"op": "add_relationship", "relationship": rel})
+
+    def delete_relationship(self, rel):
+        self.ops.append({"op": "delete_relationship", "relationship": rel})
+
+    def added_people(self):
+        return [op["person"] for op in self.ops if op["op"] == "add_person"]
+
+    def pending_links(self, store):
+        """This session's unsaved link edits, for IntegrityChecker.check_link."""
+        pending = PendingLinks(store)
+        for op in self.ops:
+            if op["op"] == "add_relationship":
+                pending.add(op["relationship"])
+            elif op["op"] == "delete_relationship":
+                pending.remove(op["relationship"])
+        return pending
+
+    def discard(self, op):
+        self.ops = [o for o in self.ops if o is not op]
+
+    def accept_current(self, op, store):
+        """Keep my change over someone else's: re-base it on the current record."""
+        current = store.by_id.get(op["id"])
+        if current is None:
+            self.discard(op)
+        elif op["op"] == "update_person":
+            op["before"] = {k: current.get(k) for k in op["fields"]}
+        else:
+            op["before"] = dict(current)
+
+    # ----- Merging and saving -----
+
+    def rebase(self, store):
+        """Split the ops against the store's current state.
+
+        Returns (ready, conflicts, notes): journal ops safe to commit, ops
+        that clash with edits made since (as {"op", "message"}), and
+        messages about edits that were merged automatically. Links are
+        checked against the store plus the links accepted before them;
+        a link that fails is a conflict with "rejected" set.
+        """
+        ready, conflicts, notes = [], [], []
+        renumbered, added = {}, set()
+        next_id = int(store.next_id())
+        checker = get_checker(store)
+        pending = PendingLinks(store)
+        for op in self.ops:
+            kind = op["op"]
+            if kind == "add_person":
+                person = op["person"]
+                # The id is only reserved once saved: anyone holding it now is someone else,
+                # even with identical details (two sessions adding the same name)
+                if str(person.get("id")) in store.by_id or str(person.get("id")) in added:
+                    person = {**person, "id": str(next_id)}
+                    renumbered[str(op["person"]["id"])] = person["id"]
+                    notes.append(f"ID {op['person']['id']} was taken by someone else; {person['firstname']} was saved as ID {next_id}.")
+                added.add(str(person["id"]))
+                next_id = max(next_id, int(person["id"]) + 1) if str(person["id"]).isdigit() else next_id
+                ready.append({"op": "add_person", "person": person})
+            elif kind == "update_person":
+                current = store.by_id.get(op["id"])
+                if current is None:
+                    conflicts.append({"op": op, "message": f"Person {op['id']} was deleted by someone else."})
+                    continue
+                fields, clashes = {}, []
+                for field, value in op["fields"].items():
+                    now = current.get(field)
+                    if now == value:
+                        continue
+                    if now == op["before"].get(field):
+                        fields[field] = value
+                    else:
+                        clashes.append(f"{field} is now {now!r} (you set {value!r})")
+                if fields:
+                    ready.append({"op": "update_person", "id": op["id"], "fields": fields})
+                if clashes:
+                    clash = {**op, "fields": {k: v for k, v in op["fields"].items() if k not in fields}}
+                    conflicts.append({"op": clash, "message": f"{current.get('firstname', op['id'])} was edited by someone else: " + "; ".join(clashes) + "."})
+            elif kind == "delete_person":
+                current = store.by_id.get(op["id"])
+                if current is None:
+                    notes.append(f"Person {op['id']} had already been deleted.")
+                elif current != op["before"]:
+                    conflicts.append({"op": op, "message": f"{current.get('firstname', op['id'])} was edited by someone else after you deleted them."})
+                else:
+                    ready.append({"op": "delete_person", "id": op["id"]})
+            elif kind == "add_relationship":
+                rel = _renumber(op["relationship"], renumbered)
+                if pending.has_relationship(rel):
+                    continue
+                errors = [i["message"] for i in checker.check_link(rel, pending) if i["severity"] == "error"]
+                if errors:
+                    conflicts.append({"op": op, "message": " ".join(errors), "rejected": True})
+                else:
+                    ready.append({"op": "add_relationship", "relationship": rel})
+                    pending.add(rel)
+            elif kind == "delete_relationship":
+                if pending.has_relationship(op["relationship"]):
+                    ready.append(op)
+                    pending.remove(op["relationship"])
+        return ready, conflicts, notes
+
+    def save(self, store):
+        """Commit every non-conflicting op with an optimistic version check.
+
+        If another session commits between the merge and the write, the
+        merge is redone against the new state. Conflicting ops stay in the
+        delta for the user to resolve. A link that fails the integrity
+        checks rejects the whole save, so the tree never takes half of a
+        batch. Returns (saved, conflicts, notes).
+        """
+        for _ in range(SAVE_RETRIES):
+            seq = store.seq
+            ready, conflicts, notes = self.rebase(store)
+            if any(c.get("rejected") for c in conflicts):
+                return 0, conflicts, []
+            try:
+                store.commit(ready, expected_seq=seq)
+            except StaleVersionError:
+                continue
+            self.ops = [c["op"] for c in conflicts]
+            self.base_seq = store.seq
+            return len(ready), conflicts, notes
+        raise StaleVersionError("the tree kept changing while saving; please try again")
+
+
+def _renumber(rel, renumbered):
+    # Links to a new person follow them when their id had to change
+    if not renumbered:
+        return rel
+    return {k: renumbered.get(v, v) if k.endswith("_id") else v for k, v in rel.items()}
@@ -0,0 +1,251 @@
+import re
+import sys
+
+from utils.storage import relationship_ends
+from utils.store import get_store
+
+IMPORT_BATCH_SIZE = 1000  # ops committed to storage per batch
+
+LINE_RE = re.compile(r"^\s*(\d+)\s+(?:(@[^@]+@)\s+)?(\S+)(?:\s(.*))?$")
+YEAR_RE = re.compile(r"(\d{4})")
+GEDCOM_SEX = {"M": "Male", "F": "Female"}
+
+
+# ---------- Reading ----------
+
+def iter_records(lines):
+    """Group GEDCOM lines into level-0 records, one record in memory at a time.
+
+    Yields {"xref", "tag", "value", "lines": [(level, tag, value), ...]}.
+    """
+    record = None
+    for raw in lines:
+        m = LINE_RE.match(raw.rstrip("\r\n").lstrip("\ufeff"))
+        if not m:
+            continue
+        level, xref, tag, value = int(m.group(1)), m.group(2), m.group(3).upper(), m.group(4) or ""
+        if level == 0:
+            if record is not None:
+                yield record
+            record = {"xref": xref, "tag": tag, "value": value, "lines": []}
+        elif record is not None:
+            record["lines"].append((level, tag, value))
+    if record is not None:
+        yield record
+
+
+def _walk(record):
+    """Yield (path, value) for each line, e.g. ("BIRT", "DATE") -> "12 MAR 1901"."""
+    path = []
+    for level, tag, value in record["lines"]:
+        del path[level - 1:]
+        path.append(tag)
+        yield tuple(path), value
+
+
+def _year(value):
+    years = YEAR_RE.findall(value or "")
+    return years[-1] if years else ""
+
+
+def parse_individual(record):
+    person = {"firstname": "", "surname": "", "gender": "", "birth_year": "", "death_year": "", "marriage_year": ""}
+    for path, value in _walk(record):
+        if path == ("NAME",) and not person["firstname"]:
+            given, _, rest = value.partition("/")
+            person["firstname"] = given.strip()
+            person["surname"] = rest.split("/")[0].strip()
+        elif path == ("NAME", "GIVN") and value:
+            person["firstname"] = value.strip()
+        elif path == ("NAME", "SURN") and value:
+            person["surname"] = value.strip()
+        elif path == ("SEX",):
+            person["gender"] = GEDCOM_SEX.get(value.strip().upper()[:1], "Other")
+        elif path == ("BIRT", "DATE"):
+            person["birth_year"] = _year(value)
+        elif path == ("DEAT", "DATE"):
+            person["death_year"] = _year(value)
+    return person
+
+
+def parse_family(record):
+    family = {"spouses": [], "children": [], "marriage_year": ""}
+    for path, value in _walk(record):
+        if path in (("HUSB",), ("WIFE",)):
+            family["spouses"].append(value.strip())
+        elif path == ("CHIL",):
+            family["children"].append(value.strip())
+        elif path == ("MARR", "DATE"):
+            family["marriage_year"] = _year(value)
+    return family
+
+
+def family_ops(family, ids):
+    """Journal ops for one FAM record, given the xref -> person id map."""
+    ops = []
+    spouses = [ids[x] for x in family["spouses"] if x in ids]
+    if len(spouses) == 2:
+        ops.append({"op": "add_relationship", "relationship": {"type": "spouse", "person1_id": spouses[0], "person2_id": spouses[1]}})
+    for child in family["children"]:
+        if child not in ids:
+            continue
+        for parent in spouses:
+            ops.append({"op": "add_relationship", "relationship": {"type": "parent", "parent_id": parent, "child_id": ids[child]}})
+    return ops
+
+
+def import_gedcom(path, store=None, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+    """Stream a GEDCOM file into storage in bulk batches.
+
+    Only the xref -> id map and one batch of ops are held in memory.
+    Families whose members appear later in the file are deferred until the
+    end. on_progress(records, people, relationships) runs after each batch.
+    """
+    store = store or get_store()
+    next_id = int(store.next_id())
+    ids = {}
+    pending = []
+    batch = []
+    stats = {"records": 0, "people": 0, "relationships": 0}
+
+    def flush():
+        if batch:
+            store.commit(list(batch))
+            batch.clear()
+            if on_progress:
+                on_progress(stats["records"], stats["people"], stats["relationships"])
+
+    def add_family(family):
+        ops = family_ops(family, ids)
+        stats["relationships"] += len(ops)
+        batch.extend(ops)
+        if family["marriage_year"]:
+            for xref in family["spouses"]:
+                if xref in ids:
+                    batch.append({"op": "update_person", "id": ids[xref], "fields": {"marriage_year": family["marriage_year"]}})
+
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for record in iter_records(f):
+            stats["records"] += 1
+            if record["tag"] == "INDI" and record["xref"]:
+                person = parse_individual(record)
+                person["id"] = str(next_id)
+                next_id += 1
+                person["firstname"] = person["firstname"] or record["xref"].strip("@")
+                ids[record["xref"]] = person["id"]
+                batch.append({"op": "add_person", "person": person})
+                stats["people"] += 1
+            elif record["tag"] == "FAM":
+                family = parse_family(record)
+                members = family["spouses"] + family["children"]
+                if all(x in ids for x in members):
+                    add_family(family)
+                else:
+                    pending.append(family)
+            if len(batch) >= batch_size:
+                flush()
+    flush()
+    for family in pending:
+        add_family(family)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return stats
+
+
+# ---------- Writing ----------
+
+def iter_gedcom(store=None):
+    """Yield GEDCOM lines for the whole tree without building the file in memory."""
+    store = store or get_store()
+    yield "0 HEAD"
+    yield "1 SOUR FamilyTreeAI"
+    yield "1 GEDC"
+    yield "2 VERS 5.5.1"
+    yield "2 FORM LINEAGE-LINKED"
+    yield "1 CHAR UTF-8"
+
+    def xref(pid):
+        return f"@I{pid}@" if pid in store.by_id else None
+
+    def role(pid):
+        return "WIFE" if str(store.by_id[pid].get("gender", "")).lower() == "female" else "HUSB"
+
+    for person in store.people:
+        yield f"0 @I{person.get('id')}@ INDI"
+        firstname, surname = person.get("firstname", ""), person.get("surname", "")
+        yield f"1 NAME {firstname} /{surname}/"
+        if firstname:
+            yield f"2 GIVN {firstname}"
+        if surname:
+            yield f"2 SURN {surname}"
+        gender = str(person.get("gender", "")).lower()
+        yield f"1 SEX {'M' if gender == 'male' else 'F' if gender == 'female' else 'U'}"
+        for tag, field in (("BIRT", "birth_year"), ("DEAT", "death_year")):
+            if person.get(field):
+                yield f"1 {tag}"
+                yield f"2 DATE {person[field]}"
+
+    # One family per spouse pair with their shared children, then a
+    # single-parent family for every parent link not covered by a couple
+    family_no = 0
+    covered = set()
+    for rel in store.relationships:
+        if rel.get("type") != "spouse":
+            continue
+        a, b = relationship_ends(rel)
+        family_no += 1
+        yield f"0 @F{family_no}@ FAM"
+        for pid in (a, b):
+            ref = xref(pid)
+            if ref:
+                yield f"1 {role(pid)} {ref}"
+        marriage_year = store.by_id.get(a, {}).get("marriage_year") or store.by_id.get(b, {}).get("marriage_year")
+        if marriage_year:
+            yield "1 MARR"
+            yield f"2 DATE {marriage_year}"
+        for child in sorted(set(store.children_of(a)) & set(store.children_of(b))):
+            ref = xref(child)
+            if ref:
+                yield f"1 CHIL {ref}"
+            covered.add((a, child))
+            covered.add((b, child))
+    for rel in store.relationships:
+        if rel.get("type") != "parent":
+            continue
+        parent, child = relationship_ends(rel)
+        parent_ref, child_ref = xref(parent), xref(child)
+        if (parent, child) in covered or not parent_ref or not child_ref:
+            continue
+        family_no += 1
+        yield f"0 @F{family_no}@ FAM"
+        yield f"1 {role(parent)} {parent_ref}"
+        yield f"1 CHIL {child_ref}"
+    yield "0 TRLR"
+
+
+def export_gedcom(path, store=None):
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for line in iter_gedcom(store):
+            f.write(line + "\n")
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    # python -m utils.gedcom import|export FILE.ged
+    if len(sys.argv) == 3 and sys.argv[1] == "import":
+        def report(records, people, relationships):
+            print(f"\r{records} records, {people} people, {relationships} relationships", end="", flush=True)
+        stats = import_gedcom(sys.argv[2], on_progress=report)
+        print(f"\nImported {stats['people']} people and {stats['relationships']} relationships.")
+        from utils.integrity import validate_tree
+        store = get_store()
+        checked = validate_tree(store.people, store.relationships)
+        for issue in checked["errors"] + checked["warnings"]:
+            print(f"[{issue['severity']}] {issue['message']}")
+    elif len(sys.argv) == 3 and sys.argv[1] == "export":
+        print(f"Wrote {export_gedcom(sys.argv[2])} lines to {sys.argv[2]}")
+    else:
+        print("usage: python -m utils.gedcom import|export FILE.ged")
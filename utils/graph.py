@@ -0,0 +1,223 @@
+from array import array
+
+import numpy as np
+
+PATCH_SHARE = 64  # rebuild the arrays once more than 1/PATCH_SHARE of the nodes were edited
+MIN_PATCHES = 1024
+
+
+def _to_array(typecode, values):
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values, dtype=np.int64 if typecode == "q" else np.int32).tobytes())
+    return out
+
+
+# ---------- Compressed Adjacency ----------
+
+class Adjacency:
+    """One edge type in compressed sparse row form.
+
+    The neighbours of node i are targets[offsets[i]:offsets[i + 1]]: two flat
+    integer arrays, 4 bytes per edge and 8 per node, instead of a dict of
+    lists of strings. Edits made after the build are kept as whole
+    replacement rows in a small overlay until the owner compacts.
+    """
+
+    def __init__(self, size=0, sources=(), targets=()):
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.argsort(sources, kind="stable")
+        offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=size), out=offsets[1:])
+        self.size = size
+        # array.array gives fast per-item access from Python; numpy views share its memory
+        self.offsets = _to_array("q", offsets)
+        self.targets = _to_array("i", targets[order])
+        self._patch = {}
+
+    def __getitem__(self, node):
+        row = self._patch.get(node)
+        if row is not None:
+            return row
+        if node >= self.size:
+            return ()
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def copy(self):
+        """Independent copy; the flat arrays are never changed in place, so they are shared."""
+        other = Adjacency.__new__(Adjacency)
+        other.size, other.offsets, other.targets = self.size, self.offsets, self.targets
+        other._patch = {node: list(row) for node, row in self._patch.items()}
+        return other
+
+    @property
+    def patched(self):
+        return len(self._patch)
+
+    def add(self, node, other):
+        row = self._patch.get(node)
+        if row is None:
+            row = self._patch[node] = list(self[node])
+        row.append(other)
+
+    def remove(self, node, other):
+        row = self._patch.get(node)
+        if row is None:
+            row = self._patch[node] = list(self[node])
+        if other in row:
+            row.remove(other)
+
+    def degrees(self, size=None):
+        """Neighbour count of every node, as a numpy array."""
+        size = size or self.size
+        counts = np.zeros(size, dtype=np.int64)
+        counts[:self.size] = np.diff(np.frombuffer(self.offsets, dtype=np.int64))
+        for node, row in self._patch.items():
+            counts[node] = len(row)
+        return counts
+
+    def expand(self, nodes):
+        """(sources, targets) numpy arrays of every edge leaving `nodes`, vectorised."""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        patched = np.fromiter(self._patch, dtype=np.int64, count=len(self._patch))
+        plain = nodes[(nodes < self.size) & ~np.isin(nodes, patched)] if len(patched) else nodes[nodes < self.size]
+        offsets = np.frombuffer(self.offsets, dtype=np.int64)
+        starts, ends = offsets[plain], offsets[plain + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        # Position of every edge: its row start plus its rank inside the row
+        ranks = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        sources = np.repeat(plain, lengths)
+        targets = np.frombuffer(self.targets, dtype=np.int32)[np.repeat(starts, lengths) + ranks].astype(np.int64)
+        if len(patched):
+            extra = [(n, t) for n in nodes[np.isin(nodes, patched)].tolist() for t in self._patch[n]]
+            if extra:
+                more = np.array(extra, dtype=np.int64)
+                sources, targets = np.concatenate([sources, more[:, 0]]), np.concatenate([targets, more[:, 1]])
+        return sources, targets
+
+    def edges(self):
+        """(sources, targets) of every edge, overlay included."""
+        return self.expand(np.arange(max([self.size] + [n + 1 for n in self._patch])))
+
+
+# ---------- Family Graph ----------
+
+class FamilyGraph:
+    """Parent, child and spouse links between people, by dense integer node.
+
+    Person ids map to nodes 0..n-1 once; traversals then touch only small
+    integers and flat arrays, which keeps memory and time linear in the
+    number of edges even at millions of links. Nodes are never reused, so a
+    deleted person keeps their number until the next full rebuild.
+    """
+
+    def __init__(self, ids=(), parent_links=(), spouse_links=()):
+        """`parent_links` are (parent_id, child_id) pairs, `spouse_links` (id, id) pairs."""
+        self.ids = []
+        self.index = {}
+        for pid in ids:
+            self.node(pid)
+        parents = np.array([(self.node(p), self.node(c)) for p, c in parent_links], dtype=np.int64).reshape(-1, 2)
+        spouses = np.array([(self.node(a), self.node(b)) for a, b in spouse_links], dtype=np.int64).reshape(-1, 2)
+        self._build(parents, spouses)
+
+    def _build(self, parents, spouses):
+        n = len(self.ids)
+        self.children = Adjacency(n, parents[:, 0], parents[:, 1])
+        self.parents = Adjacency(n, parents[:, 1], parents[:, 0])
+        both = np.concatenate([spouses, spouses[:, ::-1]])
+        self.spouses = Adjacency(n, both[:, 0], both[:, 1])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def copy(self):
+        """Copy that later edits to either graph do not affect (O(nodes), not O(edges))."""
+        other = FamilyGraph.__new__(FamilyGraph)
+        other.ids = list(self.ids)
+        other.index = dict(self.index)
+        other.children, other.parents, other.spouses = self.children.copy(), self.parents.copy(), self.spouses.copy()
+        return other
+
+    def node(self, pid, create=True):
+        """Node number of a person id (allocated on first sight unless create=False)."""
+        pid = str(pid)
+        node = self.index.get(pid)
+        if node is None and create:
+            node = self.index[pid] = len(self.ids)
+            self.ids.append(pid)
+        return node
+
+    # ----- Edits -----
+
+    def add_parent(self, parent, child):
+        p, c = self.node(parent), self.node(child)
+        self.children.add(p, c)
+        self.parents.add(c, p)
+        self._maybe_compact()
+
+    def remove_parent(self, parent, child):
+        p, c = self.node(parent, False), self.node(child, False)
+        if p is not None and c is not None:
+            self.children.remove(p, c)
+            self.parents.remove(c, p)
+            self._maybe_compact()
+
+    def add_spouse(self, a, b):
+        a, b = self.node(a), self.node(b)
+        self.spouses.add(a, b)
+        self.spouses.add(b, a)
+        self._maybe_compact()
+
+    def remove_spouse(self, a, b):
+        a, b = self.node(a, False), self.node(b, False)
+        if a is not None and b is not None:
+            self.spouses.remove(a, b)
+            self.spouses.remove(b, a)
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        patched = self.children.patched + self.parents.patched + self.spouses.patched
+        if patched > max(MIN_PATCHES, len(self.ids) // PATCH_SHARE):
+            self.compact()
+
+    def compact(self):
+        """Fold the overlays back into flat arrays (O(E))."""
+        sources, targets = self.children.edges()
+        a, b = self.spouses.edges()
+        once = a < b
+        self._build(np.stack([sources, targets], axis=1), np.stack([a[once], b[once]], axis=1))
+
+    # ----- Traversal -----
+
+    def walk(self, start, adjacencies, depth):
+        """{node: hops} for every node within `depth` hops of `start` over `adjacencies`."""
+        dist = {start: 0}
+        frontier = [start]
+        for hop in range(1, depth + 1):
+            nxt = []
+            for node in frontier:
+                for adjacency in adjacencies:
+                    for other in adjacency[node]:
+                        if other not in dist:
+                            dist[other] = hop
+                            nxt.append(other)
+            if not nxt:
+                break
+            frontier = nxt
+        return dist
+
+    def levels(self, starts, adjacency, depth):
+        """Nodes exactly 1..depth steps from `starts` along `adjacency`, one
+        numpy array per level; vectorised for wide frontiers such as the
+        descendants of a founder.
+        """
+        frontier = np.unique(np.asarray(starts, dtype=np.int64))
+        out = []
+        for _ in range(depth):
+            frontier = np.unique(adjacency.expand(frontier)[1])
+            if not len(frontier):
+                break
+            out.append(frontier)
+        return out
@@ -1,35 +1,27 @@
-import json
-import pandas as pd
-import os
 import networkx as nx
+from utils.store import get_store
+from utils.storage import relationship_ends
+from utils.timing import span, timed
 
 # ---------- Load and Save People Data ----------
 
 
+@timed("load_people")
 def load_people():
-    people_path = "data/people_only.json"
-    relationships_path = "data/relationships_only.json"
-    if not os.path.exists(people_path):
-        return pd.DataFrame(columns=["id", "firstname", "gender"]), []
-    try:
-        with open(people_path, "r") as f:
-            people = json.load(f)
-        with open(relationships_path, "r") as f:
-            relationships = json.load(f)
-        df = pd.DataFrame(people)
-        for col in ["id", "firstname", "gender"]:
-            if col not in df.columns:
-                df[col] = ""
-        return df, relationships
-    except Exception as e:
-        print(f"Error loading data: {e}")
-        return pd.DataFrame(columns=["id", "firstname", "gender"]), []
+    store = get_store()
+    return store.dataframe().copy(), list(store.relationships)
 
+@timed("save_people")
 def save_people(df, relationships):
-    with open("data/people_only.json", "w") as f:
-        json.dump(df.to_dict(orient="records"), f, indent=4)
-    with open("data/relationships_only.json", "w") as f:
-        json.dump(relationships, f, indent=4)
+    # Only the difference from the stored tree is journaled, not the whole file
+    store = get_store()
+    store.commit(store.diff(df.to_dict(orient="records"), relationships))
+
+def add_people(people):
+    get_store().commit([{"op": "add_person", "person": p} for p in people])
+
+def add_relationships(relationships):
+    get_store().commit([{"op": "add_relationship", "relationship": r} for r in relationships])
 
 def generate_unique_id(df):
     existing_ids = set(df["id"].astype(str).tolist()) if "id" in df.columns else set()
@@ -55,9 +47,25 @@ def get_dropdowns():
 
 # ---------- Build Graph for Family Tree ----------
 
+_graph_cache = {}
+
+
 def build_graph():
-    df, relationships = load_people()
-    people = {row['firstname']: row for _, row in df.iterrows()}
+    # One graph per data version; callers treat it as read-only
+    store = get_store()
+    G = _graph_cache.get(store.version)
+    if G is None:
+        with span("build_graph"):
+            G = _build_graph(store)
+        # Filed under the version it was built from, which a save may have moved past
+        _graph_cache.clear()
+        _graph_cache[G.graph['version']] = G
+    return G
+
+def _build_graph(store):
+    snapshot = store.snapshot()
+    relationships = list(snapshot.relationships.values())
+    people = snapshot.by_id
     G = nx.DiGraph()
 
     # Group spouses into couple nodes
@@ -65,7 +73,7 @@ def build_graph():
     spouse_to_node = {}
     for rel in relationships:
         if rel['type'] == 'spouse':
-            pair = tuple(sorted([rel['person1'], rel['person2']]))
+            pair = tuple(sorted(relationship_ends(rel)))
             spouse_pairs.add(pair)
     # Add spouse nodes
     for pair in spouse_pairs:
@@ -85,21 +93,57 @@ def build_graph():
         spouse_to_node[pair[0]] = node_id
         spouse_to_node[pair[1]] = node_id
     # Add single (non-spouse) people as nodes
-    for name, p in people.items():
-        if name not in spouse_to_node:
+    for pid, p in people.items():
+        if pid not in spouse_to_node:
             label = f"""
             <div style='white-space:normal;text-align:center;'>
                 <b>{p.get('firstname','')} {p.get('surname','')}</b><br>
                 {p.get('birth_year','')} - {p.get('death_year','')}
             </div>
             """
-            G.add_node(name, label=label, **p, shape="box")
+            G.add_node(pid, label=label, **p, shape="box")
     # Add parent-child edges: from spouse node (if exists) or person to child/couple
     for rel in relationships:
         if rel['type'] == 'parent':
-            parent = rel['parent']
-            child = rel['child']
+            parent, child = relationship_ends(rel)
             from_node = spouse_to_node.get(parent, parent)
             to_node = spouse_to_node.get(child, child)
             G.add_edge(from_node, to_node, relation='parent')
+    # Map every person id to the node that shows them (their couple node if married)
+    G.graph['node_of'] = {pid: spouse_to_node.get(pid, pid) for pid in people}
+    G.graph['version'] = snapshot.version
     return G
+
+
+# ---------- Focus Subgraph for Large Trees ----------
+
+def focus_subgraph(G, focus, generations=2, expanded=()):
+    """Nodes to draw around `focus`: its ancestors and descendants up to
+    `generations` levels away, plus the same neighbourhood of every node in
+    `expanded`. Also returns the drawn nodes that still have hidden relatives.
+    """
+    visible = set()
+
+    def walk(start, step):
+        seen = {start}
+        frontier = {start}
+        for _ in range(generations):
+            frontier = {n for node in frontier for n in step(node)} - seen
+            if not frontier:
+                break
+            seen.update(frontier)
+        visible.update(seen)
+
+    for node in [focus, *expanded]:
+        if node not in G:
+            continue
+        visible.add(node)
+        walk(node, G.predecessors)
+        walk(node, G.successors)
+
+    collapsed = {
+        node for node in visible
+        if any(n not in visible for n in G.predecessors(node))
+        or any(n not in visible for n in G.successors(node))
+    }
+    return visible, collapsed
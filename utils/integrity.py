@@ -0,0 +1,411 @@
+import sys
+import threading
+
+import numpy as np
+
+from utils.graph import FamilyGraph
+from utils.storage import is_legacy, relationship_ends, relationship_key
+from utils.store import get_store
+
+MAX_PARENTS = 2
+MIN_PARENT_AGE = 12  # younger parents are flagged, not rejected
+MAX_PARENT_AGE = 70
+REPORT_LIMIT = 20  # names listed per issue in messages
+
+
+def _issue(severity, code, message):
+    return {"severity": severity, "code": code, "message": message}
+
+
+def _year(person):
+    year = str((person or {}).get("birth_year", "")).strip()
+    return int(year) if year.isdigit() else None
+
+
+def _age_issues(parent, child, parent_year, child_year):
+    if parent_year is None or child_year is None:
+        return []
+    gap = child_year - parent_year
+    if gap <= 0:
+        return [_issue("error", "parent_younger", f"{parent} (born {parent_year}) cannot be a parent of {child} (born {child_year}).")]
+    if gap < MIN_PARENT_AGE:
+        return [_issue("warning", "parent_age", f"{parent} would have been {gap} when {child} was born.")]
+    if gap > MAX_PARENT_AGE:
+        return [_issue("warning", "parent_age", f"{parent} would have been {gap} when {child} was born.")]
+    return []
+
+
+def _reaches(children, start, target):
+    """Plain forward search: True if `target` is a descendant of `start`."""
+    seen = {start}
+    stack = [start]
+    while stack:
+        for child in children[stack.pop()]:
+            if child == target:
+                return True
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+    return False
+
+
+# ---------- Pending Links ----------
+
+class PendingLinks:
+    """Links a batch adds or removes before it is committed.
+
+    check_link(rel, pending) judges a link against the store as if these
+    were already applied, so links that are each fine on their own cannot
+    add up to a cycle or a third parent. The edits go to a scratch copy of
+    the store's graph, made on the first one.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.graph = None
+        self.added = set()
+        self.removed = set()
+
+    def _scratch(self):
+        if self.graph is None:
+            self.graph = self.store.snapshot().graph.copy()
+        return self.graph
+
+    def has_relationship(self, rel):
+        key = relationship_key(rel)
+        return key in self.added or (key not in self.removed and self.store.has_relationship(rel))
+
+    def add(self, rel):
+        key = relationship_key(rel)
+        self.added.add(key)
+        self.removed.discard(key)
+        if rel.get("type") == "parent":
+            self._scratch().add_parent(*relationship_ends(rel))
+        elif rel.get("type") == "spouse":
+            self._scratch().add_spouse(*relationship_ends(rel))
+
+    def remove(self, rel):
+        key = relationship_key(rel)
+        self.added.discard(key)
+        self.removed.add(key)
+        if rel.get("type") == "parent":
+            self._scratch().remove_parent(*relationship_ends(rel))
+        elif rel.get("type") == "spouse":
+            self._scratch().remove_spouse(*relationship_ends(rel))
+
+
+# ---------- Incremental Checker ----------
+
+class IntegrityChecker:
+    """Validates new links against the store in near-constant time.
+
+    Duplicates are a hash lookup on relationship keys. Cycles are caught
+    with an incrementally maintained topological order of parent links
+    (Pearce-Kelly): a link from an earlier to a later person in the order
+    cannot close a cycle, so only links that go "backwards" search, and
+    then only the people between the two positions. The order is kept per
+    graph node, follows the store through its op log and is rebuilt in
+    O(V+E) only after a reload.
+    """
+
+    def __init__(self):
+        self.store = None
+        self.seq = None
+        self.order = {}
+        self.cyclic = set()  # nodes on a parent cycle in the stored data
+        self.unordered = set()  # cycle members and their descendants
+        self._low = 0
+        self._high = 0
+        self._lock = threading.Lock()
+
+    def sync(self, store):
+        if store is self.store and store.seq == self.seq:
+            return
+        with self._lock:
+            ops = store.ops_since(self.seq) if store is self.store else None
+            graph = store.snapshot().graph
+            if ops is None:
+                self._rebuild(store)
+            else:
+                for op in ops:
+                    rel = op.get("relationship") or {}
+                    if op.get("op") == "add_relationship" and rel.get("type") == "parent":
+                        if is_legacy(rel) or not self._insert(*map(graph.node, relationship_ends(rel))):
+                            self._rebuild(store)
+                            break
+            self.store = store
+            self.seq = store.seq
+
+    def _rebuild(self, store):
+        self.store = store
+        graph = store.snapshot().graph
+        order, cyclic = topological_order(graph)
+        self.order = dict(zip(order.tolist(), range(len(order))))
+        self.cyclic = cyclic
+        self.unordered = set(range(len(graph))) - set(self.order)
+        self._low, self._high = -1, len(order)
+
+    def _position(self, node, first):
+        # People without parent links can sit anywhere; new ones go to either end
+        pos = self.order.get(node)
+        if pos is None:
+            if first:
+                pos = self._low
+                self._low -= 1
+            else:
+                pos = self._high
+                self._high += 1
+            self.order[node] = pos
+        return pos
+
+    def _reaches(self, start, target, upper=float("inf")):
+        """Forward search from `start` over children ordered at or before `upper`.
+
+        Returns (found, visited) - `found` is True when `target` is a descendant.
+        """
+        children = self.store.graph.children
+        visited = [start]
+        seen = {start}
+        stack = [start]
+        while stack:
+            for child in children[stack.pop()]:
+                if child == target:
+                    return True, visited
+                if child not in seen and self.order.get(child, self._high) <= upper:
+                    seen.add(child)
+                    visited.append(child)
+                    stack.append(child)
+        return False, visited
+
+    def _insert(self, parent, child):
+        """Add parent -> child to the order.
+
+        Returns False if it closes a cycle or touches people with no valid
+        order; the caller then rebuilds from scratch.
+        """
+        if parent == child or parent in self.unordered or child in self.unordered:
+            return False
+        x, y = self._position(parent, True), self._position(child, False)
+        if x < y:
+            return True
+        found, forward = self._reaches(child, parent, x)
+        if found:
+            return False
+        parents = self.store.graph.parents
+        backward = [parent]
+        seen = {parent}
+        stack = [parent]
+        while stack:
+            for p in parents[stack.pop()]:
+                if p not in seen and self.order.get(p, self._low) >= y:
+                    seen.add(p)
+                    backward.append(p)
+                    stack.append(p)
+        # Reuse the affected positions: ancestors of `parent` first, then descendants of `child`
+        backward.sort(key=self.order.__getitem__)
+        forward.sort(key=self.order.__getitem__)
+        slots = sorted(self.order[n] for n in backward + forward)
+        for node, pos in zip(backward + forward, slots):
+            self.order[node] = pos
+        return True
+
+    def would_cycle(self, parent, child):
+        if parent == child:
+            return True
+        if parent in self.unordered or child in self.unordered:
+            # No valid order around existing cycles: fall back to a plain search
+            return self._reaches(child, parent)[0]
+        x, y = self.order.get(parent), self.order.get(child)
+        if x is None or y is None or x < y:
+            return False
+        return self._reaches(child, parent, x)[0]
+
+    def check_link(self, rel, pending=None):
+        """Issues a new relationship would cause: [{severity, code, message}].
+
+        Any "error" means the link should be rejected; warnings are advisory.
+        People not saved yet (e.g. added in the same session) are allowed.
+        With `pending` (PendingLinks), the batch's earlier links count too.
+        """
+        store = self.store
+        scratch = pending is not None and pending.graph is not None
+        graph = pending.graph if scratch else store.graph
+        issues = []
+        if pending is not None and relationship_key(rel) in pending.added:
+            return [_issue("error", "duplicate", "This relationship is already waiting to be saved.")]
+        if pending.has_relationship(rel) if pending is not None else store.has_relationship(rel):
+            return [_issue("error", "duplicate", "This relationship already exists.")]
+        a, b = relationship_ends(rel)
+        a_node, b_node = graph.node(a, create=False), graph.node(b, create=False)
+        a_name, b_name = store.display_name(a), store.display_name(b)
+        if rel.get("type") == "spouse":
+            if a == b:
+                return [_issue("error", "self_link", f"{a_name} cannot be married to themselves.")]
+            if a_node is not None and b_node is not None and (b_node in graph.parents[a_node] or b_node in graph.children[a_node]):
+                issues.append(_issue("warning", "spouse_is_parent", f"{a_name} and {b_name} are already linked as parent and child."))
+            return issues
+
+        if a == b:
+            return [_issue("error", "self_link", f"{a_name} cannot be their own parent.")]
+        if a_node is not None and b_node is not None:
+            if scratch:
+                # The maintained order only covers the saved links
+                cycle = _reaches(graph.children, b_node, a_node)
+            else:
+                with self._lock:
+                    cycle = self.would_cycle(a_node, b_node)
+            if cycle:
+                issues.append(_issue("error", "cycle", f"{b_name} is already an ancestor of {a_name}."))
+        if b_node is not None and len(graph.parents[b_node]) >= MAX_PARENTS:
+            issues.append(_issue("error", "too_many_parents", f"{b_name} already has {MAX_PARENTS} parents."))
+        issues += _age_issues(a_name, b_name, _year(store.by_id.get(a)), _year(store.by_id.get(b)))
+        return issues
+
+
+# ---------- Bulk Validation ----------
+
+def topological_order(graph):
+    """Kahn's algorithm over parent links, one whole generation per step.
+
+    Returns (order, cyclic): every node that can be ordered, as a numpy
+    array, and the set of nodes that sit on a cycle (or between two
+    cycles). O(V+E), vectorised.
+    """
+    n = len(graph)
+    indegree = graph.parents.degrees(n)
+    frontier = np.flatnonzero(indegree == 0)
+    levels = []
+    while len(frontier):
+        levels.append(frontier)
+        _, kids = graph.children.expand(frontier)
+        indegree -= np.bincount(kids, minlength=n)
+        frontier = np.unique(kids[indegree[kids] == 0])
+    order = np.concatenate(levels) if levels else np.empty(0, dtype=np.int64)
+    if len(order) == n:
+        return order, set()
+
+    # Peel descendants of cycles off the remainder so only cycle members stay
+    remaining = np.ones(n, dtype=bool)
+    remaining[order] = False
+    sources, kids = graph.children.expand(np.flatnonzero(remaining))
+    inside = remaining[kids]
+    outdegree = np.bincount(sources[inside], minlength=n)
+    frontier = np.flatnonzero(remaining & (outdegree == 0))
+    while len(frontier):
+        remaining[frontier] = False
+        _, parents = graph.parents.expand(frontier)
+        parents = parents[remaining[parents]]
+        outdegree -= np.bincount(parents, minlength=n)
+        frontier = np.unique(parents[outdegree[parents] == 0])
+    return order, set(np.flatnonzero(remaining).tolist())
+
+
+def _names(names):
+    names = sorted(names)
+    more = f" and {len(names) - REPORT_LIMIT} more" if len(names) > REPORT_LIMIT else ""
+    return ", ".join(names[:REPORT_LIMIT]) + more
+
+
+def _summarise(issues):
+    """Per-link issues, collapsed to one line per code when there are many."""
+    by_code = {}
+    for issue in issues:
+        by_code.setdefault((issue["severity"], issue["code"]), []).append(issue)
+    summary = []
+    for (severity, code), found in by_code.items():
+        if len(found) <= REPORT_LIMIT:
+            summary += found
+        else:
+            examples = " ".join(i["message"] for i in found[:3])
+            summary.append(_issue(severity, code, f"{len(found)} links have this problem, e.g. {examples}"))
+    return summary
+
+
+def validate_tree(people, relationships):
+    """Check a whole tree (e.g. a fresh import) in O(V+E).
+
+    Returns {"people", "relationships", "errors", "warnings"} where each
+    error/warning is {severity, code, message}.
+    """
+    by_id = {str(p.get("id", "")): p for p in people}
+    shared = {}
+    for p in by_id.values():
+        shared[p.get("firstname", "")] = shared.get(p.get("firstname", ""), 0) + 1
+
+    def name(pid):
+        person = by_id.get(pid)
+        if person is None:
+            return f"#{pid}"
+        first = person.get("firstname", "")
+        return first if shared[first] <= 1 else f"{first} (#{pid})"
+
+    issues = []
+    link_issues = []
+    keys = set()
+    parent_links = []
+    duplicates = unknown = legacy = 0
+    unknown_ids = set()
+    for rel in relationships:
+        if is_legacy(rel):
+            legacy += 1
+            continue
+        key = relationship_key(rel)
+        if key in keys:
+            duplicates += 1
+            continue
+        keys.add(key)
+        ends = relationship_ends(rel)
+        missing = [pid for pid in ends if pid not in by_id]
+        if missing:
+            unknown += 1
+            unknown_ids.update(missing)
+        if ends[0] == ends[1]:
+            link_issues.append(_issue("error", "self_link", f"{name(ends[0])} is linked to themselves ({rel.get('type')})."))
+            continue
+        if rel.get("type") == "parent":
+            parent_links.append(ends)
+            if not missing:
+                link_issues += _age_issues(name(ends[0]), name(ends[1]), _year(by_id[ends[0]]), _year(by_id[ends[1]]))
+    issues += _summarise(link_issues)
+    if legacy:
+        issues.append(_issue("warning", "legacy", f"{legacy} relationships still refer to people by name; run `python -m utils.migrate`."))
+    if duplicates:
+        issues.append(_issue("warning", "duplicate", f"{duplicates} relationships are listed more than once."))
+    if unknown:
+        issues.append(_issue("error", "unknown_person", f"{unknown} relationships refer to ids that do not exist: {_names('#' + pid for pid in unknown_ids)}."))
+
+    graph = FamilyGraph(by_id, parent_links)
+    degrees = graph.parents.degrees(len(graph))
+    over = [name(graph.ids[node]) for node in np.flatnonzero(degrees > MAX_PARENTS).tolist()]
+    if over:
+        issues.append(_issue("error", "too_many_parents", f"{len(over)} people have more than {MAX_PARENTS} parents: {_names(over)}."))
+
+    _, cyclic = topological_order(graph)
+    if cyclic:
+        issues.append(_issue("error", "cycle", f"{len(cyclic)} people are their own ancestors: {_names(name(graph.ids[node]) for node in cyclic)}."))
+
+    return {
+        "people": len(people),
+        "relationships": len(relationships),
+        "errors": [i for i in issues if i["severity"] == "error"],
+        "warnings": [i for i in issues if i["severity"] == "warning"],
+    }
+
+
+_checker = IntegrityChecker()
+
+
+def get_checker(store=None):
+    """Shared checker, synced with `store` (default: the shared store)."""
+    _checker.sync(store or get_store())
+    return _checker
+
+
+if __name__ == "__main__":
+    # python -m utils.integrity: validate the stored tree
+    store = get_store()
+    report = validate_tree(store.people, store.relationships)
+    print(f"{report['people']} people, {report['relationships']} relationships")
+    for issue in report["errors"] + report["warnings"]:
+        print(f"[{issue['severity']}] {issue['message']}")
+    sys.exit(1 if report["errors"] else 0)
@@ -0,0 +1,277 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from utils.timing import span
+
+JOBS_PATH = "data/jobs.db"
+JOB_WORKERS = int(os.environ.get("FAMILY_TREE_JOB_WORKERS", "2"))
+JOB_RETENTION = 7 * 24 * 3600  # finished jobs are forgotten after a week
+ACTIVE = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# ---------- Job Kinds ----------
+#
+# A task is fn(payload, job) -> JSON-serialisable result. It reports through
+# job.progress(done, total, message), which raises JobCancelled once the job
+# has been cancelled, so cancellation takes effect at the next step.
+
+def run_extraction(payload, job):
+    from agents.extractor import extract_document
+
+    def on_progress(done, total, index, error):
+        job.progress(done, total, f"Chunk {index + 1} {'failed' if error else 'done'}")
+
+    job.progress(0, 1, "Waiting for the model")
+    extracted, errors = extract_document(payload["text"], on_progress=on_progress)
+    return {"extracted": extracted, "errors": {str(i): str(e) for i, e in sorted(errors.items())}}
+
+
+def run_ingestion(payload, job):
+    if os.environ.get("FAMILY_TREE_MEMORY"):
+        # The service owns the vector store; a second process must not write to it
+        from mcp.memory import MemoryClient
+
+        job.progress(0, 1, "Embedding new facts in the memory service")
+        client = MemoryClient(timeout=None)  # own connection: a long sync must not hold up searches
+        try:
+            return client.call("ingest")
+        finally:
+            client.close()
+
+    from agents.reasoning_agent import ingest_family_facts
+
+    job.progress(0, 1, "Waiting for another ingestion")
+    return ingest_family_facts(on_progress=lambda done, total: job.progress(done, total, "Embedding new facts"))
+
+
+TASKS = {"extract": run_extraction, "ingest": run_ingestion}
+
+
+# ---------- Queue ----------
+
+class Job:
+    """Handle a running task uses to report progress and notice cancellation."""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.id = job_id
+
+    @property
+    def cancelled(self):
+        return self.id in self.queue._cancelling
+
+    def progress(self, done, total, message=""):
+        if self.cancelled:
+            raise JobCancelled()
+        self.queue._update(self.id, done=done, total=total, message=message)
+
+
+class JobQueue:
+    """Local queue of slow LLM and embedding jobs run by a small worker pool.
+
+    Jobs outlive the Streamlit rerun that submitted them: state, progress
+    and results are kept in SQLite, so any rerun (or a restarted process)
+    can poll them. Workers take jobs round-robin by owner (the browser
+    session that submitted them), so one session queuing many jobs cannot
+    hold up everyone else. Jobs left queued or running by a previous
+    process are queued again on start; both kinds are safe to repeat.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        state TEXT NOT NULL,
+        done INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        message TEXT NOT NULL DEFAULT '',
+        result TEXT,
+        error TEXT,
+        created REAL NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs(owner, created);
+    CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, created);
+    """
+
+    def __init__(self, path=JOBS_PATH, workers=JOB_WORKERS, tasks=TASKS):
+        self.path = path
+        self.tasks = tasks
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._pending = {}  # owner -> deque of queued job ids
+        self._owners = deque()  # owners with queued jobs, in turn order
+        self._cancelling = set()
+        self.conn.executescript(self.SCHEMA)
+        self._recover()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _recover(self):
+        now = time.time()
+        with self.conn:
+            self.conn.execute("DELETE FROM jobs WHERE state NOT IN (?, ?) AND updated < ?", (*ACTIVE, now - JOB_RETENTION))
+            self.conn.execute("UPDATE jobs SET state = 'queued', updated = ? WHERE state = 'running'", (now,))
+        for row in self.conn.execute("SELECT id, owner FROM jobs WHERE state = 'queued' ORDER BY created"):
+            self._enqueue(row["owner"], row["id"])
+
+    def _enqueue(self, owner, job_id):
+        if owner not in self._pending:
+            self._pending[owner] = deque()
+            self._owners.append(owner)
+        self._pending[owner].append(job_id)
+
+    def _update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        with self.conn:
+            self.conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?", (*fields.values(), job_id)
+            )
+
+    # ----- Public API -----
+
+    def submit(self, kind, payload, owner):
+        """Queue a job and return its id.
+
+        An identical job (same kind, owner and payload) that has not started
+        yet is reused instead of queuing a second copy.
+        """
+        if kind not in self.tasks:
+            raise ValueError(f"Unknown job kind: {kind}")
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        with self._cond:
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND owner = ? AND payload = ? AND state = 'queued'",
+                (kind, owner, raw),
+            ).fetchone()
+            if row:
+                return row["id"]
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO jobs (id, kind, owner, payload, state, created, updated) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                    (job_id, kind, owner, raw, now, now),
+                )
+            self._enqueue(owner, job_id)
+            self._cond.notify()
+        return job_id
+
+    def get(self, job_id):
+        """The job's state, progress and (once finished) result, or None."""
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, owner, limit=20):
+        rows = self.conn.execute("SELECT * FROM jobs WHERE owner = ? ORDER BY created DESC LIMIT ?", (owner, limit))
+        return [self._row(row) for row in rows]
+
+    def position(self, job_id):
+        """Jobs that will run before a queued one (0 when it is next), or None."""
+        with self._cond:
+            queues = [list(self._pending[owner]) for owner in self._owners]
+        order = []
+        while any(queues):
+            # One job per owner per round, in turn order
+            order += [q.pop(0) for q in queues if q]
+        return order.index(job_id) if job_id in order else None
+
+    def cancel(self, job_id):
+        """Cancel a queued job at once, or ask a running one to stop.
+
+        Returns False if the job has already finished.
+        """
+        with self._cond:
+            job = self.get(job_id)
+            if job is None or job["state"] not in ACTIVE:
+                return False
+            if job["state"] == "queued":
+                queued = self._pending.get(job["owner"])
+                if queued is not None and job_id in queued:
+                    queued.remove(job_id)
+                self._update(job_id, state="cancelled", message="Cancelled")
+            else:
+                self._cancelling.add(job_id)
+                self._update(job_id, message="Cancelling")
+        return True
+
+    @staticmethod
+    def _row(row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    # ----- Workers -----
+
+    def _next(self):
+        with self._cond:
+            while True:
+                while self._owners:
+                    owner = self._owners.popleft()
+                    queued = self._pending[owner]
+                    if not queued:
+                        del self._pending[owner]
+                        continue
+                    job_id = queued.popleft()
+                    if queued:
+                        self._owners.append(owner)
+                    else:
+                        del self._pending[owner]
+                    self._update(job_id, state="running", message="Started")
+                    return job_id
+                self._cond.wait()
+
+    def _work(self):
+        while True:
+            job_id = self._next()
+            job = self.get(job_id)
+            try:
+                with span(f"job.{job['kind']}"):
+                    result = self.tasks[job["kind"]](job["payload"], Job(self, job_id))
+            except JobCancelled:
+                self._update(job_id, state="cancelled", message="Cancelled")
+            except Exception as e:
+                self._update(job_id, state="failed", error=f"{type(e).__name__}: {e}", message="Failed")
+            else:
+                self._update(job_id, state="done", message="Done", result=json.dumps(result, ensure_ascii=False))
+            finally:
+                self._cancelling.discard(job_id)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_jobs():
+    """Process-wide job queue, shared by every session."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
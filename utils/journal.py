@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so only one process may write the data
+    fcntl = None
+
+JOURNAL_PATH = "data/journal.jsonl"
+
+
+# ---------- Inter-process Lock ----------
+
+class FileLock:
+    """Exclusive lock shared by every process that opens the same lock file.
+
+    Reentrant within a process, so a holder can call code that takes it
+    again (flock would otherwise block on a second descriptor of our own).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self, blocking=True):
+        if not self._lock.acquire(blocking):
+            return False
+        if self._depth == 0 and fcntl is not None:
+            f = open(self.path, "a+b")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                self._lock.release()
+                return False
+            self._file = f
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# ---------- Write-Ahead Journal ----------
+
+class Journal:
+    """Append-only log of edit batches stored next to the JSON snapshot.
+
+    Each line is one batch: {"ops": [...]}. A batch is written with a single
+    write and fsynced, so a crash can only ever lose the last, torn line.
+    That torn tail is cut off before the next append, so a new batch never
+    lands on the same line as it.
+    Compaction renames the live file to a ".compacting" segment first, so new
+    appends never race with the snapshot being written.
+
+    Several processes (the app and the memory service) may share the files:
+    appends, rotation and reads hold `lock`, and only one process at a time
+    may hold a rotated segment (see begin_compaction).
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.rotated_path = path + ".compacting"
+        self.batches = 0
+        self.lock = FileLock(path + ".lock")
+        self._compaction = FileLock(path + ".compacting.lock")
+
+    def append(self, ops):
+        if not ops:
+            return
+        line = json.dumps({"ops": ops}, ensure_ascii=False) + "\n"
+        with self.lock:
+            _trim_torn(self.path)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        self.batches += 1
+
+    def replay(self):
+        """Yield every op from the rotated segment (if any) and the live log."""
+        self.batches = 0
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        batch = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash: that batch never committed
+                        continue
+                    self.batches += 1
+                    yield from batch.get("ops", [])
+
+    def begin_compaction(self):
+        """Rotate the log unless another process is compacting. Returns False if
+        there is nothing to do; otherwise call end_compaction when done.
+        """
+        if not self._compaction.acquire(blocking=False):
+            return False
+        try:
+            rotated = self.rotate()
+        except BaseException:
+            self._compaction.release()
+            raise
+        if not rotated:
+            self._compaction.release()
+        return rotated
+
+    def end_compaction(self, done=True):
+        """Drop the rotated segment once its ops are in the snapshot (done)."""
+        try:
+            if done:
+                self.discard_rotated()
+        finally:
+            self._compaction.release()
+
+    def rotate(self):
+        """Move the live log aside for compaction. Returns False if empty."""
+        with self.lock:
+            if os.path.exists(self.rotated_path):
+                # A previous compaction did not finish; fold it in this time
+                if os.path.exists(self.path):
+                    _trim_torn(self.rotated_path)
+                    with open(self.path, "rb") as src, open(self.rotated_path, "ab") as dst:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.path)
+            elif os.path.exists(self.path):
+                os.replace(self.path, self.rotated_path)
+            else:
+                return False
+        self.batches = 0
+        return True
+
+    def discard_rotated(self):
+        with self.lock:
+            if os.path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+
+    def stat(self):
+        stat = []
+        for path in (self.path, self.rotated_path):
+            try:
+                st = os.stat(path)
+                stat.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stat.append(None)
+        return tuple(stat)
+
+
+def _trim_torn(path, block=65536):
+    """Cut a file back to its last newline, dropping a torn final line."""
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = end
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            cut = chunk.rfind(b"\n")
+            if cut >= 0:
+                pos = start + cut + 1
+                break
+            pos = start
+        f.truncate(pos)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file, fsync it and rename it over the target."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,130 @@
+import sys
+
+from utils.integrity import MAX_PARENT_AGE, MIN_PARENT_AGE, REPORT_LIMIT, _year
+from utils.storage import is_legacy, relationship_key
+
+ROLES = {"parent": ("parent", "child"), "spouse": ("person1", "person2")}
+
+
+# ---------- Names to Ids ----------
+
+class NameResolver:
+    """Maps legacy relationships, which name people by firstname, onto ids.
+
+    A name shared by several people is resolved by scoring every candidate
+    pair: a plausible parent age or a shared surname for parent links, the
+    same marriage year or close birth years for spouses. Ties go to the
+    person listed last, who is the one the name-keyed app showed. Each
+    guess is recorded in `ambiguous` so it can be reviewed.
+    """
+
+    def __init__(self, by_name):
+        self.by_name = by_name  # firstname -> [person, ...] in file order
+        self.ambiguous = []
+        self.unresolved = []
+
+    def resolve(self, rel):
+        """The relationship with person ids, or None if a name is unknown."""
+        kind = rel.get("type")
+        if kind not in ROLES:
+            return None
+        first, second = ROLES[kind]
+        a_name, b_name = rel.get(first), rel.get(second)
+        a_people, b_people = self.by_name.get(a_name, []), self.by_name.get(b_name, [])
+        if not a_people or not b_people:
+            missing = [n for n, found in ((a_name, a_people), (b_name, b_people)) if not found]
+            self.unresolved.append(f"No person named {', '.join(map(repr, missing))} ({kind}: {a_name} – {b_name}).")
+            return None
+        pairs = [
+            (self._score(kind, a, b), i, j, a, b)
+            for i, a in enumerate(a_people) for j, b in enumerate(b_people) if a is not b
+        ]
+        if not pairs:
+            self.unresolved.append(f"{a_name} cannot be linked to themselves ({kind}).")
+            return None
+        _, _, _, a, b = max(pairs, key=lambda pair: pair[:3])
+        if len(pairs) > 1:
+            self.ambiguous.append(
+                f"{kind} link {a_name} – {b_name}: {len(pairs)} possible pairs, linked ID {a.get('id')} to ID {b.get('id')}."
+            )
+        extra = {k: v for k, v in rel.items() if k not in (first, second)}
+        return {**extra, f"{first}_id": str(a.get("id")), f"{second}_id": str(b.get("id"))}
+
+    @staticmethod
+    def _score(kind, a, b):
+        score = 0
+        a_year, b_year = _year(a), _year(b)
+        if kind == "parent":
+            if a_year is not None and b_year is not None:
+                gap = b_year - a_year
+                score += 2 if MIN_PARENT_AGE <= gap <= MAX_PARENT_AGE else -2 if gap <= 0 else 0
+            if a.get("surname") and a.get("surname") == b.get("surname"):
+                score += 1
+        else:
+            if a.get("marriage_year") and a.get("marriage_year") == b.get("marriage_year"):
+                score += 2
+            if a_year is not None and b_year is not None and abs(a_year - b_year) <= 20:
+                score += 1
+        return score
+
+    def report(self):
+        lines = []
+        for title, notes in (("Guessed", self.ambiguous), ("Dropped", self.unresolved)):
+            if notes:
+                lines.append(f"{title} {len(notes)} relationships:")
+                lines += [f"  {note}" for note in notes[:REPORT_LIMIT]]
+                if len(notes) > REPORT_LIMIT:
+                    lines.append(f"  ... and {len(notes) - REPORT_LIMIT} more")
+        return lines
+
+
+def migrate_relationships(people, relationships, by_name=None):
+    """Id-based copies of `relationships`; legacy ones are resolved by name.
+
+    Returns (migrated, pairs, resolver): `pairs` lists (legacy, resolved or None).
+    """
+    if by_name is None:
+        by_name = {}
+        for p in people:
+            by_name.setdefault(p.get("firstname", ""), []).append(p)
+    resolver = NameResolver(by_name)
+    migrated, pairs, keys = [], [], set()
+    for rel in relationships:
+        resolved = rel
+        if is_legacy(rel):
+            resolved = resolver.resolve(rel)
+            pairs.append((rel, resolved))
+        if resolved is not None and relationship_key(resolved) not in keys:
+            keys.add(relationship_key(resolved))
+            migrated.append(resolved)
+    return migrated, pairs, resolver
+
+
+def migrate_store(store, dry_run=False):
+    """Rewrite the stored legacy relationships with ids.
+
+    The store already resolves them in memory when it loads; this persists
+    the result through the normal journal, then compacts so the data files
+    themselves hold ids. Returns the report lines.
+    """
+    pairs = store.migrated
+    lines = store.migration_report()
+    lines.insert(0, f"{len(pairs)} relationships refer to people by name.")
+    if not pairs or dry_run:
+        return lines
+    # Links deleted by journal ops since the snapshot stay deleted
+    kept = [resolved for _, resolved in pairs if resolved is not None and store.has_relationship(resolved)]
+    ops = [{"op": "delete_relationship", "relationship": legacy} for legacy, _ in pairs]
+    ops += [{"op": "add_relationship", "relationship": resolved} for resolved in kept]
+    store.commit(ops)
+    store.compact()
+    store.migrated = []
+    lines.append("Relationships now refer to people by id.")
+    return lines
+
+
+if __name__ == "__main__":
+    # python -m utils.migrate [--dry-run]: switch relationships from names to ids
+    from utils.store import get_store
+    for line in migrate_store(get_store(), dry_run="--dry-run" in sys.argv[1:]):
+        print(line)
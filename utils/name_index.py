@@ -0,0 +1,204 @@
+import re
+import threading
+from difflib import SequenceMatcher
+
+from utils.store import get_store
+
+DUPLICATE_THRESHOLD = 0.75  # score at which an extracted person is flagged as a likely duplicate
+COMMON_GRAM_LIMIT = 2000  # n-grams shared by more people than this are too common to block on
+
+SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(
+    ["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"]) for c in letters}
+
+
+# ---------- Name Keys ----------
+
+def compact(name):
+    """Lowercase letters and digits only: "Vijaya Laxmi" -> "vijayalaxmi"."""
+    return re.sub(r"[^0-9a-z]", "", str(name or "").lower())
+
+
+def phonetic_key(name, length=6):
+    """Soundex-style code over the compacted name (longer than the classic 4)."""
+    letters = compact(name)
+    letters = re.sub(r"[0-9]", "", letters)
+    if not letters:
+        return ""
+    code = letters[0]
+    last = SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c, "")
+        if digit and digit != "0" and digit != last:
+            code += digit
+        if c not in "hw":
+            last = digit
+    return code[:length]
+
+
+def ngrams(name, n=3):
+    text = f"^{compact(name)}$"
+    return {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+
+
+def full_name(person):
+    return f"{person.get('firstname', '')} {person.get('surname', '') or person.get('lastname', '')}".strip()
+
+
+# ---------- Name Index ----------
+
+class NameIndex:
+    """Blocking index over the store's people for fuzzy duplicate detection.
+
+    Candidates come from the phonetic-key block plus people sharing enough
+    character trigrams with the query, so a lookup touches only the postings
+    of its own keys rather than every person. The index is kept in sync with
+    the store incrementally: only people whose record changed are re-keyed.
+    """
+
+    def __init__(self):
+        self.store = None
+        self.version = None
+        self._people = {}
+        self._keys = {}
+        self._phonetic = {}
+        self._grams = {}
+        self._lock = threading.Lock()
+
+    def sync(self, store):
+        if store.version == self.version:
+            return
+        with self._lock:
+            snapshot = store.snapshot()
+            if snapshot.version == self.version:
+                return
+            current = snapshot.by_id
+            for pid in [pid for pid in self._people if pid not in current]:
+                self._remove(pid)
+            for pid, person in current.items():
+                if self._people.get(pid) is not person:
+                    self._remove(pid)
+                    self._add(pid, person)
+            self.store = store
+            self.version = snapshot.version
+
+    def _add(self, pid, person):
+        first = person.get("firstname", "")
+        keys = {phonetic_key(first), phonetic_key(full_name(person))} - {""}
+        grams = ngrams(first)
+        self._people[pid] = person
+        self._keys[pid] = (keys, grams)
+        for key in keys:
+            self._phonetic.setdefault(key, set()).add(pid)
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(pid)
+
+    def _remove(self, pid):
+        if pid not in self._people:
+            return
+        keys, grams = self._keys.pop(pid)
+        del self._people[pid]
+        for key in keys:
+            self._phonetic[key].discard(pid)
+        for gram in grams:
+            self._grams[gram].discard(pid)
+
+    def candidates(self, person):
+        first = person.get("firstname", "")
+        found = set()
+        for key in {phonetic_key(first), phonetic_key(full_name(person))} - {""}:
+            found |= self._phonetic.get(key, set())
+        grams = ngrams(first)
+        counts = {}
+        for gram in grams:
+            posting = self._grams.get(gram, ())
+            if len(posting) > COMMON_GRAM_LIMIT:
+                continue
+            for pid in posting:
+                counts[pid] = counts.get(pid, 0) + 1
+        # Require a meaningful share of trigrams before a full comparison
+        needed = max(2, len(grams) // 3)
+        found |= {pid for pid, count in counts.items() if count >= needed}
+        return found
+
+    def match(self, person, relatives=(), limit=5):
+        """Rank existing people that may be `person`.
+
+        `relatives` are names linked to the person in the same extraction
+        (parents, children, spouses); overlap with an existing person's
+        relatives raises the score. Returns [(score, existing_person, reasons)].
+        """
+        relatives = {compact(r) for r in relatives} - {""}
+        results = []
+        for pid in self.candidates(person):
+            existing = self._people[pid]
+            score, reasons = self._score(person, existing, relatives)
+            if score > 0:
+                results.append((score, existing, reasons))
+        results.sort(key=lambda r: -r[0])
+        return results[:limit]
+
+    def _score(self, person, existing, relatives):
+        a, b = compact(person.get("firstname")), compact(existing.get("firstname"))
+        if not a or not b:
+            return 0.0, []
+        name = SequenceMatcher(None, a, b).ratio()
+        reasons = [f"name {name:.0%}"]
+        score = name
+
+        surname_a = compact(person.get("surname") or person.get("lastname"))
+        surname_b = compact(existing.get("surname") or existing.get("lastname"))
+        if surname_a and surname_b:
+            if surname_a == surname_b:
+                score += 0.1
+                reasons.append("same surname")
+            else:
+                score -= 0.2
+                reasons.append("different surname")
+
+        gender_a, gender_b = str(person.get("gender", "")).lower(), str(existing.get("gender", "")).lower()
+        if gender_a and gender_b and gender_a != gender_b:
+            score -= 0.3
+            reasons.append("different gender")
+
+        year_a, year_b = str(person.get("birth_year", "")), str(existing.get("birth_year", ""))
+        if year_a.isdigit() and year_b.isdigit():
+            gap = abs(int(year_a) - int(year_b))
+            if gap == 0:
+                score += 0.1
+                reasons.append("same birth year")
+            elif gap > 2:
+                score -= min(0.4, 0.05 * gap)
+                reasons.append(f"birth years {gap} apart")
+
+        if relatives:
+            pid, store = str(existing.get("id")), self.store
+            known = set()
+            for linked in (store.parents_of(pid), store.children_of(pid), store.spouses_of(pid)):
+                known.update(compact(store.by_id.get(r, {}).get("firstname")) for r in linked)
+            shared = relatives & known
+            if shared:
+                score += 0.15 * len(shared)
+                reasons.append(f"{len(shared)} shared relative(s)")
+        return round(min(score, 1.0), 3), reasons
+
+
+def relatives_in(name, relationships):
+    """Names linked to `name` by the given (extracted, name-based) relationships."""
+    key = compact(name)
+    linked = []
+    for rel in relationships:
+        ends = (rel.get("parent"), rel.get("child")) if rel.get("type") == "parent" else (rel.get("person1"), rel.get("person2"))
+        if compact(ends[0]) == key:
+            linked.append(ends[1])
+        elif compact(ends[1]) == key:
+            linked.append(ends[0])
+    return [n for n in linked if n]
+
+
+_index = NameIndex()
+
+
+def get_name_index():
+    """Shared name index, synced with the current store version."""
+    _index.sync(get_store())
+    return _index
@@ -0,0 +1,134 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.store import get_store
+
+PAGE_SIZE = 50
+SEARCH_LIMIT = 50  # type-ahead suggestions shown at once
+NUMERIC_COLUMNS = {"id", "birth_year", "death_year", "marriage_year"}
+CATEGORY_COLUMNS = {"gender"}  # filtered by exact value instead of prefix
+
+
+# ---------- People Index ----------
+
+class PeopleIndex:
+    """Sorted-column and value indexes over one version of the people table.
+
+    Built once per store version and shared by every session. Each column's
+    sort order is computed on first use; prefix filters are binary searches
+    over that order and category filters read a postings list, so a page
+    query never scans the table row by row. Only the requested page of rows
+    is materialised.
+    """
+
+    def __init__(self, store):
+        self.version = store.version
+        self.df = store.dataframe()
+        self._orders = {}
+        self._text_indexes = {}
+        self._postings = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def columns(self):
+        return list(self.df.columns)
+
+    def _text(self, column):
+        return self.df[column].fillna("").astype(str).str.strip().str.lower().to_numpy(dtype=str)
+
+    def _text_index(self, column):
+        """(row order, sorted lowercase keys) for prefix search on `column`."""
+        entry = self._text_indexes.get(column)
+        if entry is None:
+            with self._lock:
+                entry = self._text_indexes.get(column)
+                if entry is None:
+                    keys = self._text(column)
+                    order = np.argsort(keys, kind="stable")
+                    entry = self._text_indexes[column] = (order, keys[order])
+        return entry
+
+    def order(self, column):
+        """Row positions sorted by `column` (numbers numerically, text case-insensitively)."""
+        if column not in NUMERIC_COLUMNS:
+            return self._text_index(column)[0]
+        order = self._orders.get(column)
+        if order is None:
+            with self._lock:
+                order = self._orders.get(column)
+                if order is None:
+                    keys = pd.to_numeric(self.df[column], errors="coerce").to_numpy(dtype=float)
+                    order = self._orders[column] = np.argsort(keys, kind="stable")  # NaN sorts last
+        return order
+
+    def prefix(self, column, text):
+        """Row positions whose `column` starts with `text` (case-insensitive)."""
+        text = str(text).strip().lower()
+        order, keys = self._text_index(column)
+        lo = np.searchsorted(keys, text, side="left")
+        hi = np.searchsorted(keys, text + "\U0010ffff", side="left")
+        return order[lo:hi]
+
+    def equals(self, column, value):
+        postings = self._postings.get(column)
+        if postings is None:
+            with self._lock:
+                postings = self._postings.get(column)
+                if postings is None:
+                    keys = self._text(column)
+                    groups = pd.Series(keys).groupby(keys).indices
+                    postings = self._postings[column] = {k: np.asarray(v) for k, v in groups.items()}
+        return postings.get(str(value).strip().lower(), np.empty(0, dtype=int))
+
+    def values(self, column):
+        """Distinct non-empty values of a category column, for filter widgets."""
+        self.equals(column, "")
+        return sorted(v for v in self._postings[column] if v)
+
+    def query(self, filters=None, sort_by="id", descending=False, page=0, page_size=PAGE_SIZE):
+        """One page of people matching `filters` ({column: prefix or value}).
+
+        Returns (page_df, total_matches).
+        """
+        mask = None
+        for column, value in (filters or {}).items():
+            if column not in self.df.columns or value in (None, ""):
+                continue
+            positions = self.equals(column, value) if column in CATEGORY_COLUMNS else self.prefix(column, value)
+            selected = np.zeros(len(self.df), dtype=bool)
+            selected[positions] = True
+            mask = selected if mask is None else mask & selected
+        order = self.order(sort_by if sort_by in self.df.columns else "id")
+        if descending:
+            order = order[::-1]
+        if mask is not None:
+            order = order[mask[order]]
+        start = page * page_size
+        return self.df.iloc[order[start:start + page_size]], len(order)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Type-ahead: ids of people whose first name starts with `text`, alphabetical."""
+        positions = self.prefix("firstname", text) if text else self.order("firstname")
+        return self.df["id"].iloc[positions[:limit]].astype(str).tolist()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_people_index():
+    """Shared index for the current store version (rebuilt lazily after edits)."""
+    global _index
+    store = get_store()
+    index = _index
+    if index is None or index.version != store.version:
+        with _index_lock:
+            if _index is None or _index.version != store.version:
+                _index = PeopleIndex(store)
+            index = _index
+    return index
@@ -0,0 +1,347 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from utils.journal import FileLock, Journal, JOURNAL_PATH, write_json_atomic
+
+PEOPLE_PATH = "data/people_only.json"
+RELATIONSHIPS_PATH = "data/relationships_only.json"
+SQLITE_PATH = "data/family.db"
+COMPACT_EVERY = 200  # journal batches before a background compaction
+
+
+def relationship_ends(rel):
+    """(parent, child) or (person1, person2) ids of a relationship."""
+    if rel.get("type") == "parent":
+        return str(rel["parent_id"]), str(rel["child_id"])
+    return str(rel["person1_id"]), str(rel["person2_id"])
+
+
+def is_legacy(rel):
+    """True for a relationship that still names people by firstname (see utils.migrate)."""
+    return "parent_id" not in rel and "person1_id" not in rel
+
+
+def relationship_key(rel):
+    """Hashable identity of a relationship; spouse links are order-insensitive.
+
+    Legacy links get the same shape of key from their names, which is how
+    SQLite rows written before ids were introduced are found again.
+    """
+    kind = rel.get("type")
+    if kind not in ("parent", "spouse"):
+        return tuple(sorted(rel.items()))
+    if is_legacy(rel):
+        a, b = (rel["parent"], rel["child"]) if kind == "parent" else (rel["person1"], rel["person2"])
+    else:
+        a, b = relationship_ends(rel)
+    if kind == "spouse":
+        return (kind, tuple(sorted([a, b])))
+    return (kind, a, b)
+
+
+# ---------- Storage Backends ----------
+#
+# A backend persists the tree and hands it to FamilyStore. Both backends
+# accept the same journal ops (add/update/delete person or relationship):
+#   signature()      cheap token that changes whenever the stored data does
+#   load()           (people, relationships, pending_ops, digest)
+#   append(ops)      durably persist one batch of ops
+#   lock()           inter-process lock the store holds from reading the
+#                    latest data to appending to it, so processes sharing
+#                    the data never write over each other's changes
+#   begin_compaction() / finish_compaction(people, relationships)
+#                    fold pending ops into the base representation; begin
+#                    runs under the store lock, finish runs outside it
+#   indexed          True if the backend answers children_of, parents_of,
+#                    spouses_of and has_relationship with indexed queries;
+#                    FamilyStore then sends those lookups to it
+
+
+class JsonStorage:
+    """Pretty-printed JSON snapshot files plus an append-only journal."""
+
+    indexed = False
+
+    def __init__(self, people_path=PEOPLE_PATH, relationships_path=RELATIONSHIPS_PATH, journal_path=JOURNAL_PATH):
+        self.people_path = people_path
+        self.relationships_path = relationships_path
+        self.journal = Journal(journal_path)
+
+    def signature(self):
+        stat = []
+        for path in (self.people_path, self.relationships_path):
+            try:
+                st = os.stat(path)
+                stat.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stat.append(None)
+        return tuple(stat) + self.journal.stat()
+
+    def lock(self):
+        return self.journal.lock
+
+    def load(self, known_digest=None):
+        """Read snapshot and journal; returns None lists if the digest matches."""
+        with self.lock():
+            return self._load(known_digest)
+
+    def _load(self, known_digest):
+        if not os.path.exists(self.people_path):
+            return [], [], [], None
+        h = hashlib.blake2b(digest_size=16)
+        with open(self.people_path, "rb") as f:
+            people_raw = f.read()
+        h.update(people_raw)
+        relationships_raw = b"[]"
+        if os.path.exists(self.relationships_path):
+            with open(self.relationships_path, "rb") as f:
+                relationships_raw = f.read()
+        h.update(b"\0" + relationships_raw)
+        for path in (self.journal.rotated_path, self.journal.path):
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    h.update(b"\0" + f.read())
+        digest = h.hexdigest()
+        if digest == known_digest:
+            return None, None, None, digest
+        return json.loads(people_raw), json.loads(relationships_raw), list(self.journal.replay()), digest
+
+    def append(self, ops):
+        self.journal.append(ops)
+
+    def needs_compaction(self):
+        return self.journal.batches >= COMPACT_EVERY
+
+    def begin_compaction(self):
+        return self.journal.begin_compaction()
+
+    def finish_compaction(self, people, relationships):
+        done = False
+        try:
+            write_json_atomic(self.relationships_path, relationships)
+            write_json_atomic(self.people_path, people)
+            done = True
+        finally:
+            self.journal.end_compaction(done)
+
+
+class SqliteStorage:
+    """People and relationships in indexed SQLite tables.
+
+    Beyond the backend interface it answers structural lookups with indexed
+    queries, so callers can work on trees too large to hold in memory. The
+    parent/child/person1/person2 columns hold person ids.
+    """
+
+    indexed = True
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS people (
+        id TEXT PRIMARY KEY,
+        firstname TEXT NOT NULL DEFAULT '',
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_people_firstname ON people(firstname);
+    CREATE TABLE IF NOT EXISTS relationships (
+        key TEXT PRIMARY KEY,
+        type TEXT NOT NULL,
+        parent TEXT,
+        child TEXT,
+        person1 TEXT,
+        person2 TEXT,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_rel_parent ON relationships(parent);
+    CREATE INDEX IF NOT EXISTS idx_rel_child ON relationships(child);
+    CREATE INDEX IF NOT EXISTS idx_rel_person1 ON relationships(person1);
+    CREATE INDEX IF NOT EXISTS idx_rel_person2 ON relationships(person2);
+    CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    INSERT OR IGNORE INTO meta (name, value) VALUES ('version', 0);
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = FileLock(path + ".lock")
+        self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self):
+        # sqlite3 connections are bound to their thread; Streamlit runs each
+        # session on its own thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lock(self):
+        return self._lock
+
+    def signature(self):
+        return self.conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()[0]
+
+    def load(self, known_digest=None):
+        digest = f"sqlite:{self.signature()}"
+        if digest == known_digest:
+            return None, None, None, digest
+        people = [json.loads(row[0]) for row in self.conn.execute("SELECT data FROM people ORDER BY rowid")]
+        relationships = [json.loads(row[0]) for row in self.conn.execute("SELECT data FROM relationships ORDER BY rowid")]
+        return people, relationships, [], digest
+
+    def append(self, ops):
+        with self.conn:
+            for op in ops:
+                self._apply(op)
+            self.conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'version'")
+
+    def needs_compaction(self):
+        return False
+
+    def begin_compaction(self):
+        return True
+
+    def finish_compaction(self, people, relationships):
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _apply(self, op):
+        kind = op.get("op")
+        if kind == "add_person":
+            self._put_person(op["person"])
+        elif kind == "update_person":
+            current = self.get_person(op["id"])
+            if current is not None:
+                self._put_person({**current, **op["fields"]})
+        elif kind == "delete_person":
+            self.conn.execute("DELETE FROM people WHERE id = ?", (str(op["id"]),))
+        elif kind == "add_relationship":
+            rel = op["relationship"]
+            self.conn.execute(
+                "INSERT OR IGNORE INTO relationships (key, type, parent, child, person1, person2, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._key(rel), rel.get("type", ""), rel.get("parent_id"), rel.get("child_id"),
+                 rel.get("person1_id"), rel.get("person2_id"), json.dumps(rel, ensure_ascii=False)),
+            )
+        elif kind == "delete_relationship":
+            self.conn.execute("DELETE FROM relationships WHERE key = ?", (self._key(op["relationship"]),))
+
+    def _put_person(self, person):
+        self.conn.execute(
+            "INSERT INTO people (id, firstname, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET firstname = excluded.firstname, data = excluded.data",
+            (str(person.get("id", "")), person.get("firstname", ""), json.dumps(person, ensure_ascii=False)),
+        )
+
+    @staticmethod
+    def _key(rel):
+        return json.dumps(relationship_key(rel), ensure_ascii=False)
+
+    def bulk_load(self, people, relationships):
+        """Insert many records in one transaction (used by migrations/imports)."""
+        self.append(
+            [{"op": "add_person", "person": p} for p in people]
+            + [{"op": "add_relationship", "relationship": r} for r in relationships]
+        )
+
+    # ----- Indexed lookups -----
+
+    def get_person(self, person_id):
+        row = self.conn.execute("SELECT data FROM people WHERE id = ?", (str(person_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_people(self, firstname):
+        rows = self.conn.execute("SELECT data FROM people WHERE firstname = ?", (firstname,))
+        return [json.loads(row[0]) for row in rows]
+
+    def count_people(self):
+        return self.conn.execute("SELECT COUNT(*) FROM people").fetchone()[0]
+
+    def iter_people(self, batch_size=1000):
+        last = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT rowid, data FROM people WHERE rowid > ? ORDER BY rowid LIMIT ?", (last, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [json.loads(data) for _, data in rows]
+
+    def children_of(self, person_id):
+        return [row[0] for row in self.conn.execute(
+            "SELECT child FROM relationships WHERE type = 'parent' AND parent = ?", (str(person_id),))]
+
+    def parents_of(self, person_id):
+        return [row[0] for row in self.conn.execute(
+            "SELECT parent FROM relationships WHERE type = 'parent' AND child = ?", (str(person_id),))]
+
+    def spouses_of(self, person_id):
+        pid = str(person_id)
+        return [row[0] for row in self.conn.execute(
+            "SELECT person2 FROM relationships WHERE type = 'spouse' AND person1 = ? "
+            "UNION ALL SELECT person1 FROM relationships WHERE type = 'spouse' AND person2 = ?", (pid, pid))]
+
+    def has_relationship(self, rel):
+        return self.conn.execute("SELECT 1 FROM relationships WHERE key = ?", (self._key(rel),)).fetchone() is not None
+
+
+# ---------- Backend Selection and Migration ----------
+
+def migrate_json_to_sqlite(db_path=SQLITE_PATH, source=None):
+    """One-shot copy of the JSON snapshot plus journal into a SQLite database."""
+    from utils.store import FamilyStore
+    store = FamilyStore(source or JsonStorage())
+    store.refresh()
+    # Build next to the target and rename, so a failed run leaves no half database
+    tmp_path = f"{db_path}.tmp"
+    for path in (tmp_path, tmp_path + "-wal", tmp_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    target = SqliteStorage(tmp_path)
+    target.bulk_load(store.people, store.relationships)
+    target.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    target.conn.close()
+    os.replace(tmp_path, db_path)
+    for path in (tmp_path + "-wal", tmp_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    return SqliteStorage(db_path)
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Backend chosen by FAMILY_TREE_STORAGE ("json" or "sqlite").
+
+    The first time the SQLite backend is used it is seeded from the JSON files.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if os.environ.get("FAMILY_TREE_STORAGE", "json") == "sqlite":
+                    db_path = os.environ.get("FAMILY_TREE_DB", SQLITE_PATH)
+                    if os.path.exists(db_path):
+                        _storage = SqliteStorage(db_path)
+                    else:
+                        _storage = migrate_json_to_sqlite(db_path)
+                else:
+                    _storage = JsonStorage()
+    return _storage
+
+
+if __name__ == "__main__":
+    # python -m utils.storage migrate [db_path]
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        db = migrate_json_to_sqlite(sys.argv[2] if len(sys.argv) > 2 else SQLITE_PATH)
+        print(f"Migrated {db.count_people()} people into {db.path}")
+    else:
+        print("usage: python -m utils.storage migrate [db_path]")
@@ -0,0 +1,437 @@
+import hashlib
+import json
+import threading
+from collections import deque, namedtuple
+from itertools import islice
+
+import pandas as pd
+
+from utils.graph import FamilyGraph
+from utils.storage import get_storage, is_legacy, relationship_ends, relationship_key
+from utils.timing import span
+
+PEOPLE_COLUMNS = ["id", "firstname", "gender"]
+OP_LOG_SIZE = 10000  # recent ops kept for indexes that follow the store incrementally
+_HASH_MOD = 1 << 128
+
+
+class StaleVersionError(RuntimeError):
+    """The store changed after the caller read it (see FamilyStore.commit)."""
+
+
+class StoreLoadError(RuntimeError):
+    """The data files could not be read (see FamilyStore.refresh)."""
+
+
+class Snapshot(namedtuple("Snapshot", "version seq by_id by_name relationships graph")):
+    """Indexes as of one version; see FamilyStore.snapshot."""
+
+    __slots__ = ()
+
+    def display_name(self, pid):
+        return _display_name(self.by_id, self.by_name, pid)
+
+
+def _display_name(by_id, by_name, pid):
+    person = by_id.get(str(pid))
+    if person is None:
+        return f"#{pid}"
+    name = person.get("firstname", "")
+    return name if len(by_name.get(name, ())) <= 1 else f"{name} (#{pid})"
+
+
+def people_frame(people):
+    """DataFrame of `people` with at least the PEOPLE_COLUMNS."""
+    df = pd.DataFrame(people)
+    for col in PEOPLE_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    return df
+
+
+_encode = json.JSONEncoder(sort_keys=True, default=str, ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _fingerprint(kind, record):
+    # 128-bit hash of one record; the tree's version is the sum over all of them
+    raw = (kind + _encode(record)).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=16).digest(), "big")
+
+
+def _clean_record(record):
+    # DataFrame rows carry NaN for fields a person never had
+    return {k: v for k, v in record.items() if not (isinstance(v, float) and v != v)}
+
+
+# ---------- Process-wide Family Store ----------
+
+class FamilyStore:
+    """Loads the family data once and keeps it indexed in memory.
+
+    Streamlit re-runs every script on each click, so the store lives at
+    module level and is shared by all tabs and sessions. It reloads only when
+    the stored data actually changes (cheap signature first, then content hash).
+
+    Edits are persisted through the storage backend (see utils.storage) and
+    applied to the in-memory indexes directly, so no reload follows a save.
+
+    The indexes are copy-on-write: code that iterates over them takes a
+    snapshot(), and the next commit copies whatever a snapshot may still be
+    reading before changing it. Single lookups (by_id.get) need no snapshot.
+
+    `version` hashes the content, not the files: it is the sum of one hash
+    per record, kept up to date as ops are applied, so every process (and a
+    restart) holding the same tree reports the same version.
+
+    Relationships refer to people by id. Their links are held in a
+    FamilyGraph (utils.graph) of integer nodes and flat arrays; older data
+    that names people instead is resolved to ids as it loads (utils.migrate).
+    """
+
+    def __init__(self, storage=None):
+        self.storage = storage or get_storage()
+        # Structural lookups go to the backend when it has indexes for them
+        self._lookups = self.storage if self.storage.indexed else None
+        self._lock = threading.RLock()
+        self._stat = None
+        self._digest = None
+        self._compacting = False
+        self._shared = False
+        self._seq = 0
+        self._log = deque(maxlen=OP_LOG_SIZE)
+        self._index([], [])
+
+    # ----- Change detection -----
+
+    def refresh(self):
+        """Reload from storage if it changed. Returns True if reloaded.
+
+        If the files cannot be read, StoreLoadError is raised and the store
+        keeps the tree it last loaded; the next call tries again.
+        """
+        stat = self.storage.signature()
+        if stat == self._stat:
+            return False
+        with self._lock:
+            stat = self.storage.signature()
+            if stat == self._stat:
+                return False
+            try:
+                with span("storage.load"):
+                    people, relationships, pending, digest = self.storage.load(self._digest)
+            except Exception as e:
+                # An empty tree here would be saved over the real one by the next commit
+                raise StoreLoadError(f"could not load the family tree: {e}") from e
+            self._stat = stat
+            if digest == self._digest:
+                return False
+            self._digest = digest
+            with span("store.index"):
+                self._index(people, relationships)
+                for op in pending:
+                    self._apply(op)
+            return True
+
+    # ----- Indexes -----
+
+    def _index(self, people, relationships):
+        # Fresh objects: snapshots of the old ones stay as they were
+        self._shared = False
+        self.by_id = {}
+        self.by_name = {}
+        self.graph = FamilyGraph()
+        self._relationships = {}
+        self._content = 0
+        self._resolver = None
+        self.migrated = []  # (legacy relationship, resolved or None) found while loading
+        for p in people:
+            self._add_person(p)
+        if any(is_legacy(rel) for rel in relationships):
+            from utils.migrate import migrate_relationships
+            relationships, self.migrated, self._resolver = migrate_relationships(people, relationships, self.by_name)
+            print(f"Resolved {len(self.migrated)} name-based relationships to ids; "
+                  "run `python -m utils.migrate` to store them that way.")
+        parent_links, spouse_links = [], []
+        for rel in relationships:
+            key = relationship_key(rel)
+            if key in self._relationships:
+                continue
+            self._relationships[key] = rel
+            self._content += _fingerprint("relationship", rel)
+            if rel.get("type") == "parent":
+                parent_links.append(relationship_ends(rel))
+            elif rel.get("type") == "spouse":
+                spouse_links.append(relationship_ends(rel))
+        self.graph = FamilyGraph(self.by_id, parent_links, spouse_links)
+        self._content %= _HASH_MOD
+        # A full reload starts a new op history
+        self._seq += 1
+        self._log.clear()
+        self._changed()
+
+    def snapshot(self):
+        """The current indexes, safe to iterate while other sessions commit."""
+        with self._lock:
+            self._shared = True
+            return Snapshot(self.version, self._seq, self.by_id, self.by_name, self._relationships, self.graph)
+
+    def _unshare(self):
+        # Copy before the first write after a snapshot was handed out
+        if not self._shared:
+            return
+        self.by_id = dict(self.by_id)
+        self.by_name = {name: list(people) for name, people in self.by_name.items()}
+        self._relationships = dict(self._relationships)
+        self.graph = self.graph.copy()
+        if self._resolver is not None:
+            self._resolver.by_name = self.by_name
+        self._shared = False
+
+    def _changed(self):
+        self._people_list = None
+        self._relationships_list = None
+        self._df = None
+
+    def _add_person(self, p):
+        pid = str(p.get("id", ""))
+        if pid in self.by_id:
+            self._remove_person(pid)
+        self.by_id[pid] = p
+        self._content = (self._content + _fingerprint("person", p)) % _HASH_MOD
+        self.by_name.setdefault(p.get("firstname", ""), []).append(p)
+        self.graph.node(pid)
+
+    def _remove_person(self, pid):
+        p = self.by_id.pop(pid, None)
+        if p is None:
+            return
+        self._content = (self._content - _fingerprint("person", p)) % _HASH_MOD
+        matches = self.by_name.get(p.get("firstname", ""), [])
+        matches[:] = [m for m in matches if m is not p]
+        if not matches:
+            self.by_name.pop(p.get("firstname", ""), None)
+
+    def _resolve(self, rel):
+        # Journal ops written before relationships used ids
+        if not is_legacy(rel):
+            return rel
+        if self._resolver is None:
+            from utils.migrate import NameResolver
+            self._resolver = NameResolver(self.by_name)
+        return self._resolver.resolve(rel)
+
+    def _add_relationship(self, rel):
+        rel = self._resolve(rel)
+        if rel is None:
+            return
+        key = relationship_key(rel)
+        if key in self._relationships:
+            return
+        self._relationships[key] = rel
+        self._content = (self._content + _fingerprint("relationship", rel)) % _HASH_MOD
+        if rel.get("type") == "parent":
+            self.graph.add_parent(*relationship_ends(rel))
+        elif rel.get("type") == "spouse":
+            self.graph.add_spouse(*relationship_ends(rel))
+
+    def _remove_relationship(self, rel):
+        rel = self._resolve(rel)
+        rel = self._relationships.pop(relationship_key(rel), None) if rel else None
+        if rel is None:
+            return
+        self._content = (self._content - _fingerprint("relationship", rel)) % _HASH_MOD
+        if rel.get("type") == "parent":
+            self.graph.remove_parent(*relationship_ends(rel))
+        elif rel.get("type") == "spouse":
+            self.graph.remove_spouse(*relationship_ends(rel))
+
+    def _apply(self, op):
+        # Every op is idempotent so a journal can be replayed over a snapshot
+        # that already contains some of it (e.g. after an interrupted compaction)
+        kind = op.get("op")
+        if kind == "add_person":
+            self._add_person(op["person"])
+        elif kind == "update_person":
+            current = self.by_id.get(str(op["id"]))
+            if current is not None:
+                self._add_person({**current, **op["fields"]})
+        elif kind == "delete_person":
+            self._remove_person(str(op["id"]))
+        elif kind == "add_relationship":
+            self._add_relationship(op["relationship"])
+        elif kind == "delete_relationship":
+            self._remove_relationship(op["relationship"])
+        self._changed()
+
+    @property
+    def people(self):
+        with self._lock:
+            if self._people_list is None:
+                self._people_list = list(self.by_id.values())
+            return self._people_list
+
+    @property
+    def relationships(self):
+        with self._lock:
+            if self._relationships_list is None:
+                self._relationships_list = list(self._relationships.values())
+            return self._relationships_list
+
+    @property
+    def version(self):
+        """Content hash of the tree, usable as a cache key."""
+        return f"{self._content:032x}" if self.by_id or self._relationships else "empty"
+
+    @property
+    def seq(self):
+        """Change counter: bumped by every committed op and every reload."""
+        return self._seq
+
+    def ops_since(self, seq):
+        """Ops committed after change `seq`, or None if that history is gone
+        (a reload happened or more than OP_LOG_SIZE ops were committed since).
+        """
+        with self._lock:
+            first = self._seq - len(self._log)
+            if seq is None or seq < first or seq > self._seq:
+                return None
+            return list(islice(self._log, seq - first, None))
+
+    def has_relationship(self, rel):
+        if self._lookups is not None:
+            return self._lookups.has_relationship(rel)
+        return relationship_key(rel) in self._relationships
+
+    def _linked(self, adjacency, pid):
+        node = self.graph.node(pid, create=False)
+        ids = self.graph.ids
+        return [] if node is None else [ids[n] for n in adjacency[node]]
+
+    def children_of(self, pid):
+        if self._lookups is not None:
+            return self._lookups.children_of(pid)
+        return self._linked(self.graph.children, pid)
+
+    def parents_of(self, pid):
+        if self._lookups is not None:
+            return self._lookups.parents_of(pid)
+        return self._linked(self.graph.parents, pid)
+
+    def spouses_of(self, pid):
+        if self._lookups is not None:
+            return self._lookups.spouses_of(pid)
+        return self._linked(self.graph.spouses, pid)
+
+    def next_id(self):
+        """Smallest numeric id above every existing one, as a string."""
+        with self._lock:
+            return str(max([int(pid) for pid in self.by_id if pid.isdigit()] + [0]) + 1)
+
+    def display_name(self, pid):
+        """Firstname of a person, with the id added when others share it."""
+        return _display_name(self.by_id, self.by_name, pid)
+
+    def migration_report(self):
+        return self._resolver.report() if self._resolver else []
+
+    def dataframe(self):
+        with self._lock:
+            if self._df is None:
+                self._df = people_frame(self.people)
+            return self._df
+
+    # ----- Writes -----
+
+    def diff(self, people, relationships):
+        """Journal ops that turn the current state into the given lists."""
+        with self._lock:
+            return self._diff(people, relationships)
+
+    def _diff(self, people, relationships):
+        ops = []
+        seen = set()
+        for record in people:
+            person = _clean_record(record)
+            pid = str(person.get("id", ""))
+            seen.add(pid)
+            current = self.by_id.get(pid)
+            if current is None:
+                ops.append({"op": "add_person", "person": person})
+                continue
+            fields = {k: v for k, v in person.items() if current.get(k) != v}
+            if fields:
+                ops.append({"op": "update_person", "id": pid, "fields": fields})
+        for pid in self.by_id:
+            if pid not in seen:
+                ops.append({"op": "delete_person", "id": pid})
+        keys = set()
+        for rel in relationships:
+            key = relationship_key(rel)
+            keys.add(key)
+            if key not in self._relationships:
+                ops.append({"op": "add_relationship", "relationship": rel})
+        for key, rel in self._relationships.items():
+            if key not in keys:
+                ops.append({"op": "delete_relationship", "relationship": rel})
+        return ops
+
+    def commit(self, ops, expected_seq=None):
+        """Durably persist one batch of ops and apply it in memory.
+
+        With expected_seq, the batch is only written if nothing else was
+        committed (or reloaded) since that change number; otherwise
+        StaleVersionError is raised and nothing is written.
+        """
+        if not ops:
+            return
+        # The storage lock keeps another process from appending between our
+        # refresh and our append, which would leave its ops unseen here
+        with self._lock, self.storage.lock():
+            self.refresh()
+            if expected_seq is not None and expected_seq != self._seq:
+                raise StaleVersionError(f"store is at change {self._seq}, not {expected_seq}")
+            self.storage.append(ops)
+            self._unshare()
+            for op in ops:
+                self._apply(op)
+            self._seq += len(ops)
+            self._log.extend(ops)
+            # No longer the digest of the files; only a later reload compares it
+            batch = json.dumps(ops, sort_keys=True, default=str).encode("utf-8")
+            self._digest = hashlib.blake2b((self._digest or "").encode() + batch, digest_size=16).hexdigest()
+            self._stat = self.storage.signature()
+            if self.storage.needs_compaction() and not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Let the backend fold its pending ops into its base representation."""
+        try:
+            with self._lock, self.storage.lock():
+                self._compacting = True
+                # The snapshot replaces every pending op, including those
+                # another process appended since we last looked
+                self.refresh()
+                if not self.storage.begin_compaction():
+                    return
+                people, relationships = list(self.people), list(self.relationships)
+            self.storage.finish_compaction(people, relationships)
+        finally:
+            with self._lock:
+                self._compacting = False
+                self._stat = self.storage.signature()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the shared FamilyStore, reloading it if the data files changed."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FamilyStore()
+    _store.refresh()
+    return _store
@@ -0,0 +1,182 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+# Latency bucket upper bounds in seconds (Prometheus-style cumulative histogram)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = os.environ.get("FAMILY_TREE_TIMING", "").lower() in ("1", "true", "yes")
+_histograms = {}
+_lock = threading.Lock()
+# Each Streamlit session reruns its script on its own thread
+_local = threading.local()
+
+
+# ---------- Switches ----------
+
+def enable(on=True):
+    """Time every thread in the process (benchmarks, FAMILY_TREE_TIMING)."""
+    global _enabled
+    _enabled = bool(on)
+
+
+def enable_here(on=True):
+    """Time only the current thread, e.g. one session's script run."""
+    _local.enabled = bool(on)
+
+
+def is_enabled():
+    return _enabled or getattr(_local, "enabled", False)
+
+
+# ---------- Spans ----------
+
+class _Span:
+    __slots__ = ("name", "start", "depth")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        _local.depth = self.depth
+        record(self.name, seconds, self.depth)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Time a block: `with span("chroma.query"): ...`. A shared no-op when disabled."""
+    return _Span(name) if _enabled or getattr(_local, "enabled", False) else _NULL_SPAN
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not (_enabled or getattr(_local, "enabled", False)):
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(name, seconds, depth=0):
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+        hist["count"] += 1
+        hist["sum"] += seconds
+        hist["max"] = max(hist["max"], seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+                break
+    spans = getattr(_local, "spans", None)
+    if spans is not None:
+        spans.append((name, seconds, depth))
+
+
+# ---------- Per-Rerun Collection ----------
+
+def start_rerun():
+    """Begin collecting spans for the current script run on this thread."""
+    _local.spans = []
+    _local.depth = 0
+
+
+def rerun_spans():
+    """[(name, seconds, depth)] recorded on this thread since start_rerun()."""
+    return list(getattr(_local, "spans", None) or [])
+
+
+class profile_rerun:
+    """cProfile the enclosed block; `.report(limit)` gives the top functions."""
+
+    def __enter__(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        return False
+
+    def report(self, limit=30, sort="cumulative"):
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+# ---------- Export ----------
+
+def snapshot():
+    """Aggregate histograms: {name: {count, sum, max, buckets: {le: cumulative}}}."""
+    with _lock:
+        data = {name: dict(h, buckets=list(h["buckets"])) for name, h in _histograms.items()}
+    for hist in data.values():
+        cumulative, total = {}, 0
+        for bound, count in zip(BUCKETS, hist["buckets"]):
+            total += count
+            cumulative[str(bound)] = total
+        cumulative["+Inf"] = hist["count"]
+        hist["buckets"] = cumulative
+    return data
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def export_json(path=None):
+    text = json.dumps({"generated": time.time(), "spans": snapshot()}, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return text
+
+
+def export_prometheus(path=None):
+    """Prometheus text exposition of the span histograms."""
+    lines = [
+        "# HELP family_tree_span_seconds Duration of instrumented operations.",
+        "# TYPE family_tree_span_seconds histogram",
+    ]
+    for name, hist in sorted(snapshot().items()):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        for bound, count in hist["buckets"].items():
+            lines.append(f'family_tree_span_seconds_bucket{{span="{label}",le="{bound}"}} {count}')
+        lines.append(f'family_tree_span_seconds_sum{{span="{label}"}} {hist["sum"]:.6f}')
+        lines.append(f'family_tree_span_seconds_count{{span="{label}"}} {hist["count"]}')
+    text = "\n".join(lines) + "\n"
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return text